@@ -0,0 +1,218 @@
+"""Persistent queue of files to copy to AFS, emptied by background workers.
+
+Every file to archive is recorded as a small JSON job in a local directory before
+anything is copied, so that nothing is lost if AFS is down or the program stops:
+the jobs left in the directory are taken up again by the next :class:`ArchiveQueue`.
+
+>>> archive = ArchiveQueue('/tmp/afs-queue', workers=2)
+>>> archive.put('/tmp/Johann12.SIF', '/afs/ipp/.../Johann34567.SIF')
+>>> archive.backlog
+1
+
+The workers copy to ``<target>.part``, compare the SHA-256 of the copy read back
+with the one of the source, then rename it. A failed job is retried after an
+exponential backoff (``backoff`` doubled at every attempt, up to ``max_backoff``).
+"""
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+
+CHUNK = 1 << 20
+
+try:
+    _replace = os.replace
+except AttributeError: # python 2: os.rename only replaces an existing file on POSIX
+    def _replace(source, target):
+        if os.name == 'nt' and os.path.exists(target):
+            os.remove(target)
+        os.rename(source, target)
+
+
+class ChecksumError(IOError):
+    pass
+
+
+def checksum(filename):
+    """SHA-256 of a file (hex)."""
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def copy(source, target):
+    """Copy source to target through target + '.part', verify the copy, return its checksum."""
+    partial = target + '.part'
+    sha = hashlib.sha256()
+    with open(source, 'rb') as fin:
+        with open(partial, 'wb') as fout:
+            for block in iter(lambda: fin.read(CHUNK), b''):
+                sha.update(block)
+                fout.write(block)
+            fout.flush()
+            os.fsync(fout.fileno())
+    expected = sha.hexdigest()
+    if checksum(partial) != expected:
+        os.remove(partial)
+        raise ChecksumError('Checksum mismatch copying %s to %s' % (source, target))
+    shutil.copystat(source, partial)
+    _replace(partial, target) # also over a copy archived before
+    return expected
+
+
+class ArchiveQueue(object):
+    """Copy files in the background with bounded concurrency, retrying until they are archived.
+
+    :param directory: local directory holding the pending jobs (created if needed)
+    :param workers: number of copies running at the same time
+    :param backoff: delay (s) before the first retry of a failed copy
+    :param max_backoff: longest delay (s) between two attempts
+    :param retries: attempts before a job is given up (kept as ``*.failed``), None to retry forever.
+                    A job whose source file is missing is given up at once.
+    :param warn: called with a message when a copy fails for the first time or is given up
+    """
+    def __init__(self, directory, workers=2, backoff=5.0, max_backoff=600.0, retries=None, warn=None):
+        self.directory = directory
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = retries
+        self.warn = warn
+        self.archived = 0
+        self.failed = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.Condition()
+        self._jobs = {}      # job file -> job
+        self._active = set() # job files being copied
+        self._count = itertools.count()
+        self._running = True
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.json'):
+                path = os.path.join(directory, name)
+                try:
+                    with open(path) as f:
+                        self._jobs[path] = json.load(f)
+                except (IOError, OSError, ValueError):
+                    os.rename(path, path[:-5] + '.failed')
+        self._workers = [threading.Thread(target=self._work, name='AFS archive %d' % i) for i in range(workers)]
+        for worker in self._workers:
+            worker.daemon = True
+            worker.start()
+
+    def put(self, source, target):
+        """Queue a copy of source to target. The job is on disk when this returns."""
+        job = {'source': source, 'target': target, 'queued': time.time(), 'attempts': 0, 'next': 0.0}
+        path = os.path.join(self.directory, '%.6f-%d.json' % (job['queued'], next(self._count)))
+        self._write(path, job)
+        with self._lock:
+            self._jobs[path] = job
+            self._lock.notify()
+        return path
+
+    @property
+    def backlog(self):
+        """Number of files not archived yet."""
+        with self._lock:
+            return len(self._jobs)
+
+    def pending(self):
+        """The jobs not archived yet, oldest first."""
+        with self._lock:
+            return [dict(self._jobs[path]) for path in sorted(self._jobs)]
+
+    def join(self, timeout=None):
+        """Wait until the backlog is empty, return whether it is."""
+        end = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._jobs:
+                remaining = None if end is None else end - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._lock.wait(remaining if remaining is not None else 1.0)
+            return not self._jobs
+
+    def close(self, timeout=None):
+        """Stop the workers once their current copy is done (pending jobs stay on disk)."""
+        with self._lock:
+            self._running = False
+            self._lock.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def _write(self, path, job):
+        temp = path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(job, f)
+        _replace(temp, path) # atomic, a job file is never half written
+
+    def _next(self):
+        """Claim the oldest job due, waiting for one. None when closed."""
+        with self._lock:
+            while self._running:
+                now = time.time()
+                due = [path for path in sorted(self._jobs) if path not in self._active]
+                wait = 1.0
+                for path in due:
+                    delay = self._jobs[path]['next'] - now
+                    if delay <= 0:
+                        self._active.add(path)
+                        return path, self._jobs[path]
+                    wait = min(wait, delay)
+                self._lock.wait(wait)
+
+    def _work(self):
+        while True:
+            claimed = self._next()
+            if claimed is None:
+                return
+            path, job = claimed
+            try:
+                job['checksum'] = copy(job['source'], job['target'])
+            except Exception as error:
+                self._retry(path, job, error)
+            else:
+                os.remove(path)
+                with self._lock:
+                    del self._jobs[path]
+                    self.archived += 1
+                    self._lock.notify_all()
+            finally:
+                with self._lock:
+                    self._active.discard(path)
+
+    def _retry(self, path, job, error):
+        job['attempts'] += 1
+        job['error'] = '%s: %s' % (type(error).__name__, error)
+        if not os.path.exists(job['source']):
+            self._give_up(path, job, 'AFS copy of %s given up, the file is missing' % job['source'])
+            return
+        if self.retries is not None and job['attempts'] >= self.retries:
+            self._give_up(path, job, 'AFS copy of %s given up after %d attempts (%s)'
+                          % (job['source'], job['attempts'], job['error']))
+            return
+        job['next'] = time.time() + min(self.backoff * 2 ** (job['attempts'] - 1), self.max_backoff)
+        self._write(path, job)
+        if job['attempts'] == 1:
+            self._warn('AFS copy of %s failed, will retry (%s)' % (job['source'], job['error']))
+
+    def _give_up(self, path, job, message):
+        """Keep the job as ``*.failed``, out of the queue."""
+        self._write(path, job)
+        _replace(path, path[:-5] + '.failed')
+        with self._lock:
+            del self._jobs[path]
+            self.failed += 1
+            self._lock.notify_all()
+        self._warn(message)
+
+    def _warn(self, message):
+        if self.warn is not None:
+            self.warn(message)
+
+    def __repr__(self):
+        return '<ArchiveQueue %s: %d pending, %d archived, %d failed>' % (self.directory, self.backlog, self.archived, self.failed)
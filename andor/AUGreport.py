@@ -12,9 +12,9 @@ except ImportError:
 import json
 import warnings
 
-def AUGspecWarning(message, error=None, email=None, dweet=None, name='CSXR@ipp.mpg.de'):
+def AUGspecWarning(message, error=None, email=None, dweet=None, name='CSXR@ipp.mpg.de', subject='Spectrometer Error'):
         if not email is None:
-            emailOut(message, recipient=email, name=name, subject = 'Spectrometer Error')
+            emailOut(message, recipient=email, name=name, subject=subject)
 
         if not dweet is None:
             dweetOut(message, dweet)
@@ -0,0 +1,184 @@
+"""Detection of the ASDEX shot files, with inotify (Linux) or by polling.
+
+The shot cycle writes the number of the coming shot to a file. :class:`ShotWatcher`
+reacts to the file as soon as it is written, reads the number once, moves the file
+aside (``<file>_<shot>``, as the spectrometer always did) and publishes the number
+with the time it was read. A file already there when the watcher starts is left
+over from an earlier shot: it is moved aside but not published. Acquisitions are
+paired with the shot files by time, so that a shot without an acquisition (or the
+reverse) does not shift the numbers of all the following ones:
+
+>>> watcher = ShotWatcher('/tmp/shotfile', callback=print)
+>>> watcher.start()
+>>> read, shot = watcher.find(after=armed, before=acquired, timeout=60)  # or None
+
+inotify is used through ctypes when the C library provides it, otherwise the
+file is polled every ``interval`` seconds.
+"""
+import collections
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import shutil
+import struct
+import threading
+import time
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('iIII') # wd, mask, cookie, len (followed by the name)
+
+
+def _libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def read_shotfile(filename):
+    """Read the shot number from a shot file and move it aside. Raise IOError or ValueError."""
+    with open(filename, 'r') as f:
+        shot = int(f.readline())
+    shutil.move(filename, filename + '_' + str(shot))
+    return shot
+
+
+class ShotWatcher(object):
+    """Publish the shot number written to filename, as soon as the file appears.
+
+    Each (time read, number) is appended to :attr:`shots` (the last history ones) and the
+    number passed to callback (called from the watcher thread). :attr:`shot` and :attr:`time`
+    are the last number and when it was read.
+    """
+    def __init__(self, filename, callback=None, interval=0.5, inotify=True, history=100):
+        self.filename = os.path.abspath(filename)
+        self.callback = callback
+        self.interval = interval
+        self.shots = collections.deque(maxlen=history)
+        self._published = threading.Condition()
+        self.shot = None
+        self.time = None
+        self.error = None
+        self._libc = _libc() if inotify else None
+        self._fd = None
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def inotify(self):
+        """Whether the file is watched with inotify (otherwise polled)."""
+        return self._fd is not None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._stopping.clear()
+        self._fd = self._watch()
+        self._thread = threading.Thread(target=self._run, name='shot watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def find(self, after, before, timeout=None):
+        """(time read, number) of the last shot file read between the times after and before,
+        or else of the first one read after before, waiting up to timeout seconds for it.
+        None if there is none."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._published:
+            while True:
+                window = [item for item in self.shots if after < item[0] <= before]
+                if window:
+                    return window[-1]
+                late = [item for item in self.shots if item[0] > max(after, before)]
+                if late:
+                    return late[0]
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._published.wait(remaining)
+
+    def _watch(self):
+        """inotify file descriptor watching the directory of the file, or None."""
+        if self._libc is None:
+            return None
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        directory = os.path.dirname(self.filename).encode()
+        if self._libc.inotify_add_watch(fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _events(self):
+        """Wait for the file to be written, return whether it might have been."""
+        ready, _, _ = select.select([self._fd], [], [], self.interval)
+        if not ready:
+            return False
+        try:
+            buffer = os.read(self._fd, 4096)
+        except OSError as error:
+            if error.errno == errno.EAGAIN:
+                return False
+            raise
+        name = os.path.basename(self.filename).encode()
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = _EVENT.unpack_from(buffer, offset)
+            offset += _EVENT.size
+            if mask & IN_Q_OVERFLOW or buffer[offset:offset + length].rstrip(b'\0') == name:
+                return True
+            offset += length
+        return False
+
+    def _run(self):
+        try:
+            self._check(publish=False) # a file already there is left over from an earlier shot
+            while not self._stopping.is_set():
+                if self._fd is None:
+                    self._stopping.wait(self.interval)
+                    self._check()
+                elif self._events() or self.error is not None: # retry a file that could not be read
+                    self._check()
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _check(self, publish=True):
+        if not os.path.exists(self.filename):
+            return
+        try:
+            shot = read_shotfile(self.filename)
+        except (IOError, OSError, ValueError) as error:
+            self.error = error # probably still being written, read it at the next event
+            return
+        self.error = None
+        if not publish:
+            return
+        with self._published:
+            self.shot, self.time = shot, time.time()
+            self.shots.append((self.time, shot))
+            self._published.notify_all()
+        if self.callback is not None:
+            self.callback(shot)
+
+    def __repr__(self):
+        return '<ShotWatcher %s (%s): shot %s>' % (self.filename, 'inotify' if self.inotify else 'polling', self.shot)
@@ -1,10 +1,18 @@
 #import andor2
 from AUGreport import AUGspecWarning
-
-import shutil
-import thread
+from AFSarchive import ArchiveQueue
+from AUGshot import ShotWatcher, read_shotfile
+from andorConfig import Config, ACQ_MODES, READ_MODES, TRIGGER_MODES
+
+import os
+import threading
+import time
+from contextlib import closing
 from time import sleep
-import Queue
+try:
+    import Queue
+except ImportError: #python3
+    import queue as Queue
 
 try:
     from urllib import urlopen
@@ -40,6 +48,23 @@ class Spectrometer(object):
         self._setup = False
         self._running = False
         self._seq = 0
+        self._shot = None
+        self._paired = 0 #time after which the shot files are not paired with an acquisition yet
+        self.Vacuum = None #VacuumPoller, running while the spectrometer is started
+        self.Shots = None  #ShotWatcher, running while the spectrometer is started
+        self._vacuum_bad = threading.Event() #set by the VacuumPoller
+        self.shot_timeout = 10.0 #how long the archive stage waits for the shot number (s)
+
+        #files waiting to be copied to AFS, kept on the local disk
+        self.Archive = ArchiveQueue(os.path.join(self.Settings.tempLocation, 'AFSqueue'),
+                                    warn=self.warning)
+
+    def warning(self, message, subject='Spectrometer Error'):
+        AUGspecWarning(message,
+                       email=self.email,
+                       dweet=self.dweet,
+                       name=self.Settings.name,
+                       subject=subject)
 
     def acquire(self, queue=None): #rewrite this with a set of threading objects
         self.Cam.AcqMode.start()
@@ -58,18 +83,26 @@ class Spectrometer(object):
     def shotnum(self):
         return self._shot
 
-    @shotnum.setter
-    def shotnum(self):
+    def read_shotnum(self, timeout=None, acquired=None):
+        """ Return the number of the shot acquired at the time acquired (now if None): while the
+        shot watcher runs, the last shot file read since the previous acquisition (waiting up to
+        timeout seconds for a late one), otherwise read from the shot file (and rename it).
+        None if there is no shot file """
+        if acquired is None:
+            acquired = time.time()
+        self._shot = None
         try:
-            temp = open(self.Settings.shotfileLoc,'r')
-            self._shot = int(temp.readline())
-            shutil.move(self.Settings.shotfileLoc, self.Settings.shotfileLoc+'_'+str(self._shot))
-        except FileNotFoundError:
-            AUGspecWarning('Shotfile cannot be read',
-                           email=self.email,
-                           dweet=self.dweet,
-                           name=self.Settings.name,
-                           subject='Shotfile read error')
+            if self.Shots is not None and self.Shots.running:
+                found = self.Shots.find(self._paired, acquired, timeout=timeout)
+                if found is None:
+                    raise IOError('no shot file read since the previous acquisition')
+                read, self._shot = found
+                self._paired = max(read, acquired)
+            else:
+                self._shot = read_shotfile(self.Settings.shotfileLoc)
+        except (IOError, OSError, ValueError):
+            self.warning('Shotfile cannot be read', subject='Shotfile read error')
+        return self._shot
                 
     @property
     def setupLoad(self):
@@ -79,54 +112,40 @@ class Spectrometer(object):
     def setupLoad(self, setupfile):
         self._setup = False #setupLoad must be redefined for each spectrometer, otherwise will specify setup not loaded
 
-    def store(self, end='.SIF'):
-        #force all files based on number to a specific length
-        strshot = '{0:05d}'.format(self.shot)
-
+    def store(self, shot, end='.SIF'):
+        """ Save the data of the shot from the camera to the local file """
         #file names
-        localfile = + self.Settings.name + str(self.sequence) + end
+        shot.localfile = self.Settings.tempLocation + self.Settings.name + str(shot.sequence) + end
 
         try:
-            self.Cam.save(localfile) 
+            self.Cam.Acquire.saveSIF(shot.localfile)
         except:
-            AUGspecWarning('Cannot save data',
-                           email=self.email,
-                           dweet=self.dweet,
-                           name=self.Settings.name,
-                           subject='Cannot save data')
+            shot.localfile = None
+            self.warning('Cannot save data', subject='Cannot save data')
 
-    def AFScopy(self, end='.SIF'):
+    def AFScopy(self, shot, end='.SIF'):
+        """ Queue the copy of the local file of the shot to AFS (see :attr:`Archive`) """
+        if shot.localfile is None or shot.number is None:
+            return
         #force all files based on number to a specific length
-        strshot = '{0:05d}'.format(self.shot)
+        strshot = '{0:05d}'.format(shot.number)
 
         #file names
-        localfile = + self.Settings.name + str(self.sequence) + end
-        AFSfile = self.Settings.AFSLocation + self.Settings.name + strshot + end
+        shot.AFSfile = self.Settings.AFSLocation + self.Settings.name + strshot + end
         
         try:
-            shutil.copy(localfile, AFSfile)
+            self.Archive.put(shot.localfile, shot.AFSfile)
         except:
-            AUGspecWarning('AFS copy error',
-                           email=self.email,
-                           dweet=self.dweet,
-                           name=self.Settings.name,
-                           subject='Cannot save data')
-            
+            shot.AFSfile = None
+            self.warning('AFS copy error', subject='Cannot save data')
+
     @property
     def vacuum(self):
-        return self._vacuum
+        """ Last vacuum status read (None if never read) """
+        if self.Vacuum is None:
+            return None
+        return self.Vacuum.value
     
-    @vacuum.setter
-    def vacuum(self):
-        try:
-            self._vacuum = bool(urlopen(self.Settings.vacCheckURL))
-        except:
-            AUGspecWarning('Vacuum cannot be read',
-                           email=self.email,
-                           dweet=self.dweet,
-                           name=self.Settings.name,
-                           subject='Vacuum error') 
-
     @property
     def sequence(self):
         return self._seq
@@ -135,75 +154,252 @@ class Spectrometer(object):
     def sequence(self, seq):
         self._seq = seq
 
-    def start(self, single=None, tempsetpoint=25):
-        self._running = True
+    def check_temperature(self):
+        """ Warn and set the cooler again if the chip is not at the set point """
+        if abs(self.Cam.Temperature.read['temperature'] - self.Settings.setTemp) > 2: #if the vacuum is good, and the temperature is not up to snuff
+            self.warning('Temperature Warning', subject='Chip temperature not at set point')
+            self.Cam.Temperature.setpoint = self.Settings.setTemp # set it again just in case
+            if not self.Cam.Temperature.cooler: #if the cooler is off, turn it on.
+                self.Cam.Temperature.cooler = True #turn on cooler
+
+    def protect(self, tempsetpoint=25):
+        """ Bad vacuum: stop acquiring, raise the camera temperature and turn off the cooler """
+        self.warning('Vacuum Warning', subject='High Vacuum Warning')
+        self._running = False
+        self.Cam.Acquire.stop()
+        self.Cam.Temperature.setpoint = tempsetpoint #Immediately raise camera temperature to protect the camera
+        self.Cam.Temperature.cooler = False #turn off cooler
+
+    def archive(self, shot):
+        """ Archive stage: read the shot number and copy the data to AFS
+        (the local file is kept if there is no shot number) """
+        shot.number = self.read_shotnum(self.shot_timeout, shot.acquired)
+        self.AFScopy(shot)
+
+    def _gui(self, name, *args):
+        """ Call the GUI method name(*args) from the GUI thread (Tk is not thread safe),
+        the stages and the shot watcher run in their own threads """
+        if self._GUI is None:
+            return
+        method = getattr(self._GUI, name)
+        if hasattr(self._GUI, 'after'):
+            self._GUI.after(0, method, *args)
+        else:
+            method(*args)
+
+    def _new_shot(self, number):
+        """ Called by the shot watcher as soon as a shot file is read """
+        self._gui('printf', "shot file read: "+str(number))
+
+    def notify(self, shot):
+        """ Notify stage: report the archived shot """
+        if not self._GUI is None:
+            self._gui('printf', "acqusition complete")
+            self._gui('shotUpdate', shot.number)
+            backlog = self.Archive.backlog
+            if backlog > 1:
+                self._gui('printf', "AFS backlog: %d files" % backlog)
+
+    def _stage(self, name, work, inbox, outbox=None):
+        """ Start a thread calling work(shot) for every shot put in inbox, then passing
+        it on to outbox. None ends the stage (and is passed on) """
+        def run():
+            while True:
+                shot = inbox.get()
+                if shot is None:
+                    break
+                try:
+                    work(shot)
+                except Exception as error:
+                    self.warning('%s stage failed for sequence %d: %s' % (name, shot.sequence, error), subject=name + ' error')
+                if outbox is not None:
+                    outbox.put(shot)
+            if outbox is not None:
+                outbox.put(None)
+        thread = threading.Thread(target=run, name=name)
+        thread.daemon = True
+        thread.start()
+        return thread
 
+    def start(self, single=None, tempsetpoint=25):
+        """ Run the shot cycle until stop() is called (or for a single shot).
+
+        The cycle is pipelined: the acquisition loop only arms the camera, waits for the
+        readout and stores the data locally, then hands the shot to the archive stage
+        (waits for the shot number, queues the AFS copy) and the notify stage, which run in their own threads
+        connected by queues. The camera is re-armed as soon as the data is stored.
+        The vacuum is polled in the background (:class:`VacuumPoller`): a bad or stale
+        status aborts the acquisition and turns the cooler off at once. The poller only
+        flags it, the camera is only ever driven from this loop (the SDK is not thread safe).
+        The local store stays in the acquisition loop because SaveAsSif reads the data
+        from the camera, which the next acquisition overwrites.
+        """
         if not self._setup: #The spectrometer will not run without running a setup
             self._running = False
-        
-        while self._running:
+            self._gui('stop') #reset buttons on gui
+            return
 
-            if not self.vacuum(): #check the vacuum status
-                AUGspecWarning('Vacuum Warning',
-                               email=self.email,
-                               dweet=self.dweet,
-                               name=self.Settings.name,
-                               subject='High Vacuum Warning')
-                self.Cam.Temperature.setpoint(tempsetpoint) #Immediately raise camera temperature to protect the camera
-                self.Cam.Temperature.cooler = False #turn off cooler
-                self._running = False
-            
-            elif abs(self.Temperature.read['temperature'] - self.Settings.setTemp) > 2: #if the vacuum is good, and the temperature is not up to snuff
-                AUGspecWarning('Temperature Warning',
-                               email=self.email,
-                               dweet=self.dweet,
-                               name=self.Settings.name,
-                               subject='Chip temperature not at set point')
-                self.Cam.Temperature.setpoint(self.Settings.setTemp) # set it again just in case
-                if not self.Temperature.cooler: #if the cooler is off, turn it on.
-                    self.Cam.Temperature.cooler = True #turn on cooler            
-
-            #if the temp is bad, still acquire, but if the vacuum is bad, shut everything down.
-                    
-            if self._running:
-
-                if not self._GUI is None:
-                    self._GUI.printf("acquisition of shot:"+str())
-                    self.sequence = int(self._GUI.seqInput.get())
-                
-                self.Cam.Acquire.start()
-                self.Cam.Acquire.wait() #supposedly not thread safe
+        self._running = True
+        archive = Queue.Queue()
+        notify = Queue.Queue()
+        stages = [self._stage('archive', self.archive, archive, notify),
+                  self._stage('notify', self.notify, notify)]
+        # the poller flags a bad vacuum, the loop protects the camera as soon as it is flagged, even during a shot
+        self._vacuum_bad.clear()
+        self.Vacuum = VacuumPoller(self.Settings.vacCheckURL, on_bad=self._vacuum_bad.set)
+        self.Vacuum.start()
+        self.Shots = ShotWatcher(self.Settings.shotfileLoc, callback=self._new_shot)
+        self._paired = time.time()
+        self.Shots.start()
+        if not self._GUI is None:
+            self.sequence = int(self._GUI.seqInput.get()) #the loop counts from there, the GUI only displays it
+        try:
+            while self._running:
+                self._gui('printf', "acquisition of sequence:"+str(self.sequence))
 
-            #Double check the number of frames (if it was stopped)
-            #progress, series = self.Cam.Acquire.progress()
-            self.shotnum()
-            if self._running: #if running was not forced off
-                
-                self.store() #store the data
-                #self.AFScopy() hold off on AFScopy yet
-                self.sequence(self.sequence + 1) #push up the sequence
-                if not self._GUI is None:
-                    self._GUI.printf("acqusition complete")
-                    self._GUI.shotUpdate(self.shotnum)
-                    self._GUI.sequenceUpdate(self.sequence)
-                
-            # IF SINGLE
-            if single:
-                self._running = False #this will call a function which includes the function stop
+                if not self.Vacuum.good: #cached, never waits for the vacuum server. If the vacuum is bad, shut everything down
+                    self.protect(tempsetpoint)
+                    break
+
+                self.check_temperature() #if the temp is bad, still acquire
+
+                self.Cam.Acquire.start()
+                if not self._wait(): #the vacuum went bad during the shot
+                    self.protect(tempsetpoint)
+                    break
+
+                if self._running: #if running was not forced off
+                    shot = Shot(self.sequence)
+                    self.store(shot) #store the data, then the camera can be re-armed
+                    archive.put(shot)
+                    self.sequence = self.sequence + 1 #push up the sequence
+                    self._gui('sequenceUpdate', self.sequence)
+
+                # IF SINGLE
+                if single:
+                    self._running = False #this will call a function which includes the function stop
+        finally:
+            self.Vacuum.stop()
+            archive.put(None)
+            for stage in stages:
+                stage.join() # let the stages finish the shots already acquired
+            self.Shots.stop()
+
+            self._gui('stop') #reset buttons on gui
+
+            self.stop()
+
+    def _wait(self, interval=0.05):
+        """ Wait for the end of the acquisition, return False if the vacuum went bad meanwhile """
+        while self.Cam.Acquire.running:
+            if self._vacuum_bad.wait(interval):
+                return False
+        return True
 
-        if not self._GUI is None:
-            self._GUI.stop() #reset buttons on gui
-            
-        self.stop()
-            
     def stop(self):
         self._running = False
         self.Cam.Acquire.stop() #if camera is waiting for acquisition, just stop it
 
     def printf(self,text):
-        if not self._GUI is None:
-            self._GUI.printf(text)
+        self._gui('printf', text)
         
+class VacuumPoller(object):
+    """ Reads the vacuum status URL in the background and caches the result.
+
+    The queries run in a thread of their own and are abandoned after timeout seconds, so a
+    hung server never blocks the poller or the shot cycle; no new query is made while one is
+    still in flight. The status is good when the last query succeeded less than max_age
+    seconds ago. on_bad is called (from the poller thread, or from start()) when the first status
+    is bad and when the status goes bad or stale: it should only flag it. """
+
+    def __init__(self, url, interval=1.0, timeout=5.0, max_age=10.0, on_bad=None):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.max_age = max_age
+        self.on_bad = on_bad
+        self.value = None   #last status read
+        self.updated = None #time of the last successful query
+        self.error = None   #error of the last query
+        self._stopping = threading.Event()
+        self._thread = None
+        self._query_thread = None
+        self._result = []
+
+    def _query(self, result):
+        try:
+            with closing(urlopen(self.url, timeout=self.timeout)) as response:
+                result.append(bool(response))
+        except Exception as error:
+            result.append(error)
+
+    def poll(self):
+        """ Query the status once (waiting at most timeout seconds), return whether it is good """
+        if self._query_thread is None or not self._query_thread.is_alive():
+            self._result = []
+            self._query_thread = threading.Thread(target=self._query, args=(self._result,), name='vacuum query')
+            self._query_thread.daemon = True
+            self._query_thread.start()
+        self._query_thread.join(self.timeout)
+        result = self._result
+        if not result:
+            self.error = 'no answer in %g s' % self.timeout
+        elif isinstance(result[0], Exception):
+            self.error = result[0]
+        else:
+            self.value, self.updated, self.error = result[0], time.time(), None
+        return self.good
+
+    @property
+    def age(self):
+        """ Seconds since the last successful query (None if there was none) """
+        if self.updated is None:
+            return None
+        return time.time() - self.updated
+
+    @property
+    def good(self):
+        """ Whether the vacuum is good, according to a recent enough status """
+        age = self.age
+        return bool(self.value) and age is not None and age <= self.max_age
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ Query once, then keep polling in a background thread """
+        self._stopping.clear()
+        if not self.poll() and self.on_bad is not None:
+            self.on_bad()
+        self._thread = threading.Thread(target=self._run, name='vacuum poller')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        was_good = self.good
+        while not self._stopping.wait(self.interval):
+            good = self.poll()
+            if was_good and not good and self.on_bad is not None:
+                self.on_bad()
+            was_good = good
+
+    def __repr__(self):
+        return '<VacuumPoller %s: %s, age %s s>' % (self.url, 'good' if self.good else 'bad', self.age)
+
+class Shot(object):
+    """ An acquisition going through the shot cycle stages """
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.acquired = time.time()
+        self.number = None    #ASDEX shot number, read by the archive stage
+        self.localfile = None
+        self.AFSfile = None
+
 class Settings(object):
     """ This object parses typical settings necessary to interface with the ASDEX shot cycle"""
     
@@ -237,6 +433,7 @@ class SIF(Spectrometer):
                                   Settings(startfile),
                                   email=email,
                                   dweet=dweet)
+        self.Configs = {} #Config of every setup file loaded
 
     @property
     def setupLoad(self):
@@ -244,52 +441,41 @@ class SIF(Spectrometer):
             
     @setupLoad.setter
     def setupLoad(self, setupfile):
-        """ Load the setupfile described in the string setupfile """
+        """ Load the setupfile described in the string setupfile. Only the settings that
+        differ from the setup loaded last are sent to the camera (see :meth:`Config.apply`) """
 
         try:
-            # this is unique to the setup of the SIF spectrometer
-            data = self.Settings.readSetupFile(setupfile)
-            
-            #here is where we modify settings of the SIF.andor object
-
-            #set acq mode, any setup params after fast triggering is assumed to be an acquisition paramter
-            
-            #set num kinetics (Not very well duck-typed), the following two accept additional parameters
-            if temp == 2: #just accumulation
-                self.Cam.Acquire[temp](int(data[2][0]), 0)
-
-            elif temp == 3: #kinetic
-                self.Cam.Acquire[temp](int(data[1][0]), 0, int(data[2][0]))
-
-            else:
-                self.Cam.Acquire[temp]()
-            
-            #set read mode
-            self.Cam.ReadMode[int(data[3][0])]
-            
-            #set readout speed
-            self.Cam.Detector.HSS(int(data[4][0]))
-            
-            #set exposure time
-            self.Cam.exposure(float(data[5][0])/1e3) #in ms
-            
-            #set trigger mode
-            self.Cam.TriggerMode[int(data[6][0])]
-            
-            #set fast trigger?
-            self.Cam.TriggerMode.fast(bool(data[7][0]))
-            
+            self.Configs[setupfile] = self.readSetup(setupfile)
+            self.Configs[setupfile].apply(self.Cam)
         except:
-            AUGspecWarning('Setup load failure',
-                           email=self.email,
-                           dweet=self.dweet,
-                           name=self.Settings.name,
-                           subject=name+ 'Setup load failure')
-        
-        self._setup = True #setup properly loaded
-
-    def store(self):
-        super(SIF, self).store(end='.SIF')
-
-    def AFScopy(self):
-        super(SIF, self).AFScopy(end='.SIF')
+            self._setup = False
+            self.warning('Setup load failure', subject=self.Settings.name + ' Setup load failure')
+        else:
+            self._setup = True #setup properly loaded
+
+    def readSetup(self, setupfile):
+        """ Return the :class:`Config` of a setup file: a .json or .toml configuration,
+        or a SIF setup file (acquisition mode, number of kinetics, number of accumulations,
+        read mode, horizontal shift speed, exposure (ms), trigger mode, fast trigger) """
+        if setupfile.endswith(('.json', '.toml')):
+            return Config.load(setupfile)
+        # this is unique to the setup of the SIF spectrometer
+        data = self.Settings.readSetupFile(setupfile)
+        acq_mode = ACQ_MODES[int(data[0][0])]
+        if acq_mode == 'Accumulate':
+            acq_mode = (acq_mode, {'numberAccumulation': int(data[2][0]), 'accumulationCycleTime': 0})
+        elif acq_mode == 'Kinetic':
+            acq_mode = (acq_mode, {'numberKinetics': int(data[1][0]), 'kineticCycleTime': 0,
+                                   'numberAccumulation': int(data[2][0])})
+        return Config(acq_mode=acq_mode,
+                      read_mode=READ_MODES[int(data[3][0])],
+                      hss=int(data[4][0]),
+                      exposure=float(data[5][0]),
+                      trigger=TRIGGER_MODES[int(data[6][0])],
+                      fast_trigger=bool(int(data[7][0])))
+
+    def store(self, shot):
+        super(SIF, self).store(shot, end='.SIF')
+
+    def AFScopy(self, shot):
+        super(SIF, self).AFScopy(shot, end='.SIF')
@@ -0,0 +1,232 @@
+"""Convert the SIF files of the AFS archive to chunked, compressed HDF5 or Zarr stores.
+
+Every shot of a range is converted by a pool of worker processes::
+
+  $ python SIFconvert.py --config Johann_autorun.cfg 34000 34500 --workers 8
+  $ python SIFconvert.py --archive /afs/ipp/.../SIF/ --name Johann 34000 34500 --format zarr
+
+The source files are ``<archive><name><shot:05d>.SIF`` (see :meth:`SIF.Spectrometer.AFScopy`),
+the outputs ``<output><name><shot:05d>.h5`` (or ``.zarr``). Each output is written
+under a temporary name and renamed when complete, so an interrupted conversion
+can simply be run again: the shots already converted are skipped (unless ``--force``).
+The outcome of every shot is appended to ``convert-log.jsonl`` in the output directory.
+
+Each store holds the frames as ``data`` (frames, rows, columns) chunked per frame,
+``timestamps``, ``wavelengths`` when the file is calibrated, and the SIF header as
+attributes of the root group.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import SIFreader
+from andorData import hdf5_compression
+
+try:
+    import h5py
+    WITH_H5PY = True
+except ImportError:
+    WITH_H5PY = False
+
+try:
+    import zarr
+    WITH_ZARR = True
+except ImportError:
+    WITH_ZARR = False
+
+FORMATS = {'hdf5': '.h5', 'zarr': '.zarr'}
+LOG = 'convert-log.jsonl'
+# Number of frames copied at once, bounds the memory used per worker
+BLOCK = 64
+
+
+def _attrs(sif):
+    """SIF header fields that can be stored as attributes."""
+    attrs = {}
+    for key, value in sif.header.items():
+        if isinstance(value, bytes):
+            value = value.decode('latin-1')
+        if isinstance(value, (tuple, list)):
+            value = list(value)
+        attrs[key] = value
+    return attrs
+
+
+def _read_config(filename):
+    """Spectrometer name and AFS location of a configuration file, read as :class:`SIF.Settings` does."""
+    with open(filename) as f:
+        startup = [line.split() for line in f if line[0] != '#']
+    return startup[4][0], startup[0][0]
+
+
+def _zarr_codec(compression, level, v3):
+    if compression is None:
+        return None
+    if compression == 'blosc':
+        if v3:
+            return zarr.codecs.BloscCodec(cname='zstd', clevel=5 if level is None else level, shuffle='bitshuffle')
+        import numcodecs
+        return numcodecs.Blosc(cname='zstd', clevel=5 if level is None else level, shuffle=numcodecs.Blosc.BITSHUFFLE)
+    if compression == 'gzip':
+        if v3:
+            return zarr.codecs.GzipCodec(level=4 if level is None else level)
+        import numcodecs
+        return numcodecs.GZip(4 if level is None else level)
+    raise ValueError('Zarr compression must be blosc or gzip, not %r' % (compression,))
+
+
+def write_hdf5(sif, path, compression='gzip', level=None):
+    if not WITH_H5PY:
+        raise ImportError('h5py is required to write HDF5 files')
+    with h5py.File(path, 'w') as f:
+        data = f.create_dataset('data', shape=sif.shape, dtype=sif.data.dtype, chunks=(1,) + sif.shape[1:],
+                                **hdf5_compression(compression, level))
+        for i in range(0, len(sif), BLOCK):
+            data[i:i + BLOCK] = sif.data[i:i + BLOCK]
+        f['timestamps'] = sif.timestamps
+        if sif.wavelengths is not None:
+            f['wavelengths'] = sif.wavelengths
+        for key, value in _attrs(sif).items():
+            f.attrs[key] = value
+
+
+def write_zarr(sif, path, compression='blosc', level=None):
+    if not WITH_ZARR:
+        raise ImportError('zarr is required to write Zarr stores')
+    group = zarr.open_group(path, mode='w')
+    v3 = hasattr(group, 'create_array')
+    codec = _zarr_codec(compression, level, v3)
+    chunks = (1,) + sif.shape[1:]
+    if v3:
+        data = group.create_array('data', shape=sif.shape, chunks=chunks, dtype=sif.data.dtype,
+                                  compressors=None if codec is None else [codec])
+        group.create_array('timestamps', data=sif.timestamps)
+        if sif.wavelengths is not None:
+            group.create_array('wavelengths', data=sif.wavelengths)
+    else:
+        data = group.create_dataset('data', shape=sif.shape, chunks=chunks, dtype=sif.data.dtype, compressor=codec)
+        group.create_dataset('timestamps', data=sif.timestamps)
+        if sif.wavelengths is not None:
+            group.create_dataset('wavelengths', data=sif.wavelengths)
+    for i in range(0, len(sif), BLOCK):
+        data[i:i + BLOCK] = sif.data[i:i + BLOCK]
+    group.attrs.update(_attrs(sif))
+
+
+WRITERS = {'hdf5': write_hdf5, 'zarr': write_zarr}
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def convert(source, target, format='hdf5', compression=None, level=None):
+    """Convert one SIF file, return its number of frames.
+
+    The output is written to ``target + '.part'`` and renamed when complete.
+    """
+    partial = target + '.part'
+    _remove(partial)
+    with SIFreader.SIFFile(source) as sif:
+        WRITERS[format](sif, partial, compression, level)
+        frames = len(sif)
+    _remove(target)
+    os.rename(partial, target)
+    return frames
+
+
+def _job(job):
+    """Worker: convert a shot, return its log entry."""
+    shot, source, target, format, compression, level = job
+    start = time.time()
+    entry = {'shot': shot, 'source': source, 'target': target}
+    try:
+        entry['frames'] = convert(source, target, format, compression, level)
+    except Exception as error:
+        entry['error'] = '%s: %s' % (type(error).__name__, error)
+    entry['seconds'] = round(time.time() - start, 3)
+    return entry
+
+
+def jobs(archive, name, shots, output, format='hdf5', compression=None, level=None, force=False):
+    """List the conversions to do, skipping the missing and already converted shots."""
+    todo = []
+    for shot in shots:
+        source = os.path.join(archive, '%s%05d.SIF' % (name, shot))
+        target = os.path.join(output, '%s%05d%s' % (name, shot, FORMATS[format]))
+        if not os.path.exists(source):
+            continue
+        if not force and os.path.exists(target):
+            continue
+        todo.append((shot, source, target, format, compression, level))
+    return todo
+
+
+def run(todo, output, workers=None, verbose=True):
+    """Convert in a process pool, appending each outcome to the log. Return the number of failures."""
+    failures = 0
+    start = time.time()
+    pool = multiprocessing.Pool(workers)
+    try:
+        with open(os.path.join(output, LOG), 'a') as log:
+            for done, entry in enumerate(pool.imap_unordered(_job, todo), 1):
+                entry['time'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                log.write(json.dumps(entry) + '\n')
+                log.flush()
+                failures += 'error' in entry
+                if verbose:
+                    print('[%d/%d] shot %d: %s (%.1f s)' % (done, len(todo), entry['shot'],
+                          entry.get('error', '%d frames' % entry.get('frames', 0)), entry['seconds']))
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    if verbose:
+        print('%d shots converted, %d failed in %.0f s' % (len(todo) - failures, failures, time.time() - start))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert archived SIF files to HDF5 or Zarr.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--config', help='spectrometer configuration file (AFS location and name)')
+    source.add_argument('--archive', help='directory of the SIF files')
+    parser.add_argument('--name', help='spectrometer name, prefix of the file names (with --archive)')
+    parser.add_argument('first', type=int, help='first shot')
+    parser.add_argument('last', type=int, help='last shot (included)')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='hdf5')
+    parser.add_argument('--compression', default=None,
+                        help='hdf5: gzip (default), lzf or blosc; zarr: blosc (default) or gzip; none to disable')
+    parser.add_argument('--level', type=int, default=None, help='compression level')
+    parser.add_argument('--output', default=None, help='output directory (default: the archive)')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='convert the shots already converted again')
+    args = parser.parse_args(argv)
+
+    if args.config:
+        archive, name = _read_config(args.config)
+    elif args.name is None:
+        parser.error('--name is required with --archive')
+    else:
+        archive, name = args.archive, args.name
+    compression = args.compression or {'hdf5': 'gzip', 'zarr': 'blosc'}[args.format]
+    if compression == 'none':
+        compression = None
+    output = args.output or archive
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    todo = jobs(archive, name, range(args.first, args.last + 1), output, args.format, compression, args.level, args.force)
+    return 1 if run(todo, output, args.workers) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Reader for Andor .SIF files (as written by ``SaveAsSif``, e.g. :meth:`andor2.AcqMode.save`).
+
+The header is parsed in Python and the frames are mapped with :class:`numpy.memmap`,
+so a frame or a region of interest can be read from a large file without
+loading the rest of it:
+
+>>> from SIFreader import SIFFile
+>>> with SIFFile('shot.SIF') as sif:
+...     print(sif.exposure, sif.kinetic_cycle, len(sif))
+...     spectrum = sif[10, 5:8].sum(axis=0)  # frame 10, rows 5 to 7
+...     wavelengths = sif.wavelengths
+
+The SIF layout is not documented by Andor: the header fields are read in the
+order established by the open-source SIF readers for the versions 65548 to 65567.
+The position of the frames does not depend on the version-specific fields: the
+image structure is located by its self-consistent sizes, so that files of an
+unknown version can still be read, only with less metadata.
+"""
+import re
+import numpy
+
+MAGIC = b'Andor Technology Multi-Channel File'
+
+# "<type> left top right bottom frames subimages total_length image_length"
+# followed by one "<type> x0 y1 x1 y0 ybin xbin ..." line per subimage
+_STRUCTURE = re.compile(br'(655\d\d) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+)\s+'
+                        br'(655\d\d) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+)')
+
+
+class SIFError(Exception):
+    pass
+
+
+class _Header(object):
+    """Reads the space-separated, length-prefixed fields of a SIF header."""
+    def __init__(self, f):
+        self.f = f
+
+    def word(self):
+        """Next space or newline terminated word (leading separators are skipped)."""
+        word = b''
+        while True:
+            c = self.f.read(1)
+            if not c:
+                raise SIFError('Unexpected end of file')
+            if c in b' \n':
+                if word:
+                    return word
+            else:
+                word += c
+
+    def int(self):
+        return int(self.word())
+
+    def float(self):
+        return float(self.word())
+
+    def string(self):
+        """String prefixed by its length on its own line."""
+        length = int(self.f.readline())
+        return self.f.read(length)
+
+    def line(self):
+        return self.f.readline()
+
+    def skip(self, lines):
+        for i in range(lines):
+            self.f.readline()
+
+
+class SIFFile(object):
+    """A .SIF file: header fields as attributes, frames as a (frames, rows, columns) memmap.
+
+    Indexing the object indexes :attr:`data`.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        #: All parsed header fields
+        self.header = {}
+        with open(filename, 'rb') as f:
+            self._parse(f)
+        self.data = numpy.memmap(filename, '<f4', 'r', offset=self.offset, shape=self.shape)
+
+    def _parse(self, f):
+        h = _Header(f)
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SIFError('%s is not a SIF file' % self.filename)
+        f.readline()
+        f.readline() # 65538 1
+        try:
+            self._parse_settings(h)
+        except (SIFError, ValueError):
+            pass # unknown layout, the frames can still be located
+        f.seek(0)
+        text = f.read(1 << 20)
+        self._parse_structure(f, text)
+
+    def _parse_settings(self, h):
+        """Acquisition settings, detector, user text and calibration."""
+        header = self.header
+        header['version'] = h.int()
+        h.word(), h.word(), h.word()
+        header['time'] = h.int()
+        header['temperature'] = h.float()
+        h.f.read(10)
+        h.word()
+        header['exposure'] = h.float()
+        header['cycle_time'] = h.float()
+        header['accumulation_cycle_time'] = h.float()
+        header['accumulations'] = h.int()
+        h.f.read(2)
+        header['kinetic_cycle_time'] = h.float()
+        header['pixel_readout_time'] = h.float()
+        h.word(), h.word()
+        header['gain'] = h.float()
+        h.line()
+        header['detector'] = h.line().strip().decode('latin-1')
+        header['detector_size'] = (h.int(), h.int())
+        header['original_filename'] = h.string().decode('latin-1')
+        h.line()
+        h.word() # 65538
+        header['user_text'] = h.string()
+        h.line()
+        h.word() # 65538
+        h.f.read(8)
+        header['shutter_time'] = (h.float(), h.float())
+        version = header['version']
+        if 65548 <= version <= 65557:
+            h.skip(2)
+        elif version == 65558:
+            h.skip(5)
+        elif version in (65559, 65564):
+            h.skip(8)
+            header['spectrograph'] = h.line().split()[1].decode('latin-1')
+        elif version == 65565:
+            h.skip(15)
+        elif version > 65565:
+            h.skip(8)
+            header['spectrograph'] = h.line().split()[1].decode('latin-1')
+            h.skip(9) # intensifier settings
+        else:
+            return
+        if h.int() == 65540: # calibration version
+            h.line()
+        for line in (h.line(), h.line()):
+            try:
+                coefficients = [float(c) for c in line.split()]
+            except ValueError:
+                continue
+            if coefficients:
+                header['calibration'] = coefficients
+                break
+        user_text = header['user_text']
+        if user_text.startswith(b'Calibration data for'):
+            # one calibration per frame, "Calibration data for frame 1: c0,c1,c2,c3"
+            header['frame_calibration'] = [[float(c) for c in line.split(b':', 1)[1].split(b',')]
+                                           for line in user_text.splitlines() if b':' in line]
+
+    def _parse_structure(self, f, text):
+        """Locate the frames from the image structure and the file size."""
+        for match in _STRUCTURE.finditer(text):
+            values = [int(v) for v in match.groups()]
+            frames, subimages, total, length = values[5:9]
+            x0, y1, x1, y0, ybin, xbin = values[10:16]
+            if xbin < 1 or ybin < 1:
+                continue
+            width = (x1 - x0 + 1) // xbin
+            height = (y1 - y0 + 1) // ybin
+            if frames and total == frames * length and length == width * height * subimages:
+                break
+        else:
+            raise SIFError('Could not find the image structure of ' + self.filename)
+        self.header.update(frames=frames, subimages=subimages, binning=(xbin, ybin),
+                           area=(x0, y0, x1, y1))
+        self.shape = (frames, height * subimages, width)
+        # skip the other subimages, then one timestamp per frame
+        f.seek(match.end())
+        f.readline()
+        for i in range(subimages - 1):
+            f.readline()
+        c = f.read(1)
+        while c and c in b' \n':
+            c = f.read(1)
+        f.seek(-len(c), 1)
+        self.timestamps = numpy.array([int(f.readline()) for i in range(frames)])
+        self.offset = f.tell()
+        size = f.seek(0, 2)
+        if size - self.offset < 4 * total:
+            raise SIFError('%s is truncated' % self.filename)
+        if size - self.offset > 4 * total:
+            # some versions add a flag line before the data, followed by one more value per frame if it is 1
+            f.seek(self.offset)
+            flag = f.readline().strip()
+            if flag in (b'0', b'1'):
+                if flag == b'1':
+                    for i in range(frames):
+                        f.readline()
+                if size - f.tell() >= 4 * total:
+                    self.offset = f.tell()
+
+    # Header fields
+
+    @property
+    def exposure(self):
+        """Exposure time (s)."""
+        return self.header.get('exposure')
+
+    @property
+    def accumulations(self):
+        return self.header.get('accumulations')
+
+    @property
+    def accumulation_cycle(self):
+        """Accumulation cycle time (s)."""
+        return self.header.get('accumulation_cycle_time')
+
+    @property
+    def kinetic_cycle(self):
+        """Kinetic cycle time (s)."""
+        return self.header.get('kinetic_cycle_time')
+
+    @property
+    def temperature(self):
+        """Detector temperature (C) when the data was taken."""
+        return self.header.get('temperature')
+
+    @property
+    def start_time(self):
+        """Time of the acquisition (seconds since the epoch)."""
+        return self.header.get('time')
+
+    @property
+    def calibration(self):
+        """Polynomial coefficients (increasing order) of the wavelength calibration, or None."""
+        return self.header.get('calibration')
+
+    @property
+    def wavelengths(self):
+        """Wavelength of each column from the calibration (pixel number starting at 1), or None."""
+        if self.calibration is None:
+            return None
+        xbin = self.header['binning'][0]
+        pixels = self.header['area'][0] + (xbin - 1) / 2.0 + xbin * numpy.arange(self.shape[2])
+        return numpy.polynomial.polynomial.polyval(pixels, self.calibration)
+
+    # Frames
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __array__(self, dtype=None, copy=None):
+        return numpy.asarray(self.data, dtype)
+
+    def close(self):
+        """Drop the reference to the memory map.
+
+        The map is released by numpy when the last frame or slice taken from it
+        goes away, so these stay valid after the file is closed.
+        """
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return "<SIF file %s: %d frames of %dx%d, exposure %s s>" % ((self.filename,) + self.shape + (self.exposure,))
+
+
+def read(filename):
+    """Return the frames of a SIF file as an array (loaded in memory) and its header."""
+    with SIFFile(filename) as sif:
+        return numpy.array(sif.data), dict(sif.header, timestamps=sif.timestamps)
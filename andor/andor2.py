@@ -18,7 +18,11 @@
 .. Warning::
    This module is not thread-safe. If :func:`AcqMode.wait` is blocking a
    background thread, and another function call is made from the main thread,
-   the main thread will block too.
+   the main thread will block too. For continuous readout use
+   :func:`AcqMode.start_reader`, which runs a dedicated :class:`AcquisitionThread`
+   and hands the frames to other threads through a :class:`FrameRing` (or to other
+   processes through a :class:`SharedFrameRing`). To drive several cameras in parallel,
+   one process per camera, see :mod:`andorMulti`.
 
 -----------------------------
 
@@ -46,6 +50,7 @@ that control various aspect of the camera:
 
 * :class:`ReadMode`: select the CCD read-out mode (full frame, vertical binning, tracks, etc.)
 * :class:`Acquire <AcqMode>`: control the acquisition mode (single shot, video, accumulate, kinetic)
+* :class:`Buffers <BufferPool>`: recycled arrays the image data is read into
 
 :Examples:
 
@@ -81,18 +86,39 @@ import ctypes
 #cimport numpy as np
 #np.import_array()
 
+import functools
+import glob
+import json
+import os
 import time
+import threading
+import weakref
+try:
+  import queue
+except ImportError: #python2
+  import Queue as queue
 try:
   import tkinter
 except ImportError: #python2
   import Tkinter as tkinter
 
-#import h5py
+try:
+  import h5py
+  WITH_H5PY = True
+except ImportError:
+  WITH_H5PY = False
+
+try:
+  from multiprocessing import shared_memory
+  WITH_SHM = True
+except ImportError: #python < 3.8
+  WITH_SHM = False
 
 #cimport cython
 #cimport atmcdLXd as sdk   # Andor SDK definition file
 
 import andorSDK as sdk
+from andorData import hdf5_compression, correct_rollover, RolloverView
 
 # Try importing Andor's own python wrapper
 try:
@@ -126,7 +152,7 @@ def while_acquiring(func):
       output = func(*args, **kwargs)
     except sdk.AndorError as error:
       print(error)
-      if error.error is 20072 and self._cam.Acquire._name is 'Video':
+      if error.error == 20072 and self._cam.Acquire._name == 'Video':
         sdk.AbortAcquisition()
         func(*args, **kwargs)
         sdk.StartAcquisition()
@@ -134,19 +160,796 @@ def while_acquiring(func):
         raise error
   return decorated_function
   
+def cached(func):
+  """Decorator for properties returning static hardware facts.
+  
+  The SDK is only queried on first access; the value is then kept in the object's
+  ``_cache`` until :func:`invalidate` is called, usually by a hook fired when
+  a setting the value depends on is changed (see ``on_change`` in :class:`OutputAmp`,
+  :class:`ADC` and :class:`ReadModes`).
+  """
+  name = func.__name__
+  def inner(self):
+    cache = self.__dict__.setdefault('_cache', {})
+    if name not in cache:
+      cache[name] = func(self)
+    return cache[name]
+  inner.__name__ = name
+  inner.__doc__ = func.__doc__
+  return inner
+
+def invalidate(obj, *names):
+  """Clear the values cached by :func:`cached` properties of *obj* (all of them if no name is given)."""
+  cache = obj.__dict__.get('_cache', {})
+  if names:
+    for name in names:
+      cache.pop(name, None)
+  else:
+    cache.clear()
+
+def _fire(hooks):
+  """Call all the functions of a list of hooks."""
+  for hook in hooks:
+    hook()
+  
 def rollover(func):
   """ Decorator that correct for the ADC roll-over by replacing zeros
   with 2**n-1 in image data.
+  
+  The correction is done in place if ``self.rollover`` is True, or deferred
+  to data access if it is ``'lazy'`` (see :class:`RolloverView`).
   """
   def inner(*args, **kwargs):
     self = args[0]
     data = func(*args, **kwargs)
-    if self.rollover:
-      dynamic_range = 2**self._cam.Detector.bit_depth - 1
-      data[data==0] = dynamic_range
+    if self.rollover == 'lazy':
+      return RolloverView(data, self._cam.Detector.bit_depth)
+    elif self.rollover:
+      correct_rollover(data, self._cam.Detector.bit_depth)
     return data
   return inner
+
+def _system_time(st):
+  """Seconds since the epoch of an SDK :class:`andorSDK.SystemTime` (local time)."""
+  return time.mktime((st.wYear, st.wMonth, st.wDay, st.wHour, st.wMinute, st.wSecond, 0, 0, -1)) + st.wMilliseconds / 1000.0
+
+def _dtype(type):
+  """Return the numpy dtype matching the SDK data type (16 or 32 bits)."""
+  return np.uint16 if type == 16 else np.int32
+
+class BufferPool(object):
+  """Recycles the contiguous arrays that image data is read into.
+  
+  Buffers are keyed by (shape, dtype). :meth:`get` hands out a free buffer,
+  allocating a new one only when none is available, and :meth:`release`
+  returns it to the pool once the caller is done with the data.
+  
+  :Usage:
+  
+  >>> data = cam.Acquire.Newest()   # buffer taken from cam.Buffers
+  >>> process(data)
+  >>> cam.Buffers.release(data)     # recycled for the next frame
+  """
+  def __init__(self, depth=8):
+    """:param int depth: maximum number of free buffers kept for each (shape, dtype)."""
+    self.depth = depth
+    self._free = {}
+    self._lock = threading.Lock()
+    
+  def get(self, shape, dtype):
+    """Return a C-contiguous array of the given shape and dtype (content undefined)."""
+    key = (tuple(shape), np.dtype(dtype))
+    with self._lock:
+      free = self._free.get(key)
+      if free:
+        return free.pop()
+    return np.empty(key[0], dtype=key[1])
+    
+  def release(self, data):
+    """Give a buffer (or any view of it) back to the pool.
+    
+    The data must not be used by the caller afterwards.
+    """
+    if isinstance(data, RolloverView):
+      data = data.raw
+    while isinstance(data.base, np.ndarray):
+      data = data.base
+    if not data.flags['C_CONTIGUOUS'] or not data.flags['OWNDATA']:
+      return
+    key = (data.shape, data.dtype)
+    with self._lock:
+      free = self._free.setdefault(key, [])
+      if len(free) < self.depth and not any(buf is data for buf in free):
+        free.append(data)
+        
+  def clear(self):
+    """Drop all the free buffers (e.g. after a change of read mode)."""
+    with self._lock:
+      self._free.clear()
+      
+  def __repr__(self):
+    return "<BufferPool: %d free buffer(s) in %d size(s)>" % (sum(len(f) for f in self._free.values()), len(self._free))
+  
+#: Header stored with every frame of a :class:`FrameRing`: SDK index, time the frame was
+#: acquired (seconds since the epoch, see :meth:`AcqMode.frame_times`), exposure time (s)
+#: and shot number (-1 if unknown)
+FRAME_HEADER = np.dtype([('index', np.int64), ('timestamp', np.float64), ('exposure', np.float32), ('shot', np.int32)])
+
+class FrameRing(object):
+  """Bounded ring of frames with a single producer and any number of consumers.
+  
+  The producer (usually an :class:`AcquisitionThread`) publishes frames with :meth:`push`,
+  or reads them straight into the ring with :meth:`reserve` and :meth:`commit`;
+  consumers obtain a :class:`FrameReader` from :meth:`reader`, each with its own read cursor.
+  Frames are held in preallocated slots, each with a :data:`FRAME_HEADER`, and published
+  by incrementing a counter, so neither side takes a lock on the data path; consumers
+  only use a condition to sleep while no new frame is available.
+  
+  When the ring is full, the *policy* decides what happens:
+  
+  - ``'overwrite'`` (default): the oldest frames are overwritten, slow readers skip ahead
+    and count the missed frames in :attr:`FrameReader.overruns`.
+  - ``'drop'``: new frames are discarded until the slowest reader catches up,
+    they are counted in :attr:`dropped`.
+  
+  :Usage:
+  
+  >>> ring = FrameRing(64, cam.Acquire.frame_shape)
+  >>> reader = ring.reader()
+  >>> frames = reader.read(timeout=1)  # (n, *shape) array of the new frames
+  """
+  policies = ('overwrite', 'drop')
+  
+  def __init__(self, depth, shape, dtype=np.uint16, policy='overwrite'):
+    """
+    :param int depth: number of frames the ring can hold
+    :param shape: shape of a single frame
+    :param dtype: data type of the frames
+    :param policy: 'overwrite' or 'drop' (see above)
+    """
+    if policy not in self.policies:
+      raise ValueError('Invalid policy: ' + str(policy))
+    self.depth = depth
+    self.shape = list(shape)
+    self.policy = policy
+    #: frames and headers of the frames held in each slot
+    self._data, self._headers = self._allocate(dtype)
+    self._index = self._headers['index']
+    #: Shot number written in the headers of the next frames (-1: unknown)
+    self.shot = -1
+    #: Total number of frames published
+    self.written = 0
+    #: Number of frames discarded by the 'drop' policy
+    self.dropped = 0
+    self.closed = False
+    self._writing = 0
+    self._readers = weakref.WeakSet()
+    self._cond = threading.Condition()
+    
+  def _allocate(self, dtype):
+    return np.empty([self.depth] + self.shape, dtype=dtype), np.zeros(self.depth, dtype=FRAME_HEADER)
+    
+  def reader(self):
+    """Return a new :class:`FrameReader` starting at the next published frame."""
+    reader = FrameReader(self)
+    self._readers.add(reader)
+    return reader
+    
+  def push(self, frames, first_index=None, timestamp=None, exposure=0.0):
+    """Publish a (n, *shape) array of frames. Must only be called from the producer thread.
+    
+    :param first_index: SDK index of the first frame (defaults to the running count).
+    :param timestamp: time of the frames (scalar or one per frame), defaults to now.
+    :param exposure: exposure time (s) of the frames.
+    :returns: the number of frames actually published.
+    """
+    frames = frames.reshape([-1] + self.shape)
+    n = len(frames)
+    if first_index is None:
+      first_index = self.written + self.dropped + 1
+    if self.policy == 'drop':
+      cursors = [r.cursor for r in list(self._readers)]
+      if cursors:
+        free = self.depth - (self.written - min(cursors))
+        if free < n:
+          self.dropped += n - free
+          n = max(free, 0)
+    elif n > self.depth:
+      # only the last *depth* frames would survive anyway
+      self.written += n - self.depth
+      first_index += n - self.depth
+      frames = frames[n - self.depth:]
+      n = self.depth
+    if n > 0:
+      start = self.written
+      self._writing = start + n
+      slots = (start + np.arange(n)) % self.depth
+      self._data[slots] = frames[:n]
+      self._stamp(slots, first_index, timestamp, exposure)
+      self.written = start + n
+    with self._cond:
+      self._cond.notify_all()
+    return n
+    
+  def _stamp(self, slots, first_index, timestamp, exposure):
+    headers = self._headers
+    n = len(headers[slots])
+    headers['index'][slots] = first_index + np.arange(n)
+    if timestamp is None:
+      timestamp = time.time()
+    headers['timestamp'][slots] = np.broadcast_to(timestamp, (n,)) if np.ndim(timestamp) else timestamp
+    headers['exposure'][slots] = exposure
+    headers['shot'][slots] = self.shot
+    
+  def reserve(self, max_frames=None):
+    """Return the slots the next frames can be written to (e.g. by :meth:`AcqMode.drain`), then :meth:`commit` them.
+    
+    The slots are contiguous, so they stop at the end of the ring. The oldest
+    frames they hold are considered overwritten from now on. Only for the
+    'overwrite' policy, and from the producer thread.
+    
+    :returns: writable (m, *shape) view of the ring
+    """
+    if self.policy != 'overwrite':
+      raise ValueError("reserve is only available with the 'overwrite' policy")
+    start = self.written % self.depth
+    n = self.depth - start
+    if max_frames is not None:
+      n = min(n, max_frames)
+    self._writing = self.written + n
+    return self._data[start:start + n]
+    
+  def commit(self, n, first_index=None, timestamp=None, exposure=0.0):
+    """Publish the first n slots returned by :meth:`reserve` (see :meth:`push` for the arguments)."""
+    if first_index is None:
+      first_index = self.written + self.dropped + 1
+    start = self.written % self.depth
+    self._stamp(slice(start, start + n), first_index, timestamp, exposure)
+    self.written += n
+    self._writing = self.written # the slots reserved but not used are free again
+    with self._cond:
+      self._cond.notify_all()
+    
+  def close(self):
+    """Signal the consumers that no more frames will be published."""
+    self.closed = True
+    with self._cond:
+      self._cond.notify_all()
+      
+  def __len__(self):
+    return min(self.written, self.depth)
+    
+  def __repr__(self):
+    return "<FrameRing: %d/%d frames, %d written, %d dropped, policy '%s'>" % (len(self), self.depth, self.written, self.dropped, self.policy)
+
+class FrameReader(object):
+  """A consumer of a :class:`FrameRing`, see :meth:`FrameRing.reader`."""
+  def __init__(self, ring):
+    self.ring = ring
+    #: Number of frames published so far that this reader has consumed (or skipped)
+    self.cursor = ring.written
+    #: Number of frames overwritten before this reader could read them
+    self.overruns = 0
+    #: Headers of the frames returned by the last :meth:`read`, see :data:`FRAME_HEADER`
+    self.headers = np.zeros(0, dtype=FRAME_HEADER)
+    self._view = None
+    
+  @property
+  def available(self):
+    """Number of frames waiting to be read."""
+    return min(self.ring.written - self.cursor, self.ring.depth)
+    
+  @property
+  def index(self):
+    """SDK indices of the frames returned by the last :meth:`read`."""
+    return self.headers['index']
+    
+  def read(self, max_frames=None, timeout=None, copy=True):
+    """Return a (n, *shape) copy of the unread frames, oldest first.
+    
+    Blocks until at least one frame is available, the ring is closed or *timeout*
+    (in seconds) expires; in the last two cases the array may be empty.
+    
+    :param max_frames: maximum number of frames to return
+    :param bool copy: if False, return a read-only view of the ring instead of a copy
+                      (it stops at the end of the ring, the next read returns the rest).
+                      The producer may overwrite the frames of a view, check
+                      :meth:`overwritten` once done with them.
+    """
+    ring = self.ring
+    if ring.written == self.cursor and not ring.closed:
+      end = None if timeout is None else time.time() + timeout
+      with ring._cond:
+        # not Condition.wait_for, which python 2 does not have
+        while ring.written == self.cursor and not ring.closed:
+          remaining = None if end is None else end - time.time()
+          if remaining is not None and remaining <= 0:
+            break
+          ring._cond.wait(remaining)
+    while True:
+      written = ring.written
+      # the slots reserved by the producer are being overwritten too
+      oldest = max(written, ring._writing) - ring.depth
+      if self.cursor < oldest:
+        self.overruns += oldest - self.cursor
+        self.cursor = oldest
+      n = written - self.cursor
+      if max_frames is not None:
+        n = min(n, max_frames)
+      if not copy:
+        start = self.cursor % ring.depth
+        n = min(n, ring.depth - start)
+        data = ring._data[start:start + n]
+        data.flags.writeable = False
+        headers = ring._headers[start:start + n].copy()
+        self._view = self.cursor
+        break
+      slots = (self.cursor + np.arange(n)) % ring.depth
+      data = ring._data[slots]
+      headers = ring._headers[slots]
+      # the copy is only valid if the producer did not start overwriting the oldest slot meanwhile
+      if ring._writing - self.cursor <= ring.depth:
+        break
+    self.cursor += n
+    self.headers = headers
+    return data
+    
+  def overwritten(self):
+    """Whether the producer may have overwritten frames of the last view returned by ``read(copy=False)``."""
+    return self._view is not None and self.ring._writing - self._view > self.ring.depth
+    
+  def close(self):
+    """Stop following the ring (lets the 'drop' policy ignore this reader)."""
+    self.ring._readers.discard(self)
+
+class _PollingCondition(object):
+  """Stand-in for :class:`threading.Condition` when the producer is in another process."""
+  def __init__(self, interval=0.001):
+    self.interval = interval
+    
+  def __enter__(self):
+    return self
+    
+  def __exit__(self, *exc):
+    pass
+    
+  def notify_all(self):
+    pass
+    
+  def wait(self, timeout=None):
+    time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+
+class SharedFrameRing(FrameRing):
+  """A :class:`FrameRing` held in shared memory, that other processes can read.
   
+  The frames, their headers and the counters live in a :class:`multiprocessing.shared_memory.SharedMemory`
+  block, so the :class:`AcquisitionThread` reads the frames straight into shared memory,
+  and ``read(copy=False)`` maps them in the consumer without any copy. The producer creates the ring, consumers in other processes attach to it
+  by name with :meth:`attach` and read it with the usual :class:`FrameReader`,
+  which then polls for new frames. The producer does not know about readers in other
+  processes: the 'drop' policy only accounts for the readers of the producer's process.
+  
+  >>> ring = SharedFrameRing(64, cam.Acquire.frame_shape)
+  >>> cam.Acquire.start_reader(ring=ring)
+  >>> # in another process
+  >>> reader = SharedFrameRing.attach(ring.name).reader()
+  """
+  _HEADER = 4096 # counters, then the JSON layout
+  _COUNTERS = ('written', 'writing', 'dropped', 'closed', 'shot')
+  
+  def __init__(self, depth, shape, dtype=np.uint16, policy='overwrite', name=None):
+    """:param name: name of the shared memory block (chosen by the system if None)"""
+    if not WITH_SHM:
+      raise ImportError('multiprocessing.shared_memory (python 3.8+) is required')
+    self._name = name
+    super(SharedFrameRing, self).__init__(depth, shape, dtype, policy)
+    
+  def _allocate(self, dtype):
+    self._layout = {'depth': self.depth, 'shape': self.shape, 'dtype': np.dtype(dtype).str, 'policy': self.policy}
+    self._shm = shared_memory.SharedMemory(self._name, create=True, size=self._size(self._layout))
+    self._owner = True
+    layout = json.dumps(self._layout).encode()
+    self._shm.buf[64:64 + len(layout)] = layout
+    return self._map()
+    
+  @classmethod
+  def attach(cls, name):
+    """Map the ring created by another process."""
+    ring = cls.__new__(cls)
+    try:
+      shm = shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+      # python < 3.13 registers the block with the resource tracker, which would unlink
+      # it when this process exits: only the producer must own it
+      from multiprocessing import resource_tracker
+      register = resource_tracker.register
+      resource_tracker.register = lambda name, rtype: None
+      try:
+        shm = shared_memory.SharedMemory(name)
+      finally:
+        resource_tracker.register = register
+    ring._shm = shm
+    ring._owner = False
+    ring._layout = json.loads(bytes(shm.buf[64:cls._HEADER]).rstrip(b'\0').decode())
+    ring.depth = ring._layout['depth']
+    ring.shape = ring._layout['shape']
+    ring.policy = ring._layout['policy']
+    ring._data, ring._headers = ring._map()
+    ring._index = ring._headers['index']
+    ring._readers = weakref.WeakSet()
+    ring._cond = _PollingCondition()
+    return ring
+    
+  @classmethod
+  def _offset(cls, layout):
+    """Offset of the frames (after the headers, aligned on 64 bytes)."""
+    return (cls._HEADER + FRAME_HEADER.itemsize * layout['depth'] + 63) // 64 * 64
+    
+  @classmethod
+  def _size(cls, layout):
+    frame = int(np.prod(layout['shape'])) * np.dtype(layout['dtype']).itemsize
+    return cls._offset(layout) + frame * layout['depth']
+    
+  def _map(self):
+    """Map the counters, return the frames and headers arrays."""
+    layout = self._layout
+    buf = self._shm.buf
+    self._counters = np.ndarray(len(self._COUNTERS), np.int64, buf)
+    headers = np.ndarray(layout['depth'], FRAME_HEADER, buf, self._HEADER)
+    data = np.ndarray([layout['depth']] + layout['shape'], layout['dtype'], buf, self._offset(layout))
+    return data, headers
+    
+  @property
+  def name(self):
+    """Name of the shared memory block, to :meth:`attach` to."""
+    return self._shm.name
+    
+  def _counter(i):
+    def get(self):
+      return int(self._counters[i])
+    def set(self, value):
+      self._counters[i] = value
+    return property(get, set)
+  written = _counter(0)
+  _writing = _counter(1)
+  dropped = _counter(2)
+  closed = property(lambda self: bool(self._counters[3]), _counter(3).fset)
+  shot = _counter(4) # can be set by any process
+  del _counter
+  
+  def release(self):
+    """Unmap the ring; the producer also frees the shared memory.
+    
+    The arrays returned by the readers must not be used afterwards.
+    """
+    self._counters = self._data = self._headers = self._index = None
+    self._shm.close()
+    if self._owner:
+      self._shm.unlink()
+      
+  def __repr__(self):
+    return "<SharedFrameRing %s: %d/%d frames, %d written, %d dropped>" % (self.name, len(self), self.depth, self.written, self.dropped)
+
+class AcquisitionThread(threading.Thread):
+  """Reads frames from the camera in the background and publishes them to a :class:`FrameRing`.
+  
+  The thread blocks on ``WaitForAcquisitionTimeOut``, then fetches all the new images with
+  a single ``GetImages16``/``GetImages`` call (see :meth:`AcqMode.drain`). It terminates when
+  :meth:`stop` is called or when a finite acquisition (e.g. a kinetic series) is complete
+  and all images have been read.
+  
+  Usually created with :meth:`AcqMode.start_reader`.
+  """
+  def __init__(self, cam, depth=64, policy='overwrite', type=16, timeout=1000, sinks=(), ring=None):
+    """
+    :param cam: :class:`Andor` instance
+    :param int depth: number of frames held by the ring
+    :param policy: ring policy when full, see :class:`FrameRing`
+    :param type: (16 or 32) whether to read the data as 16 or 32-bits integers
+    :param int timeout: timeout (ms) of each wait, i.e. the maximum time to react to :meth:`stop`
+    :param sinks: objects with ``write(frames)`` and ``close()`` methods (e.g. :class:`HDF5Sink`),
+                  that are also given every frame, and closed when the thread terminates.
+    :param ring: publish to this ring (e.g. a :class:`SharedFrameRing`) instead of a new :class:`FrameRing`
+    """
+    super(AcquisitionThread, self).__init__(name='AndorReader')
+    self.daemon = True
+    self._cam = cam
+    self.type = type
+    self.timeout = timeout
+    if ring is None:
+      ring = FrameRing(depth, cam.Acquire.frame_shape, _dtype(type), policy)
+    self.ring = ring
+    #: Exposure time (s) written in the frame headers
+    self.exposure = cam.acquisitionTimings['exposure']
+    #: Number of images lost because they were overwritten in the camera's circular buffer
+    self.lost = 0
+    self.sinks = list(sinks)
+    #: Exception that terminated the thread, if any
+    self.error = None
+    self._last = 0
+    self._stopping = threading.Event()
+    
+  def run(self):
+    acq = self._cam.Acquire
+    try:
+      while not self._stopping.is_set():
+        sdk.WaitForAcquisitionTimeOut(self.timeout) # returns DRV_NO_NEW_DATA on timeout or CancelWait
+        read = False
+        while self._read(acq): # the frames may wrap around the end of the ring
+          read = True
+        if not read and not acq.running:
+          break
+    except Exception as error:
+      self.error = error
+    finally:
+      self.ring.close()
+      for sink in self.sinks:
+        sink.close()
+      
+  def _read(self, acq):
+    """Publish the new images, return False if there were none.
+    
+    With the 'overwrite' policy the images are read straight into the ring's slots.
+    """
+    direct = self.ring.policy == 'overwrite'
+    out = None
+    if direct:
+      # only reserve the slots of the images there are: the readers skip the reserved slots
+      new = acq.new_images
+      count = new['last'] - max(new['first'], acq._drained + 1) + 1
+      if count <= 0:
+        return False
+      out = self.ring.reserve(max_frames=count)
+    frames = np.asarray(acq.drain(type=self.type, out=out)) # a lazy roll-over correction is applied in place
+    if not len(frames):
+      if direct:
+        self.ring.commit(0)
+      return False
+    if acq.valid['first'] > self._last + 1:
+      self.lost += acq.valid['first'] - self._last - 1
+    times = acq.frame_times(acq.valid['first'], acq.valid['last'])
+    if direct:
+      self.ring.commit(len(frames), acq.valid['first'], times, self.exposure)
+    else:
+      self.ring.push(frames, acq.valid['first'], times, self.exposure)
+    for sink in self.sinks:
+      sink.write(frames)
+    if not direct:
+      self._cam.Buffers.release(frames)
+    self._last = acq.valid['last']
+    return True
+    
+  def stop(self, timeout=None):
+    """Ask the thread to terminate and wait for it."""
+    self._stopping.set()
+    sdk.CancelWait()
+    if self.is_alive() and threading.current_thread() is not self:
+      self.join(timeout)
+      
+  def __repr__(self):
+    return "<AcquisitionThread (%s): %r, %d lost>" % ("running" if self.is_alive() else "stopped", self.ring, self.lost)
+
+class HDF5Sink(object):
+  """Appends frames to a chunked, compressed HDF5 dataset from a background thread.
+  
+  The dataset is created resizable along its first axis with the metadata as
+  attributes; :meth:`write` only queues a copy of the frames, which a writer
+  thread appends to the dataset, flushing the file every *flush_interval*
+  seconds, so that the caller never waits on the disk (unless *max_pending*
+  frames are queued).
+  
+  >>> sink = HDF5Sink('shot.h5', 'spectra', cam.Acquire.frame_shape)
+  >>> sink.write(cam.Acquire.drain())
+  >>> sink.close()
+  
+  See also :meth:`AcqMode.stream_hdf`.
+  """
+  _STOP = None
+  
+  def __init__(self, filename, dataset, shape, dtype=np.uint16, compression='lzf', level=None,
+               chunk_frames=None, attrs=None, flush_interval=1.0, max_pending=1024):
+    """
+    :param filename: HDF5 file, created if needed
+    :param dataset: name of the dataset (must not already exist)
+    :param shape: shape of one frame
+    :param dtype: data type of the frames
+    :param compression: None, 'lzf', 'gzip' or 'blosc', see :func:`andorData.hdf5_compression`
+    :param level: compression level
+    :param chunk_frames: number of frames per chunk (default: about 1 MiB per chunk)
+    :param attrs: metadata written once as attributes of the dataset
+    :param flush_interval: time (s) between flushes of the file
+    :param max_pending: maximum number of queued writes before :meth:`write` blocks
+    """
+    if not WITH_H5PY:
+      raise ImportError('h5py is required to write HDF5 files')
+    shape = tuple(shape)
+    dtype = np.dtype(dtype)
+    if chunk_frames is None:
+      chunk_frames = max(1, 2**20 // max(1, int(np.prod(shape)) * dtype.itemsize))
+    self.filename = filename
+    self.name = dataset
+    self.flush_interval = flush_interval
+    self._file = h5py.File(filename, 'a')
+    self.dataset = self._file.create_dataset(dataset, shape=(0,) + shape, maxshape=(None,) + shape, dtype=dtype,
+                                             chunks=(chunk_frames,) + shape, **hdf5_compression(compression, level))
+    for key, value in (attrs or {}).items():
+      self.dataset.attrs[key] = value
+    self._frame_shape = shape
+    #: Number of frames written to the dataset
+    self.written = 0
+    #: Exception raised by the writer thread, if any
+    self.error = None
+    self._queue = queue.Queue(max_pending)
+    self._closed = False
+    self._thread = threading.Thread(target=self._run, name='HDF5Sink')
+    self._thread.daemon = True
+    self._thread.start()
+    
+  def write(self, frames):
+    """Queue a copy of frames ((n, *shape) array, or a single frame) to be appended."""
+    if self.error is not None:
+      raise self.error
+    if self._closed:
+      raise ValueError('write to a closed HDF5Sink')
+    frames = np.array(frames, dtype=self.dataset.dtype, copy=True)
+    if frames.shape == self._frame_shape:
+      frames = frames[np.newaxis]
+    if len(frames):
+      self._queue.put(frames)
+    
+  def _run(self):
+    flushed = time.time()
+    stop = False
+    while not stop:
+      try:
+        batch = [self._queue.get(timeout=self.flush_interval)]
+      except queue.Empty:
+        batch = []
+      # append everything that is queued with a single resize
+      while True:
+        try:
+          batch.append(self._queue.get_nowait())
+        except queue.Empty:
+          break
+      for i, frames in enumerate(batch):
+        if frames is self._STOP:
+          batch, stop = batch[:i], True
+          break
+      if self.error is not None:
+        continue # keep draining the queue so that write() never blocks
+      try:
+        if batch:
+          n = sum(len(frames) for frames in batch)
+          self.dataset.resize(self.written + n, axis=0)
+          for frames in batch:
+            self.dataset[self.written:self.written + len(frames)] = frames
+            self.written += len(frames)
+        if stop or time.time() - flushed > self.flush_interval:
+          self._file.flush()
+          flushed = time.time()
+      except Exception as error:
+        self.error = error
+    
+  def close(self):
+    """Write the queued frames and close the file. Raises the writer's error, if any."""
+    if not self._closed:
+      self._closed = True
+      self._queue.put(self._STOP)
+      self._thread.join()
+      self._file.close()
+    if self.error is not None:
+      raise self.error
+    
+  def __enter__(self):
+    return self
+    
+  def __exit__(self, *exc):
+    self.close()
+    
+  def __repr__(self):
+    return "<HDF5Sink %s:%s, %d frames written>" % (self.filename, self.name, self.written)
+
+
+class SpooledData(object):
+  """Images spooled to disk by the SDK, see :meth:`AcqMode_Kinetic.spool`.
+  
+  Behaves like a read-only (n, *shape) array that is loaded lazily: the spool
+  files are mapped with :class:`numpy.memmap` when the images are indexed,
+  so nothing is read until it is used. Images spooled after the object was
+  created are picked up as the files appear.
+  
+  >>> data = cam.Acquire.spool('/data/shot1234/spool')
+  >>> cam.Acquire.finish_spool()
+  >>> data[100:200, 10]     # row 10 of 100 images
+  
+  Only the raw formats ('raw', 'raw16' and 'raw32') can be indexed, the files written
+  in other formats are listed by :attr:`files`.
+  """
+  def __init__(self, path, format, shape, dtype, nimages):
+    """
+    :param path: stem of the spool files, as passed to SetSpool
+    :param format: key of :attr:`AcqMode_Kinetic.spool_formats`
+    :param shape: shape of one image
+    :param dtype: data type of the raw files
+    :param nimages: number of images in the series
+    """
+    self.path = path
+    self.format = format
+    self.image_shape = list(shape)
+    self.dtype = np.dtype(dtype)
+    self.nimages = nimages
+    self._frame_bytes = int(np.prod(shape)) * self.dtype.itemsize
+    self._complete = None
+    self._maps = {}
+    
+  @property
+  def raw(self):
+    """Whether the files hold raw images that can be indexed."""
+    return self.format in ('raw', 'raw16', 'raw32')
+    
+  @property
+  def files(self):
+    """The spool files written so far, in order."""
+    pattern = glob.escape(self.path) + ('*spool.dat' if self.raw else '*')
+    return sorted(glob.glob(pattern))
+    
+  def _index(self):
+    """Return a list of (file, first image, number of images)."""
+    if self._complete is not None:
+      return self._complete
+    index = []
+    first = 0
+    for name in self.files:
+      count = os.path.getsize(name) // self._frame_bytes
+      index.append((name, first, count))
+      first += count
+    if first >= self.nimages:
+      # all images written: the file list won't change anymore
+      self._complete = index
+    return index
+    
+  def _memmap(self, name, count):
+    if (name, count) not in self._maps:
+      self._maps[(name, count)] = np.memmap(name, self.dtype, 'r', shape=tuple([count] + self.image_shape))
+    return self._maps[(name, count)]
+    
+  def __len__(self):
+    return sum(count for name, first, count in self._index())
+    
+  @property
+  def shape(self):
+    return tuple([len(self)] + self.image_shape)
+    
+  def __getitem__(self, key):
+    if not self.raw:
+      raise TypeError("Images spooled as '%s' cannot be indexed, see SpooledData.files" % self.format)
+    if not isinstance(key, tuple):
+      key = (key,)
+    index = self._index()
+    n = sum(count for name, first, count in index)
+    if isinstance(key[0], (int, np.integer)):
+      i = key[0] + n if key[0] < 0 else key[0]
+      if not 0 <= i < n:
+        raise IndexError('image %d out of range (%d images spooled)' % (key[0], n))
+      for name, first, count in index:
+        if i < first + count:
+          return np.array(self._memmap(name, count)[(i - first,) + key[1:]])
+    images = np.arange(n)[key[0]]
+    data = np.empty([len(images)] + self.image_shape, self.dtype)
+    for name, first, count in index:
+      selected = (images >= first) & (images < first + count)
+      if selected.any():
+        data[selected] = self._memmap(name, count)[images[selected] - first]
+    return data[(slice(None),) + key[1:]]
+    
+  def __array__(self, dtype=None, copy=None):
+    data = self[:]
+    return data if dtype is None else data.astype(dtype)
+    
+  def __repr__(self):
+    return "<SpooledData %s (%s): %d/%d images>" % (self.path, self.format, len(self) if self.raw else len(self.files), self.nimages)
+
+
 class Andor(object):
   """High-level, object-oriented interface for Andor cameras (SDK v2).
   
@@ -177,16 +980,25 @@ class Andor(object):
     - Horizontal shift speed: second fastest.
   """
   
-  def __init__(self, init=True, lib=None):#"/usr/local/etc/andor/"):
+  def __init__(self, init=True, lib=None, camera=None):#"/usr/local/etc/andor/"):
     """Initialize the camera and returns a user-friendly interface. 
     
     :param bool init:  set to False to skip the camera initialisation
                        (if it has been initialised already).
     :param lib: location of the Andor library.
+    :param int camera: index of the camera to use when several are installed (see
+                       :func:`AvailableCameras`). The SDK talks to one current camera
+                       per process: to use several at once, see :mod:`andorMulti`.
     """
+    if camera is not None:
+      handle = ctypes.c_int32()
+      sdk.GetCameraHandle(camera, ctypes.byref(handle))
+      sdk.SetCurrentCamera(handle.value)
     if init:
       sdk.Initialize(lib)
     self._cam = self
+    #: Pool of recycled frame buffers, see :class:`BufferPool`
+    self.Buffers = BufferPool()
     self.Info = Info()
     self.Temperature = Temperature(self)
     try:
@@ -199,6 +1011,16 @@ class Andor(object):
     self.ReadMode = ReadModes(self.Info.capabilities._ReadModes, {"_cam": self})
     self._AcqMode = AcqModes(self.Info.capabilities._AcqModes, {"_cam": self})
     self._TriggerMode = TriggerModes(self.Info.capabilities._TriggerModes, {"_cam": self})
+    self.ReadMode.on_change += [self.Buffers.clear, self._AcqMode.invalidate]
+    # settings changed outside Config.apply are set again by the next apply
+    for obj, name in ((self.ReadMode, 'read_mode'),
+                      (self.Detector.OutputAmp, 'output_amp'),
+                      (self.Detector.ADC, 'adc'),
+                      (self.Detector.HSS, 'hss'),
+                      (self.Detector.VSS, 'vss'),
+                      (self.Detector.PreAmp, 'preamp')):
+      obj.on_change.append(functools.partial(self._forget, name))
+    self._query_static()
 
     self.TriggerMode = self._TriggerMode.External #External
     self.TriggerMode()
@@ -206,16 +1028,51 @@ class Andor(object):
     self.ReadMode.Image()
     self.Acquire = self._AcqMode.Single
     self.Acquire()#start=False)
+    #: Last :class:`andorConfig.Config` applied (see :meth:`andorConfig.Config.apply`)
+    self.config = None
+    self._closed = False
     
     
-  def __del__(self):
+  def close(self):
+    """Stop the acquisition, close the shutter and shut the SDK down (only the first time)."""
+    if getattr(self, '_closed', True):
+      return
+    self._closed = True
     self.Acquire.stop()
     try:
       self.Shutter.Close()
     except AttributeError:
       pass
     sdk.ShutDown()
-  
+    
+  def __del__(self):
+    self.close()
+    
+  def _forget(self, *names):
+    """Drop settings from :attr:`config` after they were changed directly, so that
+    the next :meth:`andorConfig.Config.apply` sets them again."""
+    config = getattr(self, 'config', None)
+    if config is not None:
+      self.config = config.replace(**dict((name, None) for name in names))
+  
+  def _query_static(self):
+    """Query (and cache) the static hardware facts once, see :func:`cached`."""
+    for obj, name in ((self.Temperature, 'range'),
+                      (self.Temperature, 'precision'),
+                      (self.EM, 'range'),
+                      (self.Detector.OutputAmp, 'number'),
+                      (self.Detector.OutputAmp, 'max_speed'),
+                      (self.Detector.ADC, 'number'),
+                      (self.Detector.ADC, 'bit_depths'),
+                      (self.Detector, 'pixel_size'),
+                      (self.Detector.PreAmp, 'gains'),
+                      (self.Detector.HSS, 'speeds'),
+                      (self.Detector.VSS, 'fastestRecommended')):
+      try:
+        getattr(obj, name)
+      except sdk.AndorError: # not supported by this camera
+        pass
+      
   @property
   def exposure(self):
     """Query or set the exposure time, in ms."""
@@ -225,6 +1082,8 @@ class Andor(object):
   @while_acquiring
   def exposure(self, value):
       sdk.SetExposureTime(ctypes.c_float(value/1000.0))
+      self._AcqMode.invalidate() # the size of the circular buffer depends on the exposure
+      self._forget('exposure')
 
   @property 
   def acquisitionTimings(self):
@@ -341,12 +1200,15 @@ class OutputAmp(object):
   """
   def __init__(self):
     self._active = 0
+    #: Functions called after the amplifier is changed
+    self.on_change = []
     self.__call__(0)
   
   def __repr__(self):
     return "<Currently active amplifier: " + self.description()+ ". Number of available amplifiers: "+ str(self.number)+'>'
   
   @property
+  @cached
   def number(self):
     """Returns the number of available amplifiers."""
     noAmp = ctypes.c_int32()
@@ -354,9 +1216,10 @@ class OutputAmp(object):
     return noAmp.value
 
   @property
+  @cached
   def max_speed(self):
     """ Maximum available horizontal shift speed for the amplifier currently selected."""
-    speed = ctypes.c_int32()
+    speed = ctypes.c_float()
     sdk.GetAmpMaxSpeed(self._active, ctypes.byref(speed))
     return speed.value
   
@@ -368,6 +1231,8 @@ class OutputAmp(object):
     amp = ctypes.c_int32(amp)
     sdk.SetOutputAmplifier(amp)
     self._active = amp.value
+    invalidate(self, 'max_speed')
+    _fire(self.on_change)
     
   @property
   def active(self):
@@ -437,11 +1302,15 @@ class HSS(object):
   >>> hss(0)            # set speed to hss.speeds[0]
   
   """
-  # might be a good idea to not call the SDK functions every time...
+  # The available speeds are cached, and invalidated when the amplifier or ADC change.
   def __init__(self, OutAmp):
     """:param OutAmp: :class:`OutputAmp` instance."""
     self.ADC = ADC(self)
     self.OutputAmp = OutAmp
+    #: Functions called after the speed is changed
+    self.on_change = []
+    self.ADC.on_change.append(self.invalidate)
+    self.OutputAmp.on_change.append(self.invalidate)
     self.__call__(0) # default to second fastest speed.
     self.choose = self.__call__
     self.list_settings = []
@@ -451,7 +1320,12 @@ class HSS(object):
   def info(self):
     return self.__repr__()
  
+  def invalidate(self):
+    """Forget the cached speeds (called when the amplifier or ADC channel change)."""
+    invalidate(self)
+ 
   @property
+  @cached
   def number(self):
     """Return the number of HS speeds available."""
     noHSSpeed = ctypes.c_int32()
@@ -459,6 +1333,7 @@ class HSS(object):
     return noHSSpeed.value
   
   @property
+  @cached
   def speeds(self):
     """Return a dictionary of available speeds {index: speed (MHz),... }."""
     speed = ctypes.c_float()
@@ -481,6 +1356,7 @@ class HSS(object):
       choice = index
     sdk.SetHSSpeed(self.OutputAmp.active, choice)
     self.current = self.speeds[choice]
+    _fire(self.on_change)
 
     
   def _gui(self, tkcanvas):
@@ -525,6 +1401,8 @@ class VSS(object):
   
   """
   def __init__(self):
+    #: Functions called after the speed is changed
+    self.on_change = []
     noVSSpeed = ctypes.c_int32()
     sdk.GetNumberVSSpeeds(ctypes.byref(noVSSpeed))
     #: Number of available settings
@@ -558,8 +1436,10 @@ class VSS(object):
 
     sdk.SetVSSpeed(choice)
     self.current = self.speeds[choice]
+    _fire(self.on_change)
   
   @property
+  @cached
   def fastestRecommended(self):
     """Query the fastest recommended speed (in us)."""
     index = ctypes.c_int32()
@@ -626,6 +1506,8 @@ class ADC(object):
   """
   def __init__(self, HSS=None):
     self.HSS = HSS
+    #: Functions called after the channel is changed
+    self.on_change = []
     self.channel = 0
     # Don't finalise initialisation here as HSS.__init__() may not have completed yet!
   
@@ -642,6 +1524,7 @@ class ADC(object):
     return adc
       
   @property
+  @cached
   def number(self):
     """Returns the number of analog-to-digital converters."""
     chans = ctypes.c_int32()
@@ -657,13 +1540,23 @@ class ADC(object):
   def channel(self, chan):
     sdk.SetADChannel(chan)
     self._channel = chan
+    _fire(self.on_change)
+    
+  @property
+  @cached
+  def bit_depths(self):
+    """Returns the dynamic range of every AD converter."""
+    depth = ctypes.c_int32()
+    depths = []
+    for channel in range(self.number):
+      sdk.GetBitDepth(channel, ctypes.byref(depth))
+      depths.append(depth.value)
+    return tuple(depths)
     
   @property
   def bit_depth(self):
     """Returns the dynamic range of the currently selected AD converter."""
-    depth = ctypes.c_int32()
-    sdk.GetBitDepth(self._channel, ctypes.byref(depth))
-    return depth.value
+    return self.bit_depths[self._channel]
     
   def __repr__(self):
     return "Currently selected A/D converter: "+ str(self.channel) +" ("+str(self.bit_depth) + " bits).\nPossible settings are: " + str(self.ADConverters)
@@ -709,6 +1602,7 @@ class EM(object):
     self._mode = self.modes["default"]
   
   @property
+  @cached
   def range(self):
     """Query the range of valid EM gains."""
     low = ctypes.c_int32()
@@ -737,6 +1631,7 @@ class EM(object):
     # only update the sensor gain if EM gain is ON:
     if self._switch:
       sdk.SetEMCCDGain(value)
+    self._cam._forget('em_gain')
   
   def __call__(self, gain=None):
     """Set or query the current setting."""
@@ -750,12 +1645,14 @@ class EM(object):
     """Turn on the EM gain."""
     sdk.SetEMCCDGain(self._gain)
     self._switch = True
+    self._cam._forget('em_gain')
   
   @while_acquiring  
   def off(self):
     """Turn off the EM gain."""
     sdk.SetEMCCDGain(0)
     self._switch = False
+    self._cam._forget('em_gain')
     
   @property
   def is_on(self):
@@ -795,6 +1692,7 @@ class EM(object):
     state2 = ctypes.c_int32(int(state))
     sdk.SetEMAdvanced(state2)
     self._advanced = state
+    invalidate(self, 'range')
     
   @property
   def mode(self):
@@ -817,7 +1715,8 @@ class EM(object):
     else:
       value = mode
     sdk.SetEMGainMode(value)
-    self._mode
+    self._mode = value
+    invalidate(self, 'range')
 
     
   def _gui(self, tkcanvas):
@@ -886,6 +1785,7 @@ class Temperature(object):
     self._cooler = None
     
   @property
+  @cached
   def range(self):
     """Return the valid range of temperatures in centigrade to which the detector can be cooled."""
     tmin = ctypes.c_int32()
@@ -895,6 +1795,7 @@ class Temperature(object):
     return (tmin.value, tmax.value)
   
   @property
+  @cached
   def precision(self):
     """Return the number of decimal places to which the sensor temperature can be returned.""" 
     precision = ctypes.c_int32()
@@ -909,10 +1810,11 @@ class Temperature(object):
   @setpoint.setter
   def setpoint(self, value):
     """Change the setpoint."""
-    tmin,tmax = self.range()
+    tmin,tmax = self.range
     value = max(tmin, min(value, tmax)) #force value between ends
     sdk.SetTemperature(int(value))
     self._setpoint = value
+    self._cam._forget('temperature')
     
   @property
   def read(self):
@@ -942,6 +1844,7 @@ class Temperature(object):
     else:
       sdk.CoolerOFF()
       self._cooler = 0
+    self._cam._forget('cooler')
     
   def __repr__(self):
     return "Current temperature: " + str(self.read) + ", cooler: "+ ("ON" if self.cooler else "OFF") + ", setpoint: " + str(self.setpoint)+"."
@@ -997,9 +1900,10 @@ class PreAmp(object):
   """
   def __init__(self):
     #self._cam = cam
+    #: Functions called after the gain is changed
+    self.on_change = []
     #: Number of PreAmp settings available.
     self.number = self._number()
-    self.gains = self.list_gains()
     self.__call__(0)
     self.choose = self.__call__
   
@@ -1017,6 +1921,12 @@ class PreAmp(object):
       sdk.GetPreAmpGain(index, ctypes.byref(gain))
       gain_list[index] = gain.value
     return gain_list
+    
+  @property
+  @cached
+  def gains(self):
+    """Dictionary {index: gain, ...} of the available settings, see :meth:`list_gains`."""
+    return self.list_gains()
   
   @while_acquiring
   def __call__(self, index=None):
@@ -1029,6 +1939,7 @@ class PreAmp(object):
       choice = index
     sdk.SetPreAmpGain(choice)
     self._gain = {"index": choice, "value": self.gains[choice]}
+    _fire(self.on_change)
     
   @property
   def gain(self):
@@ -1081,6 +1992,7 @@ class Shutter(object):
     self.state = None
                
   @property 
+  @cached
   def MinTransferTimes(self):
     minclosingtime = ctypes.c_int32()
     minopeningtime = ctypes.c_int32()
@@ -1136,11 +2048,10 @@ class Detector(object):
     self.ADC = self.HSS.ADC
     self.PreAmp = PreAmp() 
     self.size = self._size
-    #: 
-    self.pixel_size = self._pixel_size
   
   @property
-  def _pixel_size(self):
+  @cached
+  def pixel_size(self):
     """Returns the dimension of the pixels in the detector in microns."""
     xSize = ctypes.c_float()
     ySize = ctypes.c_float()
@@ -1227,12 +2138,26 @@ class ReadModes(_AddCapabilities):
   """ This class is just container for the available ReadMode_XXX classes """
   # It's little more than an alias for _AddCapabilities
   def __init__(self, caps, ref = {}):
+    #: Functions called after the read mode (or its settings) is changed
+    self.on_change = []
     super(ReadModes, self).__init__(caps, ref)
     self._index = {0:self.FullVerticalBinning.__call__,
                    1:self.MultiTrack.__call__,
                    2:self.RandomTrack.__call__,
                    3:self.SingleTrack.__call__,
                    4:self.Image.__call__}
+    if hasattr(self, 'MultiTrackScan'):
+      self._index[5] = self.MultiTrackScan.__call__
+    
+  @property
+  def current(self):
+    """The current ReadMode_XXX object."""
+    return self._current
+    
+  @current.setter
+  def current(self, mode):
+    self._current = mode
+    _fire(self.on_change)
     
   def __repr__(self):
     return "Current Read mode : " + self.current._name
@@ -1251,11 +2176,27 @@ class ReadMode(Capability):
     - :class:`ReadMode_FullVerticalBinning`
     - :class:` ReadMode_MultiTrack`
     - :class:`ReadMode_RandomTrack`
+    - :class:`ReadMode_MultiTrackScan`
      
   """
+  #: horizontal binning of the tracks
+  hbin = 1
+  
   #Doesn't do anything but makes the class hierachy more sensible. 
   def __init__(self, typ, name, code, caps):
     super(ReadMode, self).__init__(typ, name, code, caps)  
+    
+  def _set_hbin(self, function, hbin):
+    """Set the horizontal binning of the tracks with the SDK function *function* (by name).
+    
+    The SDK is only called if the binning is or was not 1, so that SDK versions
+    without the function still work unbinned.
+    """
+    if hbin < 1 or self._cam.Detector.width % hbin:
+      raise ValueError('The horizontal binning (%d) must divide the detector width (%d)' % (hbin, self._cam.Detector.width))
+    if hbin != 1 or self.hbin != 1:
+      getattr(sdk, function)(hbin)
+    self.hbin = hbin
 
   def _gui(self, tkcanvas): #do nothing if called
     self.__call__() #assumes no necessary argument calls
@@ -1269,33 +2210,39 @@ class ReadMode_FullVerticalBinning(ReadMode):
   def __init__(self, typ, name, code, caps):
     super(ReadMode_FullVerticalBinning, self).__init__(typ, name, code, caps)
     
-  def __call__(self):
-    """Set the camera in FVB mode."""
+  def __call__(self, hbin=1):
+    """Set the camera in FVB mode.
+    
+    :param hbin: horizontal binning, in pixels
+    """
     sdk.SetReadMode(0)
+    self._set_hbin('SetFVBHBin', hbin)
+    self.ndims = 1
+    self.shape = [self._cam.Detector.width // hbin]
+    self.pixels = self.shape[0]
     self.ReadMode.current = self
-    self.shape = [1]
-    self.shape = self._cam.Detector.width
-    self.pixels = self._cam.Detector.width
     
 class ReadMode_SingleTrack(ReadMode):
   """Single Track mode."""
   def __init__(self, typ, name, code, caps):
     super(ReadMode_SingleTrack, self).__init__(typ, name, code, caps)
     
-  def __call__(self, center, height):
+  def __call__(self, center, height, hbin=1):
     """Set and configure the Readout Mode to Single Track.
     
     :param center: position of track center (in pixel)
     :param height: track height (in pixels)
+    :param hbin: horizontal binning, in pixels
     """
     sdk.SetReadMode(3)
     sdk.SetSingleTrack(center, height)
+    self._set_hbin('SetSingleTrackHBin', hbin)
     self._center = center
     self._height = height
-    self._cam.ReadMode.current = self
-    self.pixels = self._cam.Detector.width
+    self.pixels = self._cam.Detector.width // hbin
     self.ndims = 1
-    self.shape = [self._cam.Detector.width]
+    self.shape = [self.pixels]
+    self._cam.ReadMode.current = self
   
   @property
   def center(self):
@@ -1371,30 +2318,33 @@ class ReadMode_MultiTrack(ReadMode):
   def __init__(self, typ, name, code, caps):
     super(ReadMode_MultiTrack, self).__init__(typ, name, code, caps)
     
-  def __call__(self, number, height, offset):
+  def __call__(self, number, height, offset, hbin=1):
     """
     :param number: number of tracks
     :param height: height of tracks, in pixels
     :param offset: first track offset, in pixels
+    :param hbin: horizontal binning, in pixels
     """   
     sdk.SetReadMode(1)
     gap = ctypes.c_int32()
     bottom = ctypes.c_int32()
                                 
     sdk.SetMultiTrack(number, height, offset, ctypes.byref(bottom), ctypes.byref(gap))
+    self._set_hbin('SetMultiTrackHBin', hbin)
     self.number = number
     self.height = height
     self.offset = offset
     self.bottom = bottom.value
     self.gap = gap.value
-    self._cam.ReadMode.current = self
-    self.pixels = self._cam.Detector.width * self.number
+    width = self._cam.Detector.width // hbin
+    self.pixels = width * self.number
     if self.number == 1:
       self.ndims = 1
-      self.shape= [self._cam.Detector.width]
+      self.shape= [width]
     else:
       self.ndims = 2
-      self.shape= [self.number, self._cam.Detector.width]
+      self.shape= [self.number, width]
+    self._cam.ReadMode.current = self
 
 
   def _gui(self, tkcanvas):
@@ -1456,11 +2406,12 @@ class ReadMode_RandomTrack(ReadMode):
   def __init__(self, typ, name, code, caps):
     super(ReadMode_RandomTrack, self).__init__(typ, name, code, caps)
     
-  def __call__(self, numTracks, areas):
+  def __call__(self, numTracks, areas, hbin=1):
     """Set the camera in RandomTrack mode.
     
     :param int numTracks: number of tracks:
     :param areas: track parameters: tuple (start1, stop1, start2, stop2, ...)
+    :param hbin: horizontal binning, in pixels (``SetCustomTrackHBin``)
     """
     #cdef np.ndarray[np.int_t, mode="c", ndim=1] areasnp = np.ascontiguousarray(np.empty(shape=6, dtype = np.int))
     #cdef np.ndarray[np.int_t, mode="c", ndim=1] areasnp = np.ascontiguousarray(areas, dtype=np.int32)# np.int) #UPDATE
@@ -1469,21 +2420,57 @@ class ReadMode_RandomTrack(ReadMode):
 
     sdk.SetReadMode(2) #UPDATE
     print(areasnp)
-    sdk.SetRandomTracks(numTracks, ctypes.c_void_p(areasnp.ctypes.data))
+    sdk.SetRandomTracks(numTracks, areasnp.ctypes.data_as(sdk.c_int32_p))
+    self._set_hbin('SetCustomTrackHBin', hbin)
     self.numTracks = numTracks
     self.areas = areas
-    self._cam.ReadMode.current = self
-    self.pixels = self._cam.Detector.width * self.numTracks
+    # detector rows covered by the tracks (0-based) and the track of each of them
+    starts, heights = areasnp[0:2*numTracks:2] - 1, areasnp[1:2*numTracks:2] - areasnp[0:2*numTracks:2] + 1
+    offsets = np.cumsum(heights) - heights
+    self._rows = np.arange(heights.sum()) + np.repeat(starts - offsets, heights)
+    self._row_tracks = np.repeat(np.arange(numTracks), heights)
+    #: Track of every detector row (-1 outside of the tracks)
+    self.track_map = np.full(self._cam.Detector.height, -1, dtype=np.int32)
+    self.track_map[self._rows] = self._row_tracks
+    width = self._cam.Detector.width // hbin
+    self.pixels = width * self.numTracks
     if self.numTracks == 1:
       self.ndims = 1
-      self.shape= [self._cam.Detector.width]
+      self.shape= [width]
     else:
       self.ndims = 2
-      self.shape= [self.numTracks, self._cam.Detector.width]
+      self.shape= [self.numTracks, width]
+    self._cam.ReadMode.current = self
       
-  def data_to_image(self, data):
-    """Forms an image from Random Track data."""
-    raise NotImplementedError
+  def data_to_image(self, data, fill=0, out=None):
+    """Forms an image from Random Track data: every track is spread over the detector rows it covers.
+    
+    A batch of frames is placed with a single indexing operation, so it is cheap
+    enough to overlay the tracks live.
+    
+    :param data: one frame (tracks, width) or a batch (N, tracks, width) 
+                 ((width,) or (N, width) with a single track)
+    :param fill: value of the rows outside of the tracks
+    :param out: optional array (height, width) or (N, height, width) to fill
+    :return: image (height, width) or images (N, height, width)
+    
+    >>> cam.ReadMode.RandomTrack(2, (10, 19, 300, 339))
+    >>> images = cam.ReadMode.current.data_to_image(cam.Acquire.Images(1, 100))
+    >>> images.shape
+    (100, 512, 2048)
+    """
+    data = np.asarray(data)
+    if self.numTracks == 1:
+      data = data[..., np.newaxis, :]
+    if data.ndim < 2 or data.shape[-2] != self.numTracks:
+      raise ValueError('Random Track data of %d tracks expected, got shape %s' % (self.numTracks, data.shape))
+    shape = data.shape[:-2] + (self._cam.Detector.height, data.shape[-1])
+    if out is None:
+      out = np.full(shape, fill, dtype=data.dtype)
+    else:
+      out[...] = fill
+    out[..., self._rows, :] = data[..., self._row_tracks, :]
+    return out
 
   def _gui(self, tkcanvas):
     self.frames = [tkinter.Label(tkcanvas,text='Random Track not accessible through this GUI interface')]
@@ -1492,42 +2479,114 @@ class ReadMode_RandomTrack(ReadMode):
     self.frames[1].pack()
 
     
+class ReadMode_MultiTrackScan(ReadMode):
+  """Multi-track scan mode."""
+  def __init__(self, typ, name, code, caps):
+    super(ReadMode_MultiTrackScan, self).__init__(typ, name, code, caps)
+    
+  def __call__(self, number, height, offset=0, gap=0, h=None, binning=(1, 1), skip=0, subframes=1):
+    """Set the camera in Multi-track scan mode: *number* tracks of *height* rows,
+    *gap* rows apart, read over the columns *h* and binned within each track.
+    
+    The frames are ``subframes * number * height // vbin`` rows of
+    ``(h[1]-h[0]+1) // hbin`` pixels (1D when that is a single row).
+    
+    :param number: number of tracks
+    :param height: height of the tracks, in pixels (a multiple of vbin)
+    :param offset: rows below the first track
+    :param gap: rows between two tracks
+    :param h: (first, last) columns, 1-based and inclusive (default: the whole width)
+    :param binning: (hbin, vbin) binning within the tracks
+    :param skip: tracks skipped between two tracks read
+    :param subframes: number of sub-frames per frame
+    """
+    (hbin, vbin) = binning
+    h = (1, self._cam.Detector.width) if h is None else h
+    width = h[1] - h[0] + 1
+    if width < 1 or width % hbin or height % vbin:
+      raise ValueError('The tracks (%dx%d pixels) must be a multiple of the binning %s' % (width, height, (hbin, vbin)))
+    sdk.SetReadMode(5)
+    sdk.SetMultiTrackScan(height, number, h[0], h[1], hbin, vbin, gap, offset, skip, subframes)
+    self.number = number
+    self.height = height
+    self.offset = offset
+    self.gap = gap
+    self.h = tuple(h)
+    self.binning = (hbin, vbin)
+    self.hbin = hbin
+    self.skip = skip
+    self.subframes = subframes
+    rows = subframes * number * (height // vbin)
+    self.pixels = rows * (width // hbin)
+    if rows == 1:
+      self.ndims = 1
+      self.shape = [width // hbin]
+    else:
+      self.ndims = 2
+      self.shape = [rows, width // hbin]
+    self._cam.ReadMode.current = self
+    
+    
 class ReadMode_Image(ReadMode):
-  """Full image mode."""
+  """Full image mode, with optional hardware binning, sub-area and isolated crop."""
   def __init__(self, typ, name, code, caps):
     super(ReadMode_Image, self).__init__(typ, name, code, caps)
+    self.isolated_crop = False
     
   def __call__(self, binning=None, h=None, v=None, isolated_crop=False):
     """Set Readout mode to Image, with optional binning and sub-area coordinates.
     
-    NOTE: binning and subarea not implemented yet. 
+    Coordinates are in unbinned detector pixels, 1-based and inclusive (as in the SDK),
+    and the size of the sub-area must be a multiple of the binning. The frames are
+    ``[rows, columns] = [(v[1]-v[0]+1)//vbin, (h[1]-h[0]+1)//hbin]``.
+    
+    In isolated crop mode the sensor is reduced to the sub-area (``SetIsolatedCropModeEx``):
+    the rows above it are not shifted at all, so that a narrow strip is read much
+    faster than the same sub-area of the full sensor. No light must fall outside of the
+    sub-area, and the camera must support it (see ``Info.capabilities.SetFunctions``).
     
     :param binning: (hbin, vbin)
-    :param h: (left, right) horizontal coordinates (in binned pixels)
-    :param v: (top, bottom) vertical coordinates
-    :param isolated_crop: ?
+    :param h: (first, last) columns
+    :param v: (first, last) rows
+    :param isolated_crop: crop the sensor to the sub-area
     :type isolated_crop: bool
     
-    .. Warning:: this nay be buggy/not working
-    
+    >>> cam.ReadMode.Image(binning=(1, 4), v=(201, 240), isolated_crop=True)
+    >>> cam.ReadMode.current.shape
+    [10, 2048]
     """
-    #NOTE: this is probably buggy 
-    sdk.SetReadMode(4) #UPDATE
-    # process **kwargs and set Image parameters if they are defined:  
     (hbin, vbin) = (1, 1) if binning is None else binning
     h = (1, self._cam.Detector.width) if h is None else h
     v = (1, self._cam.Detector.height) if v is None else v
-    #(hsize, vsize) = self._cam.Detector.size if size is None else size
-    #(h0, v0) = (1, 1) if lower_left is None else lower_left
-    #if not None in (binning, size, lower_left):
-    sdk.SetImage(hbin, vbin, h[0], h[1], v[0], v[1])
-    #if isolated_crop:
-    #  andorError(SetIsolatedCropMode(isolated_crop, hsize * hbin, vbin, hbin))
-    
-    self._cam.ReadMode.current = self
-    self.shape = [h[1] - h[0] + 1, v[1] - v[0] + 1]
+    width = h[1] - h[0] + 1
+    height = v[1] - v[0] + 1
+    if width < 1 or height < 1 or width % hbin or height % vbin:
+      raise ValueError('The sub-area (%dx%d pixels) must be a multiple of the binning %s' % (width, height, (hbin, vbin)))
+    sdk.SetReadMode(4)
+    self._crop(isolated_crop, width, height, hbin, vbin, h[0], v[0])
+    if isolated_crop: # the coordinates are relative to the cropped sensor
+      sdk.SetImage(hbin, vbin, 1, width, 1, height)
+    else:
+      sdk.SetImage(hbin, vbin, h[0], h[1], v[0], v[1])
+    self.binning = (hbin, vbin)
+    self.h = tuple(h)
+    self.v = tuple(v)
+    self.shape = [height // vbin, width // hbin]
     self.pixels = self.shape[0] * self.shape[1]
     self.ndims = 2
+    self._cam.ReadMode.current = self
+    
+  def _crop(self, enable, width, height, hbin, vbin, left, bottom):
+    """Turn the isolated crop mode on or off (left untouched if it was never turned on)."""
+    if enable and not self._cam.Info.capabilities.SetFunctions["Crop mode"]:
+      raise RuntimeError('This camera does not support the isolated crop mode')
+    if enable and (left, bottom) != (1, 1):
+      if not self._cam.Info.capabilities.SetFunctions["Extended crop mode"]:
+        raise RuntimeError('This camera only supports the isolated crop mode from the corner of the sensor (1, 1)')
+      sdk.SetIsolatedCropModeEx(1, height, width, vbin, hbin, left, bottom)
+    elif enable or self.isolated_crop:
+      sdk.SetIsolatedCropMode(int(enable), height, width, vbin, hbin)
+    self.isolated_crop = bool(enable)
     
     
 # AcqModes capabilities
@@ -1549,6 +2608,14 @@ class AcqModes(_AddCapabilities):
   def __init__(self, caps, ref = {}):
     super(AcqModes, self).__init__(caps, ref)
     self.current = None
+    #: whether the frame transfer mode is on (see the Kinetic and Video modes)
+    self.frame_transfer = False
+    
+  def invalidate(self):
+    """Forget the values cached by the acquisition modes (called when the read mode changes)."""
+    for mode in list(self.__dict__.values()):
+      if isinstance(mode, AcqMode):
+        invalidate(mode)
     
   def __repr__(self):
     return "Current Acquisition mode : " + self.current._name
@@ -1563,6 +2630,7 @@ class AcqMode(Capability):
      - :class:`AcqMode_Single`
      - :class:`AcqMode_Accumulate`
      - :class:`AcqMode_Kinetic`
+     - :class:`AcqMode_FastKinetics`
 
   """
   # The parent class for all acquisition modes. 
@@ -1570,19 +2638,50 @@ class AcqMode(Capability):
   def __init__(self, typ, name, code, caps):
     super(AcqMode, self).__init__(typ, name, code, caps)
     self.current = None
-    self.rollover = False
+    self.rollover = False # True: correct the ADC roll-over in place, 'lazy': see RolloverView
     self.snapshot_count = 0
     self.last_snap_read = 0
+    self.reader = None
+    self.valid = None
+    self._drained = 0
+    self._drain_retries = 3 # times drain reads the range again after the images were overwritten meanwhile
+    self.start_time = None # time.time() when start() was called
+    self._hardware_times = False # whether the SDK time stamps the frames, see frame_times()
+    self._first_frame_time = None # time of the first frame from the SDK metadata, read once per acquisition
     
     self._index = {1:self.Single,
                    2:self.Accumulate,
                    3:self.Kinetic,
+                   4:self.FastKinetics,
                    5:self.Video}
 
   # Acquisition control
 
   def __getitem__(self, num):
     return self._index[num]
+    
+  @property
+  def frame_shape(self):
+    """Shape of an image: the shape of the read mode, unless the acquisition mode defines its own."""
+    return self._cam.ReadMode.current.shape
+    
+  @property
+  def frame_pixels(self):
+    """Number of pixels in an image."""
+    return int(np.prod(self.frame_shape))
+    
+  @property
+  def cycle_time(self):
+    """Time (s) between two images of the series."""
+    return self._cam.acquisitionTimings['kinetic']
+    
+  def _frame_transfer(self, enable):
+    """Turn the frame transfer mode on or off (left untouched if it was never turned on)."""
+    if enable and not self._cam.Info.capabilities.AcqModes["Frame transfer"]:
+      raise RuntimeError('This camera does not support frame transfer')
+    if enable or self.AcqMode.frame_transfer:
+      sdk.SetFrameTransferMode(int(enable))
+      self.AcqMode.frame_transfer = bool(enable)
   
   @property
   def status(self):
@@ -1594,21 +2693,118 @@ class AcqMode(Capability):
   @property
   def running(self):
     """Query whether the camera is busy (ongoing acquisition or video).""" 
-    if self.status is 20072:
+    if self.status == 20072:
       return True
     else:
       return False
   
   def start(self):
     """Start the acquisition."""
+    # the SDK time stamps every frame if the camera supports it, see frame_times()
+    self._hardware_times = self._cam.Info.capabilities.Features["Metadata"]
+    if self._hardware_times:
+      sdk.SetMetaData(1)
     sdk.StartAcquisition()
     self.start_time = time.time()
+    self._first_frame_time = None
+    self._drained = 0
     self.snapshot_count += 1
     
   def stop(self):
-    """Stop an ongoing acquisition."""
+    """Stop an ongoing acquisition (and the background reader, if any)."""
     sdk.AbortAcquisition()
     sdk.CancelWait() # I hope this doesn't throw an error
+    if self.reader is not None:
+      self.reader.stop()
+      self.reader = None
+    
+  def start_reader(self, depth=64, policy='overwrite', type=16, start=True, sinks=(), ring=None):
+    """Read the frames in a background :class:`AcquisitionThread` and return it.
+    
+    The frames are available from the thread's :class:`FrameRing`:
+    
+    >>> cam.Acquire.Video()
+    >>> reader = cam.Acquire.start_reader(depth=128).ring.reader()
+    >>> data = reader.read()  # blocks until new frames are available
+    >>> cam.Acquire.stop()    # also stops the thread
+    
+    :param int depth: number of frames held by the ring
+    :param policy: 'overwrite' or 'drop', see :class:`FrameRing`
+    :param type: (16 or 32) whether to read the data as 16 or 32-bits integers
+    :param bool start: if True, also start the acquisition.
+    :param sinks: also give the frames to these sinks, see :class:`AcquisitionThread`.
+    :param ring: publish to this ring (e.g. a :class:`SharedFrameRing`) instead of a new one.
+    """
+    if self.reader is not None:
+      self.reader.stop()
+    self.reader = AcquisitionThread(self._cam, depth, policy, type, sinks=sinks, ring=ring)
+    if start:
+      self.start()
+    self.reader.start()
+    return self.reader
+    
+  def frame_times(self, first, last):
+    """Return the times (seconds since the epoch) at which the images *first* to *last*
+    (SDK indices, as in :attr:`valid`) of the current acquisition were acquired.
+    
+    An image is timed at the end of its exposure. The times are read from the SDK
+    frame metadata when the camera supports it: the time of the first image once
+    (``GetMetaDataInfo``), then the offsets of all the images in one call
+    (``GetRelativeImageTimes``). Otherwise they are computed from the kinetic cycle
+    time: during the acquisition, counting back from now for the last image acquired
+    (``GetTotalNumberImagesAcquired``), afterwards, counting from :attr:`start_time`.
+    The times are NaN if the acquisition was not started with :meth:`start`.
+    """
+    index = np.arange(first, last + 1)
+    if self._hardware_times:
+      if self._first_frame_time is None:
+        start = sdk.SystemTime()
+        offset = ctypes.c_float()
+        sdk.GetMetaDataInfo(ctypes.byref(start), ctypes.byref(offset), 0)
+        self._first_frame_time = _system_time(start) + offset.value / 1000.0 # ms from the start
+      if hasattr(sdk, 'GetRelativeImageTimes'):
+        offsets = np.empty(len(index), dtype=np.uint64)
+        sdk.GetRelativeImageTimes(first - 1, last - 1, offsets.ctypes.data_as(sdk.c_uint64_p), len(offsets))
+        return self._first_frame_time + offsets / 1e9 # ns from the first image
+      return self._first_frame_time + (index - 1) * self.cycle_time
+    if self.start_time is None:
+      return np.full(len(index), np.nan)
+    cycle = self.cycle_time
+    if not self.running:
+      return self.start_time + self._cam.acquisitionTimings['exposure'] + (index - 1) * cycle
+    total = ctypes.c_int32()
+    sdk.GetTotalNumberImagesAcquired(ctypes.byref(total))
+    return time.time() - (total.value - index) * cycle
+    
+  def frame_metadata(self, first, last, shot=-1):
+    """Return the metadata of the images *first* to *last* as a :data:`FRAME_HEADER` array
+    (index, time, exposure and shot number), see :meth:`frame_times`."""
+    metadata = np.zeros(last - first + 1, dtype=FRAME_HEADER)
+    metadata['index'] = np.arange(first, last + 1)
+    metadata['timestamp'] = self.frame_times(first, last)
+    metadata['exposure'] = self._cam.acquisitionTimings['exposure']
+    metadata['shot'] = shot
+    return metadata
+    
+  def stream_hdf(self, filename, dataset, compression='lzf', type=16, depth=64, start=True, **options):
+    """Stream the frames to a chunked, compressed HDF5 dataset as they are acquired.
+    
+    The frames are read by a background :class:`AcquisitionThread` and written by
+    an :class:`HDF5Sink`, which is closed when the acquisition ends or :meth:`stop` is called.
+    The metadata of :meth:`saveHDF` are written once, as attributes of the dataset.
+    
+    >>> cam.Acquire.Kinetic(5000, 0.001)
+    >>> sink = cam.Acquire.stream_hdf('shot.h5', 'spectra', compression='gzip')
+    >>> cam.Acquire.reader.join()
+    
+    :param compression: None, 'lzf', 'gzip' or 'blosc'
+    :param options: other arguments of :class:`HDF5Sink` (level, chunk_frames, flush_interval...)
+    :returns: the :class:`HDF5Sink`
+    """
+    sink = HDF5Sink(filename, dataset, self.frame_shape, _dtype(type), compression,
+                    attrs=self._metadata(), **options)
+    self.start_reader(depth, type=type, start=start, sinks=[sink])
+    return sink
     
   def wait(self, new_data=False):
     """Wait either for new data to be available or for the whole acquisition sequence (default) to terminate.
@@ -1623,7 +2819,7 @@ class AcqMode(Capability):
     try:
       sdk.WaitForAcquisition()
       if not new_data:
-        while self.status is 20072:
+        while self.status == 20072:
           sdk.WaitForAcquisition()
     except KeyboardInterrupt:
       pass
@@ -1637,6 +2833,8 @@ class AcqMode(Capability):
     self._cam._AcqMode.current = self
     self._cam.Acquire = self
     self.snapshot_count = 0
+    self._cam._AcqMode.invalidate() # e.g. size_of_circular_buffer depends on the mode settings
+    self._cam._forget('acq_mode')
     
   @property
   def max_exposure(self):
@@ -1648,6 +2846,7 @@ class AcqMode(Capability):
   # Data collection
   
   @property
+  @cached
   def size_of_circular_buffer(self):
     """Return the maximum number of images the circular buffer can store based on the current acquisition settings."""
     index = ctypes.c_int32()
@@ -1675,6 +2874,7 @@ class AcqMode(Capability):
     This information can be used with GetImages to retrieve a series of the latest images. 
     If any images are overwritten in the circular buffer they can no longer be retrieved
     and the information returned will treat overwritten images as having been retrieved.
+    If there are no new images, first and last are 0.
     """
     #cdef sdk.at_32 first, last
     first = ctypes.c_int32()
@@ -1682,34 +2882,46 @@ class AcqMode(Capability):
     sdk.GetNumberNewImages(ctypes.byref(first), ctypes.byref(last))
     return {"first": first.value, "last": last.value}
       
+  def _buffer(self, shape, type=16, out=None):
+    """Return a C-contiguous array of the given shape to read image data into.
+    
+    The array is either *out* (reshaped if necessary) or a recycled buffer from
+    the camera's :class:`BufferPool`.
+    """
+    dtype = _dtype(type)
+    if out is None:
+      return self._cam.Buffers.get(shape, dtype)
+    if out.dtype != dtype or out.size != np.prod(shape) or not out.flags['C_CONTIGUOUS']:
+      raise ValueError('out must be a C-contiguous %s array of %d elements' % (np.dtype(dtype).name, np.prod(shape)))
+    return out.reshape(shape)
+    
   #@rollover
-  def Newest(self, n=1, type=16):
+  def Newest(self, n=1, type=16, out=None):
     """Returns a data array with the most recently acquired image(s) in any acquisition mode.
     
     :param number: number of images to retrieve
     :param type: whether to return the data as 16 or 32-bits integers (16 [default] or 32)
+    :param out: optional C-contiguous array to read the data into.
+                If None, a buffer is taken from :attr:`Andor.Buffers`.
     """
 
     if n == 1:
-      npixels = self._cam.ReadMode.current.pixels
+      npixels = self.frame_pixels
+      data = self._buffer(self.frame_shape, type, out)
       if type == 16:
-        data16 = np.ascontiguousarray(np.empty(shape=npixels, dtype=np.uint16))
-        sdk.GetMostRecentImage16(ctypes.c_void_p(data16.ctypes.data), npixels) #HERE
-        data = data16
+        sdk.GetMostRecentImage16(data.ctypes.data_as(sdk.c_int16_p), npixels)
       else:
-        data32 = np.ascontiguousarray(np.empty(shape=npixels, dtype=np.int32))
-        sdk.GetMostRecentImage(ctypes.c_void_p(data32.ctypes.data), npixels) #HERE BYREF CHANGE
-        data = data32
-      return data.reshape(self._cam.ReadMode.current.shape)
+        sdk.GetMostRecentImage(data.ctypes.data_as(sdk.c_int32_p), npixels)
+      return data
     elif n > 1:
       most_recent = self.images_in_buffer['last']
-      return self.Images(most_recent - n + 1, most_recent, type=type)
+      return self.Images(most_recent - n + 1, most_recent, type=type, out=out)
     else:
       raise ValueError('Invalid number of images: ' + str(n))
       
   
   @rollover
-  def Oldest(self, type=16):
+  def Oldest(self, type=16, out=None):
     """Retrieve the oldest available image from the circular buffer.
     
     Once the oldest image has been retrieved it is no longer available,
@@ -1718,20 +2930,18 @@ class AcqMode(Capability):
     For example if there are 5 new images available, calling it 5 times will retrieve them all.
     
     :param type: whether to return the data as 16 or 32-bits integers (16 [default] or 32)
+    :param out: optional C-contiguous array to read the data into.
     """
-    npixels = self._cam.ReadMode.current.pixels
-    
+    npixels = self.frame_pixels
+    data = self._buffer(self.frame_shape, type, out)
     if type == 16:
-      data16 = np.ascontiguousarray(np.empty(shape=npixels, dtype=np.uint16))
-      sdk.GetOldestImage16(ctypes.c_void_p(data16.ctypes.data), npixels)
-      return data16
+      sdk.GetOldestImage16(data.ctypes.data_as(sdk.c_int16_p), npixels)
     else:
-      data32 = np.ascontiguousarray(np.empty(shape=npixels, dtype=np.int32))
-      sdk.GetOldestImage(ctypes.c_void_p(data32.ctypes.data), npixels)
-      return data32  
+      sdk.GetOldestImage(data.ctypes.data_as(sdk.c_int32_p), npixels)
+    return data
   
   @rollover
-  def Images(self, first, last, type=16):
+  def Images(self, first, last, type=16, out=None):
     """Return the specified series of images from the circular buffer.
     
     If the specified series is out of range (i.e. the images have been
@@ -1740,61 +2950,108 @@ class AcqMode(Capability):
     :param first: index of first image in buffer to retrieve.
     :param last: index of last image in buffer to retrieve.
     :param type: whether to return the data as 16 or 32-bits integers (default: 16)
+    :param out: optional C-contiguous array to read the data into.
     """
     nimages = last - first + 1
-    pixels_per_image = self._cam.ReadMode.current.pixels
+    pixels_per_image = self.frame_pixels
     total_pixels = nimages * pixels_per_image
-    final_shape = [nimages] + self._cam.ReadMode.current.shape
+    final_shape = [nimages] + self.frame_shape
     
     validfirst = ctypes.c_int32()
     validlast = ctypes.c_int32()
     
+    data = self._buffer(final_shape, type, out)
     if type == 16:
-      data16 = np.ascontiguousarray(np.empty(shape=total_pixels, dtype=np.uint16))
-      sdk.GetImages16(first, last, ctypes.c_void_p(data16.ctypes.data), total_pixels, ctypes.byref(validfirst), ctypes.byref(validlast))
-      data = data16
+      sdk.GetImages16(first, last, data.ctypes.data_as(sdk.c_int16_p), total_pixels, ctypes.byref(validfirst), ctypes.byref(validlast))
     else:
-      data32 = np.ascontiguousarray(np.empty(shape=total_pixels, dtype=np.int32))
-      sdk.GetImages(first, last, ctypes.c_void_p(data32.ctypes.data), total_pixels, ctypes.byref(validfirst), ctypes.byref(validlast))
-      data = data32
-    self.valid = {'first': validfirst, 'last': validlast}
-    return data.reshape(final_shape)
+      sdk.GetImages(first, last, data.ctypes.data_as(sdk.c_int32_p), total_pixels, ctypes.byref(validfirst), ctypes.byref(validlast))
+    self.valid = {'first': validfirst.value, 'last': validlast.value}
+    if (validfirst.value, validlast.value) != (first, last):
+      # the SDK writes the valid images at the start of the array, trim the others
+      data = data[:validlast.value - validfirst.value + 1]
+    return data
+
+  def drain(self, type=16, out=None, max_images=None):
+    """Retrieve all the new images from the circular buffer with a single SDK call.
+    
+    This is equivalent to calling :meth:`Oldest` until no new image is left, but
+    fetches the whole range at once with ``GetImages16``/``GetImages``.
+    Images that have already been overwritten in the circular buffer are skipped.
+    The SDK indices of the returned images are stored in :attr:`valid`.
+    
+    :param type: whether to return the data as 16 or 32-bits integers (default: 16)
+    :param out: optional C-contiguous (m, *shape) array to read the data into;
+                at most m images are retrieved, the others are left for the next call.
+    :param max_images: maximum number of images to retrieve.
+    :returns: (n, *shape) array of the new images, oldest first (n may be 0).
+    """
+    shape = self.frame_shape
+    if out is not None:
+      max_images = len(out) if max_images is None else min(max_images, len(out))
+    for attempt in range(self._drain_retries + 1):
+      new = self.new_images
+      # GetImages does not mark the images as retrieved, so also skip those already drained;
+      # the circular buffer only holds the last size_of_circular_buffer images.
+      last = new['last']
+      first = max(new['first'], self._drained + 1, last - self.size_of_circular_buffer + 1)
+      if max_images is not None:
+        last = min(last, first + max_images - 1)
+      if last < first:
+        self.valid = None
+        return np.empty([0] + shape, dtype=_dtype(type))
+      try:
+        data = self.Images(first, last, type=type, out=None if out is None else out[:last - first + 1])
+      except sdk.AndorError as error:
+        # DRV_P1INVALID, DRV_P2INVALID: overwritten meanwhile, read the new range again
+        if error.error not in (20066, 20067) or attempt == self._drain_retries:
+          raise
+        continue
+      self._drained = self.valid['last']
+      return data
+
 
   @rollover
-  def GetAcquiredData(self, type=16):
+  def GetAcquiredData(self, type=16, out=None):
     """Return the whole data set from the last acquisition.
     
     GetAcquiredData should be used once the acquisition is complete to retrieve all the data from the series.
     This could be a single scan or an entire kinetic series.
     
     :param type: (16 or 32) whether to return the data as 16 or 32-bits integers (default: 16)
+    :param out: optional C-contiguous array to read the data into.
     """   
-    pixels_per_image = self._cam.ReadMode.current.pixels
+    pixels_per_image = self.frame_pixels
     nimages = self.nimages
     total_pixels = nimages * pixels_per_image
-    final_shape = [nimages] + self._cam.ReadMode.current.shape
+    final_shape = [nimages] + self.frame_shape
     
+    data = self._buffer(final_shape, type, out)
     if type == 16:
-      data16 = np.ascontiguousarray(np.empty(shape=total_pixels, dtype = np.uint16))
-      sdk.GetAcquiredData16(ctypes.c_void_p(data16.ctypes.data), total_pixels)
-      data = data16
+      sdk.GetAcquiredData16(data.ctypes.data_as(sdk.c_int16_p), total_pixels)
     else:
-      data32 = np.ascontiguousarray(np.empty(shape=total_pixels, dtype = np.int32))
-      sdk.GetAcquiredData(ctypes.c_void_p(data32.ctypes.data), total_pixels)
-      data = data32
-    self.last_acquired_data = data.reshape(final_shape) 
+      sdk.GetAcquiredData(data.ctypes.data_as(sdk.c_int32_p), total_pixels)
+    self.last_acquired_data = data
+    #: :meth:`frame_metadata` of the images of :attr:`last_acquired_data`
+    self.last_frame_metadata = self.frame_metadata(1, nimages)
     return self.last_acquired_data
 
-  def Video(self):
+  def Video(self, frame_transfer=False):
     """Switch to Video mode and start acquiring."""
     self = self._cam._AcqMode.Video
-    self.__call__(start=False)
+    self.__call__(start=False, frame_transfer=frame_transfer)
     
-  def Kinetic(self, numberKinetics, kineticCycleTime, numberAccumulation = 1, accumulationCycleTime = 0, safe=True):
+  def Kinetic(self, numberKinetics, kineticCycleTime, numberAccumulation = 1, accumulationCycleTime = 0, safe=True,
+              frame_transfer=False):
     """Switch to and configure Kinetic acquisition."""
     self = self._cam._AcqMode.Kinetic
-    self.__call__(numberKinetics, kineticCycleTime, numberAccumulation, accumulationCycleTime,safe=safe)
+    self.__call__(numberKinetics, kineticCycleTime, numberAccumulation, accumulationCycleTime, safe=safe,
+                  frame_transfer=frame_transfer)
   
+  def FastKinetics(self, exposedRows, seriesLength, exposure, mode='image', binning=(1, 1), offset=0, safe=True):
+    """Switch to and configure Fast Kinetics acquisition."""
+    self = self._cam._AcqMode.FastKinetics
+    self.__call__(exposedRows, seriesLength, exposure, mode, binning, offset, safe=safe)
+    
   def Single(self):
     """Switch to Single mode."""
     #self.stop()
@@ -1809,22 +3066,41 @@ class AcqMode(Capability):
   def save(self, filename):
     """Save data to a .SIF Andor file
 
-    :param string filename: name of the SIF file"""
+    :param string filename: name of the SIF file (see :mod:`SIFreader` to read it)"""
+    self.saveSIF(filename)
+    
+  def saveSIF(self, filename):
+    """Save data to a .SIF Andor file (:meth:`save` saves to HDF5 in some modes).
+
+    :param string filename: name of the SIF file (see :mod:`SIFreader` to read it)"""
+    if not isinstance(filename, bytes):
+      filename = filename.encode()
     sdk.SaveAsSif(filename)
 
   def progress(self):
     progress = ctypes.c_int32()
     series = ctypes.c_int32()
-    sdk.GetAcquisitionProgress(progress, series)
+    sdk.GetAcquisitionProgress(ctypes.byref(progress), ctypes.byref(series))
     return progress.value, series.value
     
     
-  def saveHDF(self, filename, dataset, data, metadata_func=None):
+  def _metadata(self):
+    """Metadata recorded with the data: acquisition mode, exposure time, EM gain and time."""
+    return {'mode': self._name,
+            'exposure': self._cam.exposure,
+            'em_gain': self._cam.EM._read_gain_from_camera(),
+            'created': time.strftime("%d/%m/%Y %H:%M:%S")}
+    
+  def saveHDF(self, filename, dataset, data, metadata_func=None, compression=None, frames=None):
     """Save data and associated metadata to an HDF5 file.
     
     :param string filename: name of the H5 file (must already exist).
     :param string dataset_name: name of the dataset (must not already exist).
     :param data: any HDF5 compatible data (eg cam.Acquire.Newest())
+    :param compression: None, 'lzf', 'gzip' or 'blosc', see :class:`HDF5Sink`
+                        for data that does not fit in memory.
+    :param frames: per-frame metadata (see :meth:`frame_metadata`), saved as the
+                   dataset ``<dataset>_frames``.
     
     The following metadata are also recorded: 
       - acquisition mode
@@ -1832,36 +3108,118 @@ class AcqMode(Capability):
       - EM gain
       - time (string).
     """
+    if not WITH_H5PY:
+      raise ImportError('h5py is required to write HDF5 files')
     with h5py.File(filename, 'r+') as f:
-      f.create_dataset(dataset, data=data)
-      f[dataset].attrs['mode'] = self._name
-      f[dataset].attrs['exposure'] = self._cam.exposure
-      f[dataset].attrs['em_gain'] = self._cam.EM._read_gain_from_camera()
-      f[dataset].attrs['created'] = time.strftime("%d/%m/%Y %H:%M:%S")
+      f.create_dataset(dataset, data=data, **hdf5_compression(compression))
+      if frames is not None:
+        f.create_dataset(dataset + '_frames', data=frames)
+      for key, value in self._metadata().items():
+        f[dataset].attrs[key] = value
       if metadata_func is not None:
         metadata_func(f[dataset])
     
   def take_multiple_exposures(self, exposures):
-    """Take a series of single images with varying exposure time.
+    """Take a series of images with varying exposure time.
     
-    :param exposures: a tuple of exposure times.
+    :param exposures: a tuple of exposure times (ms).
     
     :returns: a numpy array of length len(exposures).
+    
+    .. seealso:: :meth:`bracket`, which also returns the exposure of every image.
     """
-    if self._name is "Video":
-      video = True
-      self.stop()
-      self.Single()
-    data = []
-    for e in exposures:
-      self._cam.exposure = e
-      self.start()
-      self.wait()
-      data.append(self.Newest())
+    return self.bracket(exposures)[0]
+    
+  def bracket(self, exposures, repeats=1, type=16, ring=True):
+    """Acquire one image per exposure time, *repeats* times over.
+    
+    When the camera supports ring exposures (``SetRingExposureTimes``), the whole
+    sequence is a single kinetic series, the camera cycling through the exposure
+    times. Otherwise the images are taken by a loop of single acquisitions, each read
+    straight into the output array. That fallback is serial: the exposure time cannot be
+    changed during an acquisition and starting one discards the data not read yet, so the
+    readout of an image cannot overlap the next exposure; only the ring exposures do.
+    
+    The exposure time is restored afterwards. The camera is left in Kinetic (ring
+    exposures) or Single mode, except that Video is restarted.
+    
+    >>> images, metadata = cam.Acquire.bracket([1, 10, 100], repeats=5)
+    >>> metadata['exposure']  # actual exposure times (s)
+    
+    :param exposures: exposure times (ms)
+    :param repeats: number of times the sequence is acquired
+    :param type: (16 or 32) bits of the data
+    :param ring: use the ring exposures if the camera supports them
+    :returns: the images, shape ``[repeats * len(exposures)] + frame_shape``,
+              and their :data:`FRAME_HEADER` metadata, with the exposure of every image
+    """
+    cam = self._cam
+    video = self._name == "Video"
     if video:
-      self.Video()
-      self.start()
-    return np.array(data)
+      self.stop()
+    try:
+      if ring and self._ring_exposures(len(exposures)):
+        return self._bracket_ring(exposures, repeats, type)
+      return self._bracket_loop(exposures, repeats, type)
+    finally:
+      cam._forget('acq_mode', 'exposure') # not those of the configuration any more
+      if video:
+        self.Video()
+        cam.Acquire.start()
+    
+  def _ring_exposures(self, number):
+    """Whether the camera can cycle through *number* exposure times in a kinetic series."""
+    maximum = ctypes.c_int32()
+    try:
+      sdk.GetMaximumNumberRingExposureTimes(ctypes.byref(maximum))
+      sdk.SetRingExposureTimes
+    except (AttributeError, sdk.AndorError): # old SDK, or not supported by this camera
+      return False
+    return number <= maximum.value
+    
+  def _bracket_ring(self, exposures, repeats, type):
+    """:meth:`bracket` with the ring exposures: a single kinetic series."""
+    number = len(exposures)
+    previous = self._cam.exposure
+    times = np.array(exposures, dtype=np.float32) / np.float32(1000)
+    sdk.SetRingExposureTimes(number, times.ctypes.data_as(sdk.c_float_p))
+    try:
+      self.Kinetic(number * repeats, 0)
+      acq = self._cam.Acquire
+      images = np.empty([number * repeats] + acq.frame_shape, dtype=_dtype(type))
+      acq.start()
+      acq.wait()
+      np.asarray(acq.GetAcquiredData(type, out=images)) # corrects a lazy roll-over in place
+      metadata = acq.last_frame_metadata
+      try:
+        sdk.GetAdjustedRingExposureTimes(number, times.ctypes.data_as(sdk.c_float_p))
+      except AttributeError: # old SDK: the times requested
+        pass
+      metadata['exposure'] = np.tile(times, repeats)
+    finally:
+      sdk.SetRingExposureTimes(1, ctypes.byref(ctypes.c_float(previous / 1000.0)))
+      self._cam.exposure = previous
+    return images, metadata
+    
+  def _bracket_loop(self, exposures, repeats, type):
+    """:meth:`bracket` in software: one single acquisition per image, one after the other."""
+    self.Single()
+    acq = self._cam.Acquire
+    exposures = list(exposures) * repeats
+    images = np.empty([len(exposures)] + acq.frame_shape, dtype=_dtype(type))
+    metadata = np.zeros(len(exposures), dtype=FRAME_HEADER)
+    previous = self._cam.exposure
+    try:
+      for i, exposure in enumerate(exposures):
+        self._cam.exposure = exposure
+        acq.start()
+        acq.wait()
+        np.asarray(acq.GetAcquiredData(type, out=images[i])) # corrects a lazy roll-over in place
+        metadata[i] = acq.last_frame_metadata[0]
+    finally:
+      self._cam.exposure = previous
+    metadata['index'] = np.arange(1, len(exposures) + 1)
+    return images, metadata
 
   def _gui(self, tkcanvas):
     tkcanvas.destroy()
@@ -1904,7 +3262,7 @@ class AcqMode_Single(AcqMode):
     self.start()
     if wait:
       self.wait()
-      return self.Newest(type)
+      return self.Newest(type=type)
     
 class AcqMode_Accumulate(AcqMode):
   """Set the camera in Accumulate mode.
@@ -1954,14 +3312,16 @@ class AcqMode_Accumulate(AcqMode):
       - EM gain
       - time (string)
       - accumulation number and cycle time
+      - time and index of every frame, as the dataset ``<dataset_name>_frames``
     """
-    def save_metadata(h5group, metadata_func=None):
+    def save_metadata(h5group):
       h5group.attrs['accumulate_cycle_time'] = self._cam.acquisitionTimings['accumulate']
       h5group.attrs['accumulate_number'] = self.numberAccumulation
       if metadata_func is not None:
         metadata_func(h5group)
     data = self.GetAcquiredData()
-    super(AcqMode_Accumulate, self).save(filename, dataset_name, data, save_metadata)
+    self.saveHDF(filename, dataset_name, data, save_metadata, frames=self.last_frame_metadata)
+    self._cam.Buffers.release(data) # the next shot reads into the same buffer
     
 
 class AcqMode_Video(AcqMode):
@@ -1975,8 +3335,15 @@ class AcqMode_Video(AcqMode):
     self.ndims = 0
     self.nimages = 1
     
-  def __call__(self, start=False, live=False):
+  def __call__(self, start=False, live=False, frame_transfer=False):
+    """Set the camera in Video mode.
+    
+    :param bool start: also start the acquisition
+    :param bool frame_transfer: expose the next image while the previous one is read out
+                                (frame transfer CCDs only): the exposure is then at least the readout time.
+    """
     sdk.SetAcquisitionMode(5)
+    self._frame_transfer(frame_transfer)
     super(AcqMode_Video, self).__call__()
     if start:
       super(AcqMode_Video, self).start()
@@ -1996,8 +3363,10 @@ class AcqMode_Kinetic(AcqMode_Accumulate):
     self._kinetic = True
     self.numberKinetics = 0
     self.kineticCycleTime = 0
+    self.spooled = None
     
-  def __call__(self, numberKinetics, kineticCycleTime, numberAccumulation = 1, accumulationCycleTime = 0, safe=True):
+  def __call__(self, numberKinetics, kineticCycleTime, numberAccumulation = 1, accumulationCycleTime = 0, safe=True,
+               frame_transfer=False):
     """Set the camera in Kinetic mode.
     
     :param numberKinetics: number of images in kinetic sequence
@@ -2005,10 +3374,14 @@ class AcqMode_Kinetic(AcqMode_Accumulate):
     :param numberAccumulation: number of images to accumulate for each image in the kinetic sequence
     :param accumulationCycleTime: interval between accumulated images, in seconds
     :param safe: set to False to cancel any ongoing acquisition.
+    :param bool frame_transfer: expose the next image while the previous one is read out
+                                (frame transfer CCDs only), the shortest cycle is then
+                                max(exposure, readout) instead of their sum.
     """
     if not safe:
       self.stop()
     sdk.SetAcquisitionMode(3)
+    self._frame_transfer(frame_transfer)
     sdk.SetNumberKinetics(numberKinetics)
     sdk.SetKineticCycleTime(ctypes.c_float(kineticCycleTime))
     self.numberKinetics = numberKinetics
@@ -2021,6 +3394,77 @@ class AcqMode_Kinetic(AcqMode_Accumulate):
     
     # NOTE : Should check the value of GetAcquisitionTimings 
   
+  #: SetSpool methods for the formats accepted by :meth:`spool`
+  spool_formats = {'raw32': 0,       # 32-bit raw files
+                   'raw': 1,         # 16-bit raw files, 32-bit when accumulating
+                   'raw16': 2,       # 16-bit raw files
+                   'directories': 3, # multiple directory structure
+                   'ramdisk': 4,
+                   'fits': 5,
+                   'sif': 6,
+                   'tiff': 7,
+                   'compressed': 8}  # compressed multiple directory structure
+  
+  def spool(self, path, format='raw', threads=None, buffer_size=0, start=True):
+    """Have the SDK write the kinetic series to disk while it is acquired.
+    
+    The images are no longer limited by the circular buffer or by the Python readout:
+    the SDK's own threads write them as they arrive. Spooling stays enabled until
+    :meth:`finish_spool` or :meth:`unspool` is called.
+    
+    :param path: stem of the spool files (e.g. ``/data/shot1234/spool``)
+    :param format: one of :attr:`spool_formats`
+    :param threads: number of threads writing the files (SDK default if None)
+    :param buffer_size: size (bytes) of the RAM buffer used when spooling to a RAM disk (SDK default if 0)
+    :param bool start: if True, also start the acquisition.
+    :returns: the :class:`SpooledData` of the series, read lazily.
+    """
+    if format not in self.spool_formats:
+      raise ValueError('Unknown spool format %r, use one of: %s' % (format, ', '.join(sorted(self.spool_formats))))
+    if not self._cam.Info.capabilities.Features["Spooling"]:
+      raise RuntimeError('This camera does not support spooling')
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+      os.makedirs(directory)
+    if threads is not None:
+      sdk.SetSpoolThreadCount(threads)
+    sdk.SetSpool(1, self.spool_formats[format], path.encode(), buffer_size)
+    if format == 'raw32' or (format == 'raw' and self.numberAccumulation > 1):
+      dtype = np.int32
+    else:
+      dtype = np.uint16
+    self.spooled = SpooledData(path, format, self.frame_shape, dtype, self.numberKinetics)
+    if start:
+      self.start()
+    return self.spooled
+    
+  @property
+  def spool_progress(self):
+    """Number of images of the series written to disk so far."""
+    progress = ctypes.c_int32()
+    sdk.GetSpoolProgress(ctypes.byref(progress))
+    return progress.value
+    
+  def finish_spool(self, timeout=None, poll=0.01):
+    """Wait for the series to be acquired and written, then disable spooling.
+    
+    :param timeout: maximum time (s) to wait for the files, None to wait indefinitely.
+    :returns: the :class:`SpooledData` of the series.
+    :raises RuntimeError: if not all the images were written within the timeout.
+    """
+    self.wait()
+    deadline = None if timeout is None else time.time() + timeout
+    while self.spool_progress < self.numberKinetics:
+      if deadline is not None and time.time() > deadline:
+        raise RuntimeError('Only %d/%d images spooled' % (self.spool_progress, self.numberKinetics))
+      time.sleep(poll)
+    self.unspool()
+    return self.spooled
+    
+  def unspool(self):
+    """Disable spooling: the next acquisitions are only kept in the circular buffer."""
+    sdk.SetSpool(0, 0, None, 0)
+    
   def save(self, filename, dataset_name):
     """Save data and associated metadata from the last completed acquisition to an HDF5 file.
     
@@ -2055,6 +3499,82 @@ class AcqMode_Kinetic(AcqMode_Accumulate):
             + acc_str)       
 
 
+class AcqMode_FastKinetics(AcqMode):
+  """Fast Kinetics mode.
+  
+  Only the top *exposedRows* of the sensor (from *offset*) are exposed; after each exposure
+  they are shifted under the masked part of the sensor, which takes microseconds instead
+  of a full readout. The whole series is read out once it is complete, each image being
+  a sub-area of *exposedRows* rows (binned vertically in 'fvb' mode).
+  """
+  #: SDK read modes of a fast kinetics series
+  read_modes = {'fvb': 0, 'image': 4}
+  
+  def __init__(self, typ, name, code, caps):
+    super(AcqMode_FastKinetics, self).__init__(typ, name, code, caps)
+    self.ndims = 1
+    self.shape = []
+    self.nimages = 0
+    self.exposedRows = 0
+    self.mode = 'image'
+    self.binning = (1, 1)
+    self.offset = 0
+    
+  def __call__(self, exposedRows, seriesLength, exposure, mode='image', binning=(1, 1), offset=0, safe=True):
+    """Set the camera in Fast Kinetics mode.
+    
+    :param int exposedRows: height of the exposed sub-area (rows)
+    :param int seriesLength: number of images in the series
+    :param float exposure: exposure time of each image, in seconds
+    :param mode: 'image' (each image is exposedRows/vbin rows) or 'fvb' (a single row)
+    :param binning: (hbin, vbin)
+    :param int offset: first exposed row, from the top of the sensor
+    :param safe: set to False to cancel any ongoing acquisition.
+    """
+    if mode not in self.read_modes:
+      raise ValueError('Invalid fast kinetics mode %r, use one of: %s' % (mode, ', '.join(sorted(self.read_modes))))
+    if not safe:
+      self.stop()
+    hbin, vbin = binning
+    sdk.SetAcquisitionMode(4)
+    self._frame_transfer(False) # not available in fast kinetics
+    if offset:
+      sdk.SetFastKineticsEx(exposedRows, seriesLength, ctypes.c_float(exposure), self.read_modes[mode], hbin, vbin, offset)
+    else:
+      sdk.SetFastKinetics(exposedRows, seriesLength, ctypes.c_float(exposure), self.read_modes[mode], hbin, vbin)
+    self.exposedRows = exposedRows
+    self.mode = mode
+    self.binning = (hbin, vbin)
+    self.offset = offset
+    self.shape = [seriesLength]
+    self.nimages = seriesLength
+    self._cam._forget('exposure') # set by SetFastKinetics
+    super(AcqMode_FastKinetics, self).__call__()
+    
+  @property
+  def frame_shape(self):
+    """Shape of an image of the series (the read mode is not used)."""
+    hbin, vbin = self.binning
+    width = self._cam.Detector.width // hbin
+    if self.mode == 'fvb':
+      return [width] # as in the FullVerticalBinning read mode
+    return [self.exposedRows // vbin, width]
+    
+  @property
+  def cycle_time(self):
+    """Time (s) between two images of the series: the exposure and the shift of the exposed rows."""
+    exposure = ctypes.c_float()
+    sdk.GetFKExposureTime(ctypes.byref(exposure))
+    # GetFKExposureTime is the exposure only; the rows are shifted at the vertical shift speed (us)
+    return exposure.value + self.exposedRows * self._cam.Detector.VSS.current * 1e-6
+    
+  def __repr__(self):
+    return ("Fast kinetics acquisition with settings : \n"
+            + "  Number in series: " + str(self.nimages) + "\n"
+            + "  Exposed rows: " + str(self.exposedRows) + " from row " + str(self.offset) + "\n"
+            + "  Read mode: " + self.mode + ", binning " + str(self.binning))
+            
+
 class TriggerModes(_AddCapabilities):
   """ This class is just container for the available TriggerMode_XXX classes """
   # It's little more than an alias for _AddCapabilities
@@ -2081,7 +3601,8 @@ class TriggerMode(Capability):
     """Call with no argument to set the trigger mode."""
     self._cam._TriggerMode.current = self
     sdk.SetTriggerMode(self._trigger_code)
-    self.fast(fast)
+    self.fast = fast
+    self._cam._forget('trigger')
 
   @property
   def fast(self):
@@ -2091,6 +3612,7 @@ class TriggerMode(Capability):
   def fast(self, inp):
     self._fast = inp
     sdk.SetFastExtTrigger(int(inp))
+    self._cam._forget('fast_trigger')
 
   def __getitem__(self, num):
     self = self._index[num]
@@ -2149,7 +3671,7 @@ class Capabilities(object):
     - ``GetFunctions`` (see also ``Fan`` and ``Temperature``)
     - ``Features``
   
-  and some of the relevant capabilities are present in the ``Fan`` 
+  and some of the relevant capabilities are present in the ``Features``, ``Fan`` 
   and ``Temperature`` dictionaries.
 
   Finally, when available, :class:`AcqMode`, :class:`ReadMode` and 
@@ -2209,15 +3731,16 @@ class Capabilities(object):
     self._AcqModes = (AcqMode_Single("AcqMode", "Single", sdk.acqMode['AC_ACQMODE_SINGLE'], caps.ulAcqModes),
                       AcqMode_Video("AcqMode", "Video", sdk.acqMode['AC_ACQMODE_VIDEO'], caps.ulAcqModes),
                       AcqMode_Accumulate("AcqMode", "Accumulate", sdk.acqMode['AC_ACQMODE_ACCUMULATE'], caps.ulAcqModes),
-                      AcqMode_Kinetic("AcqMode", "Kinetic", sdk.acqMode['AC_ACQMODE_KINETIC'], caps.ulAcqModes))
+                      AcqMode_Kinetic("AcqMode", "Kinetic", sdk.acqMode['AC_ACQMODE_KINETIC'], caps.ulAcqModes),
+                      AcqMode_FastKinetics("AcqMode", "FastKinetics", sdk.acqMode['AC_ACQMODE_FASTKINETICS'], caps.ulAcqModes))
     
     self._ReadModes = (ReadMode_Image("ReadMode", "Image", sdk.readMode['AC_READMODE_FULLIMAGE'], caps.ulReadModes),
                        #ReadMode_SubImage("ReadMode", "Subimage", sdk.readMode['AC_READMODE_SUBIMAGE'], caps.ulReadModes),
                        ReadMode_SingleTrack("ReadMode", "SingleTrack", sdk.readMode['AC_READMODE_SINGLETRACK'], caps.ulReadModes),
                        ReadMode_FullVerticalBinning("ReadMode", "FullVerticalBinning", sdk.readMode['AC_READMODE_FVB'], caps.ulReadModes),
                        ReadMode_MultiTrack("ReadMode", "MultiTrack", sdk.readMode['AC_READMODE_MULTITRACK'], caps.ulReadModes),
-                       ReadMode_RandomTrack("ReadMode", "RandomTrack", sdk.readMode['AC_READMODE_RANDOMTRACK'], caps.ulReadModes))
-                       #ReadMode_MultiTrackScan("ReadMode", "MultiTrackScan", sdk.readMode['AC_READMODE_MULTITRACKSCAN'], caps.ulReadModes))
+                       ReadMode_RandomTrack("ReadMode", "RandomTrack", sdk.readMode['AC_READMODE_RANDOMTRACK'], caps.ulReadModes),
+                       ReadMode_MultiTrackScan("ReadMode", "MultiTrackScan", sdk.readMode['AC_READMODE_MULTITRACKSCAN'], caps.ulReadModes))
 
     self.CameraType = sdk.cameraType[caps.ulCameraType]
 
@@ -2231,11 +3754,18 @@ class Capabilities(object):
 
     self.SetFunctions = {"Extended EM gain range": sdk.setFunction['AC_SETFUNCTION_EMADVANCED'] & caps.ulSetFunctions > 0,
                          "Extended NIR mode": sdk.setFunction['AC_SETFUNCTION_EXTENDEDNIR'] & caps.ulSetFunctions > 0,
-                         "High capacity mode": sdk.setFunction['AC_SETFUNCTION_HIGHCAPACITY'] & caps.ulSetFunctions > 0}
+                         "High capacity mode": sdk.setFunction['AC_SETFUNCTION_HIGHCAPACITY'] & caps.ulSetFunctions > 0,
+                         "Crop mode": sdk.setFunction['AC_SETFUNCTION_CROPMODE'] & caps.ulSetFunctions > 0,
+                         "Extended crop mode": sdk.setFunction['AC_SETFUNCTION_EXTENDED_CROP_MODE'] & caps.ulSetFunctions > 0}
     
     self.Fan = {"Fan can be controlled": sdk.features['AC_FEATURES_FANCONTROL'] & caps.ulFeatures >0,
                 "Low fan setting": sdk.features['AC_FEATURES_MIDFANCONTROL'] & caps.ulFeatures >0}
 
+    self.Features = {"Polling": sdk.features['AC_FEATURES_POLLING'] & caps.ulFeatures > 0,
+                     "Events": sdk.features['AC_FEATURES_EVENTS'] & caps.ulFeatures > 0,
+                     "Spooling": sdk.features['AC_FEATURES_SPOOLING'] & caps.ulFeatures > 0,
+                     "Metadata": sdk.features['AC_FEATURES_METADATA'] & caps.ulFeatures > 0}
+
     self.Temperature = {"Temperature can be read during acquisition": sdk.features['AC_FEATURES_TEMPERATUREDURINGACQUISITION'] & caps.ulFeatures > 0,
                         "Temperature can be read": sdk.getFunction['AC_GETFUNCTION_TEMPERATURE'] & caps.ulGetFunctions > 0,
                         "Valid temperature range can be read": sdk.getFunction['AC_GETFUNCTION_TEMPERATURERANGE'] & caps.ulGetFunctions > 0}
@@ -0,0 +1,252 @@
+"""Camera configurations that can be saved, loaded and switched to quickly.
+
+A :class:`Config` is an immutable set of settings of an :class:`andor2.Andor`
+camera: amplifiers, shift speeds, gains, read and acquisition modes, exposure
+and trigger. :meth:`Config.apply` only issues the SDK calls of the settings that
+differ from the configuration applied last (``cam.config``), in the order the
+SDK needs them, so that switching between two setups costs a handful of calls:
+
+>>> johann = Config.load('johann.json')
+>>> survey = johann.replace(exposure=50, read_mode=('FullVerticalBinning', {'hbin': 2}))
+>>> johann.apply(cam)        # everything, the first time
+>>> survey.apply(cam)        # only what differs
+['read_mode', 'exposure']
+>>> survey.save('survey.toml')
+
+Settings left to None are not touched. The read and acquisition modes are a
+name (see :data:`READ_MODES` and :data:`ACQ_MODES`) and the arguments of the mode,
+e.g. ``('Kinetic', {'numberKinetics': 10, 'kineticCycleTime': 0.1})``.
+Configurations are saved as JSON, or TOML (read with ``tomllib`` from python 3.11,
+or the ``tomli`` package).
+"""
+import json
+from collections import namedtuple
+
+try:
+    import tomllib
+    WITH_TOML = True
+except ImportError:
+    try:
+        import tomli as tomllib
+        WITH_TOML = True
+    except ImportError:
+        WITH_TOML = False
+
+try:
+    _string = basestring
+except NameError: #python3
+    _string = str
+
+#: Read modes by SDK number (``SetReadMode``)
+READ_MODES = {0: 'FullVerticalBinning', 1: 'MultiTrack', 2: 'RandomTrack', 3: 'SingleTrack', 4: 'Image', 5: 'MultiTrackScan'}
+#: Acquisition modes by SDK number (``SetAcquisitionMode``)
+ACQ_MODES = {1: 'Single', 2: 'Accumulate', 3: 'Kinetic', 4: 'FastKinetics', 5: 'Video'}
+#: Trigger modes by SDK number (``SetTriggerMode``)
+TRIGGER_MODES = {0: 'Internal', 1: 'External', 6: 'External_Start', 7: 'External_Exposure', 9: 'External_FVB',
+                 10: 'Continuous', 12: 'External_Charge_Shifting'}
+
+# In the order they are applied: the speeds and gains depend on the amplifier and
+# AD channel, the exposure comes before the acquisition mode (fast kinetics sets its own).
+FIELDS = ('output_amp', 'adc', 'hss', 'vss', 'preamp', 'em_gain', 'temperature', 'cooler',
+          'read_mode', 'exposure', 'acq_mode', 'trigger', 'fast_trigger')
+
+#: Settings applied again when a setting they depend on changes
+DEPENDS = {'hss': ('output_amp', 'adc'),
+           'preamp': ('output_amp', 'adc', 'hss'),
+           'em_gain': ('output_amp',),
+           'exposure': ('acq_mode',)}
+
+_MODES = ('read_mode', 'acq_mode')
+
+
+def _freeze(value):
+    """Hashable, immutable copy of a setting (lists become tuples, dicts sorted tuples of items)."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """Tuples back to lists, for JSON and TOML."""
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _mode(value):
+    """(name, frozen arguments) of a read or acquisition mode given as a name or a (name, arguments) pair."""
+    if value is None:
+        return None
+    if isinstance(value, _string):
+        return (value, ())
+    name, args = value
+    return (name, _freeze(dict(args)))
+
+
+def _toml(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_toml(item) for item in value) + ']'
+    if isinstance(value, _string):
+        return json.dumps(value)
+    return repr(value)
+
+
+class Config(namedtuple('Config', FIELDS)):
+    """Immutable camera configuration. Build it with keywords, e.g. ``Config(exposure=10, hss=0)``.
+
+    :param output_amp: output amplifier (:class:`andor2.OutputAmp`)
+    :param adc: AD channel
+    :param hss: horizontal shift speed index
+    :param vss: vertical shift speed index
+    :param preamp: pre-amplifier gain index
+    :param em_gain: EM gain, 0 to turn it off
+    :param temperature: cooler set point (C)
+    :param cooler: whether the cooler is on
+    :param read_mode: name or (name, arguments) of the read mode
+    :param exposure: exposure time (ms)
+    :param acq_mode: name or (name, arguments) of the acquisition mode
+    :param trigger: trigger mode name
+    :param fast_trigger: fast external trigger
+    """
+    __slots__ = ()
+
+    def __new__(cls, **settings):
+        unknown = set(settings) - set(FIELDS)
+        if unknown:
+            raise TypeError('Unknown settings: ' + ', '.join(sorted(unknown)))
+        values = [settings.get(name) for name in FIELDS]
+        values = [_mode(value) if name in _MODES else _freeze(value) for name, value in zip(FIELDS, values)]
+        return super(Config, cls).__new__(cls, *values)
+
+    def replace(self, **changes):
+        """Copy of the configuration with some settings changed (None to leave one untouched)."""
+        settings = dict((name, getattr(self, name)) for name in FIELDS)
+        settings.update(changes)
+        return Config(**settings)
+
+    def merge(self, other):
+        """Copy of the configuration with the settings of other that are not None."""
+        return self.replace(**dict((name, value) for name, value in zip(FIELDS, other) if value is not None))
+
+    def diff(self, current=None):
+        """Names of the settings that differ from the configuration current (all of them if None)."""
+        return [name for name in FIELDS
+                if getattr(self, name) is not None and (current is None or getattr(current, name) != getattr(self, name))]
+
+    def apply(self, cam, force=False):
+        """Set the camera to this configuration, return the names of the settings changed.
+
+        Only the settings that differ from ``cam.config`` (the configuration applied
+        last) are set, and the ones depending on them. An acquisition in progress is
+        stopped once beforehand. The camera drops a setting from ``cam.config`` when
+        it is changed directly (e.g. ``cam.exposure = 10``), so that it is set again;
+        use force if the camera was set up by other means since the last :meth:`apply`.
+        """
+        current = None if force else getattr(cam, 'config', None)
+        changed = self.diff(current)
+        for name, depends in DEPENDS.items():
+            if getattr(self, name) is not None and name not in changed and set(depends) & set(changed):
+                changed.append(name)
+        changed = [name for name in FIELDS if name in changed]
+        if not changed:
+            return []
+        if cam.Acquire.running:
+            cam.Acquire.stop()
+        for name in changed:
+            if name == 'fast_trigger' and 'trigger' in changed:
+                continue # set with the trigger mode
+            _SETTERS[name](cam, self)
+        # the settings the setters changed as a side effect were dropped from cam.config
+        current = None if current is None else getattr(cam, 'config', None)
+        cam.config = self if current is None else current.merge(self)
+        return changed
+
+    def to_dict(self):
+        """The settings that are not None, as plain types (the modes as {'name': ..., arguments...})."""
+        settings = {}
+        for name in FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if name in _MODES:
+                value = dict([('name', value[0])] + [(key, _thaw(item)) for key, item in value[1]])
+            settings[name] = _thaw(value)
+        return settings
+
+    @classmethod
+    def from_dict(cls, settings):
+        settings = dict(settings)
+        for name in _MODES:
+            if isinstance(settings.get(name), dict):
+                args = dict(settings[name])
+                settings[name] = (args.pop('name'), args)
+        return cls(**settings)
+
+    def to_toml(self):
+        settings = self.to_dict()
+        lines = ['%s = %s' % (name, _toml(value)) for name, value in settings.items() if not isinstance(value, dict)]
+        for name in _MODES:
+            if name in settings:
+                lines += ['', '[%s]' % name] + ['%s = %s' % item for item in
+                                                 ((key, _toml(value)) for key, value in settings[name].items())]
+        return '\n'.join(lines) + '\n'
+
+    def save(self, filename):
+        """Write the configuration to a .toml or .json file."""
+        with open(filename, 'w') as f:
+            if filename.endswith('.toml'):
+                f.write(self.to_toml())
+            else:
+                json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a configuration from a .toml or .json file."""
+        if filename.endswith('.toml'):
+            if not WITH_TOML:
+                raise ImportError('tomllib (python 3.11+) or tomli is required to read TOML files')
+            with open(filename, 'rb') as f:
+                return cls.from_dict(tomllib.load(f))
+        with open(filename) as f:
+            return cls.from_dict(json.load(f))
+
+    def __repr__(self):
+        return 'Config(%s)' % ', '.join('%s=%r' % item for item in zip(FIELDS, self) if item[1] is not None)
+
+
+def _set_em_gain(cam, config):
+    if config.em_gain:
+        cam.EM.gain = config.em_gain
+        cam.EM.on()
+    else:
+        cam.EM.off()
+
+
+def _set_trigger(cam, config):
+    mode = getattr(cam._TriggerMode, config.trigger)
+    mode(cam._TriggerMode.current.fast if config.fast_trigger is None else config.fast_trigger)
+    cam.TriggerMode = mode
+
+
+def _set_mode(modes, value):
+    name, args = value
+    getattr(modes, name)(**dict(args))
+
+
+_SETTERS = {'output_amp': lambda cam, config: cam.Detector.OutputAmp(config.output_amp),
+            'adc': lambda cam, config: setattr(cam.Detector.ADC, 'channel', config.adc),
+            'hss': lambda cam, config: cam.Detector.HSS(config.hss),
+            'vss': lambda cam, config: cam.Detector.VSS(config.vss),
+            'preamp': lambda cam, config: cam.Detector.PreAmp(config.preamp),
+            'em_gain': _set_em_gain,
+            'temperature': lambda cam, config: setattr(cam.Temperature, 'setpoint', config.temperature),
+            'cooler': lambda cam, config: setattr(cam.Temperature, 'cooler', config.cooler),
+            'read_mode': lambda cam, config: _set_mode(cam.ReadMode, config.read_mode),
+            'exposure': lambda cam, config: setattr(cam, 'exposure', config.exposure),
+            'acq_mode': lambda cam, config: _set_mode(cam._AcqMode, config.acq_mode),
+            'trigger': _set_trigger,
+            'fast_trigger': lambda cam, config: setattr(cam._TriggerMode.current, 'fast', config.fast_trigger)}
@@ -0,0 +1,100 @@
+"""Helpers for the image data that do not need the camera SDK.
+
+They are used by :mod:`andor2` and by the tools that run on the analysis hosts
+(e.g. :mod:`SIFconvert`), where the SDK is not installed.
+"""
+import warnings
+
+import numpy as np
+
+
+def hdf5_compression(compression, level=None):
+    """Return the ``create_dataset`` keywords for a compression filter.
+
+    :param compression: None, 'lzf', 'gzip' or 'blosc' (needs :mod:`hdf5plugin`,
+                        falls back to 'lzf' with a warning)
+    :param level: compression level for gzip (0-9) and blosc (0-9)
+    """
+    if compression is None:
+        return {}
+    if compression == 'lzf':
+        return {'compression': 'lzf', 'shuffle': True}
+    if compression == 'gzip':
+        return {'compression': 'gzip', 'compression_opts': 4 if level is None else level, 'shuffle': True}
+    if compression == 'blosc':
+        try:
+            import hdf5plugin
+        except ImportError:
+            warnings.warn('hdf5plugin is not installed, using lzf compression instead of blosc')
+            return hdf5_compression('lzf')
+        return dict(hdf5plugin.Blosc(cname='lz4', clevel=5 if level is None else level, shuffle=hdf5plugin.Blosc.SHUFFLE))
+    raise ValueError('Unknown compression: %r' % (compression,))
+
+
+def correct_rollover(data, bit_depth, chunk=262144):
+    """Replace, in place, the zeros produced by the ADC roll-over with 2**bit_depth-1.
+
+    Frames of up to *chunk* pixels are corrected by boolean-mask indexing, which is
+    the fastest for them. Larger frames are processed in chunks of *chunk* pixels so
+    that the temporary mask stays small (and in cache) whatever the size of the data.
+
+    :param data: writeable numpy array
+    :param int bit_depth: dynamic range of the AD converter
+    :returns: *data*
+    """
+    value = 2**bit_depth - 1
+    if data.size <= chunk or not data.flags['C_CONTIGUOUS']:
+        data[data == 0] = value
+        return data
+    flat = data.reshape(-1)
+    mask = np.empty(chunk, dtype=bool)
+    for start in range(0, flat.size, chunk):
+        part = flat[start:start + chunk]
+        where = mask[:part.size]
+        np.equal(part, 0, out=where)
+        np.copyto(part, value, where=where)
+    return data
+
+
+class RolloverView(object):
+    """Lazy ADC roll-over correction of image data.
+
+    Wraps raw data (a numpy array or any buffer such as a memoryview) and only
+    corrects what is accessed: indexing returns a corrected copy of the selection,
+    while converting the whole view to an array (``np.asarray(view)``) corrects the
+    underlying data in place once (or returns a corrected copy if it is read-only).
+    """
+    def __init__(self, data, bit_depth):
+        self.raw = np.asarray(data)
+        self.bit_depth = bit_depth
+        self._corrected = False
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def dtype(self):
+        return self.raw.dtype
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, key):
+        part = self.raw[key]
+        if self._corrected:
+            return part.copy()
+        return np.where(part == 0, part.dtype.type(2**self.bit_depth - 1), part)
+
+    def __array__(self, dtype=None, copy=None):
+        if not self._corrected:
+            if self.raw.flags['WRITEABLE']:
+                correct_rollover(self.raw, self.bit_depth)
+                self._corrected = True
+            else:
+                data = np.where(self.raw == 0, self.raw.dtype.type(2**self.bit_depth - 1), self.raw)
+                return data if dtype is None else data.astype(dtype)
+        return self.raw if dtype is None else self.raw.astype(dtype)
+
+    def __repr__(self):
+        return "<RolloverView %s %s (%s)>" % (self.shape, self.dtype, "corrected" if self._corrected else "raw")
@@ -0,0 +1,259 @@
+"""Several Andor cameras acquiring in parallel, each driven by its own process.
+
+The SDK talks to one *current* camera per process (``SetCurrentCamera``), and all
+the calls of a process share one GIL, so one process per camera is the only way
+to run the readouts truly in parallel. :class:`CameraManager` starts a worker
+process per camera, each running an :class:`andor2.Andor` on its camera, and
+forwards attribute reads, writes and calls to it. The frames come back through
+a :class:`andor2.SharedFrameRing` per camera, so they are never pickled:
+
+>>> with CameraManager() as cams:              # all the installed cameras
+...     cams.set('exposure', 10)               # on every camera, in parallel
+...     cams.call('Acquire.Kinetic', 100, 0.05)
+...     readers = cams.stream(depth=128)       # one FrameReader per camera
+...     spectra = [r.read(timeout=1) for r in readers]
+...     cams[0].get('Temperature.read')        # a single camera
+
+Attribute paths are relative to the :class:`andor2.Andor` object of the worker.
+Results must be picklable (otherwise their ``repr`` is returned); errors raised
+in a worker are raised again in the caller.
+"""
+import multiprocessing
+import pickle
+import threading
+import traceback
+
+import andor2
+
+
+def _resolve(obj, path):
+    for name in path.split('.') if path else ():
+        obj = getattr(obj, name)
+    return obj
+
+
+def _reply(conn, ok, value):
+    try:
+        conn.send((ok, value))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        if ok:
+            conn.send((True, repr(value)))
+        else:
+            conn.send((False, RuntimeError(''.join(traceback.format_exception_only(type(value), value)))))
+
+
+def _serve(index, conn, options):
+    """Worker process: run the camera, execute the requests of the parent."""
+    try:
+        cam = andor2.Andor(camera=index, **options)
+    except Exception as error:
+        _reply(conn, False, error)
+        return
+    _reply(conn, True, cam.Info.serial_number)
+    ring = None
+    closing = False
+    try:
+        while True:
+            try:
+                command, path, args, kwargs = conn.recv()
+            except EOFError: # the parent is gone
+                break
+            if command == 'close':
+                closing = True
+                break
+            try:
+                if command == 'get':
+                    result = _resolve(cam, path)
+                elif command == 'set':
+                    parent, _, name = path.rpartition('.')
+                    setattr(_resolve(cam, parent), name, args[0])
+                    result = None
+                elif command == 'call':
+                    result = _resolve(cam, path)(*args, **kwargs)
+                elif command == 'stream':
+                    if cam.Acquire.reader is not None:
+                        cam.Acquire.reader.stop()
+                    if ring is not None:
+                        ring.release()
+                    depth, type, policy, start = args
+                    ring = andor2.SharedFrameRing(depth, cam.Acquire.frame_shape, andor2._dtype(type), policy)
+                    cam.Acquire.start_reader(depth, policy, type, start, ring=ring)
+                    result = ring.name
+                else:
+                    raise ValueError('Unknown command: ' + str(command))
+            except Exception as error:
+                _reply(conn, False, error)
+            else:
+                _reply(conn, True, result)
+    finally:
+        # cam is part of a reference cycle (cam._cam), Andor.__del__ may never run
+        cam.close()
+        if ring is not None:
+            ring.release()
+        if closing:
+            _reply(conn, True, None)
+        conn.close()
+
+
+class Camera(object):
+    """Proxy of the :class:`andor2.Andor` object of a worker process."""
+    def __init__(self, index, context, options):
+        self.index = index
+        self._conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(index, child, options), name='Andor camera %d' % index)
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self._lock = threading.Lock()
+        #: :class:`andor2.SharedFrameRing` of the last :meth:`stream`
+        self.ring = None
+        self.serial_number = self._receive()
+
+    def _send(self, command, path='', args=(), kwargs=None):
+        self._conn.send((command, path, args, kwargs or {}))
+
+    def _receive(self):
+        ok, value = self._conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def _request(self, command, path='', args=(), kwargs=None):
+        with self._lock:
+            self._send(command, path, args, kwargs)
+            return self._receive()
+
+    def get(self, path):
+        """Value of an attribute, e.g. ``get('Temperature.read')``."""
+        return self._request('get', path)
+
+    def set(self, path, value):
+        """Set an attribute, e.g. ``set('exposure', 10)``."""
+        self._request('set', path, (value,))
+
+    def call(self, path, *args, **kwargs):
+        """Call a method, e.g. ``call('Acquire.Kinetic', 100, 0.05)``."""
+        return self._request('call', path, args, kwargs)
+
+    def stream(self, depth=64, type=16, policy='overwrite', start=True):
+        """Read the frames in the background into shared memory, return a :class:`andor2.FrameReader` of them.
+
+        See :meth:`andor2.AcqMode.start_reader`.
+        """
+        return self._attach(self._request('stream', args=(depth, type, policy, start)))
+
+    def _attach(self, name):
+        """Reader of the shared memory ring *name* created by the worker."""
+        self._release()
+        self.ring = andor2.SharedFrameRing.attach(name)
+        return self.ring.reader()
+
+    def _release(self):
+        if self.ring is not None:
+            self.ring.release()
+            self.ring = None
+
+    def close(self, timeout=5):
+        """Stop the acquisition, shut the camera down and terminate the worker."""
+        self._release()
+        if self.process.is_alive():
+            try:
+                self._request('close')
+            except (EOFError, OSError):
+                pass
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._conn.close()
+
+    def __repr__(self):
+        return '<Andor camera %d (serial number %s, pid %s)>' % (self.index, self.serial_number, self.process.pid)
+
+
+class CameraManager(object):
+    """Starts one worker process per camera, forwards requests to all of them in parallel.
+
+    :param cameras: indices of the cameras to use (default: all of them, see :func:`andor2.AvailableCameras`)
+    :param context: :mod:`multiprocessing` start method. 'spawn' (default) gives every
+                    worker a fresh SDK, 'fork' would share the parent's library state.
+    :param options: arguments of :class:`andor2.Andor` (``init``, ``lib``)
+    """
+    def __init__(self, cameras=None, context='spawn', **options):
+        if cameras is None:
+            cameras = range(andor2.AvailableCameras())
+        context = multiprocessing.get_context(context)
+        self.cameras = []
+        try:
+            for index in cameras:
+                self.cameras.append(Camera(index, context, options))
+        except Exception:
+            self.close()
+            raise
+
+    def _all(self, command, path='', args=(), kwargs=None):
+        """Send the request to every camera, then collect the results."""
+        for cam in self.cameras:
+            cam._lock.acquire()
+        try:
+            for cam in self.cameras:
+                cam._send(command, path, args, kwargs)
+            results, errors = [], []
+            for cam in self.cameras:
+                try:
+                    results.append(cam._receive())
+                except Exception as error:
+                    errors.append(error)
+        finally:
+            for cam in self.cameras:
+                cam._lock.release()
+        if errors:
+            raise errors[0]
+        return results
+
+    def get(self, path):
+        """List of the values of an attribute on every camera."""
+        return self._all('get', path)
+
+    def set(self, path, value):
+        """Set an attribute on every camera."""
+        self._all('set', path, (value,))
+
+    def call(self, path, *args, **kwargs):
+        """Call a method on every camera, return the list of results."""
+        return self._all('call', path, args, kwargs)
+
+    def start(self):
+        """Start the acquisition on every camera."""
+        self.call('Acquire.start')
+
+    def stop(self):
+        """Stop the acquisition (and the streams) of every camera."""
+        self.call('Acquire.stop')
+
+    def stream(self, depth=64, type=16, policy='overwrite', start=True):
+        """Stream every camera to shared memory, return one :class:`andor2.FrameReader` per camera."""
+        names = self._all('stream', args=(depth, type, policy, start))
+        return [cam._attach(name) for cam, name in zip(self.cameras, names)]
+
+    def close(self):
+        for cam in self.cameras:
+            cam.close()
+        self.cameras = []
+
+    def __getitem__(self, index):
+        return self.cameras[index]
+
+    def __len__(self):
+        return len(self.cameras)
+
+    def __iter__(self):
+        return iter(self.cameras)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return '<CameraManager: %s>' % ', '.join(repr(cam) for cam in self.cameras)
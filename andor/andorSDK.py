@@ -1,7 +1,21 @@
+import bisect
 import ctypes
+import json
 import numpy
+import os
+import sys
+import threading
+import time
 import warnings
 
+try:
+    _replace = os.replace
+except AttributeError: # python 2: os.rename only replaces an existing file on POSIX
+    def _replace(source, target):
+        if os.name == 'nt' and os.path.exists(target):
+            os.remove(target)
+        os.rename(source, target)
+
 c_int32_p = ctypes.POINTER(ctypes.c_int32)
 c_int32 = ctypes.c_int32
 c_int16_p = ctypes.POINTER(ctypes.c_int16)
@@ -13,8 +27,9 @@ c_double = ctypes.c_double
 c_char_p = ctypes.c_char_p
 c_byte_p = ctypes.POINTER(ctypes.c_byte)
 c_byte = ctypes.c_byte
+c_uint64_p = ctypes.POINTER(ctypes.c_uint64)
 
-__atmcd32d__ = ctypes.windll.LoadLibrary('atmcd32d.dll')
+library = None # the loaded SDK, see load()
 
 class AndorCapabilities(ctypes.Structure):
     _fields_ = [('ulSize', c_int32),
@@ -59,8 +74,11 @@ class SystemTime(ctypes.Structure):
                 ('wSecond', c_int16),
                 ('wMilliseconds', c_int16)]
 
-def function(argtypes, restype = c_int32):
-    return {'argtypes':argtypes, 'restype':restype}
+DRV_NO_NEW_DATA = 20024
+
+def function(argtypes, restype = c_int32, ignore = ()):
+    """ ignore: return codes that are not errors for this function, on top of ignoreMessages"""
+    return {'argtypes':argtypes, 'restype':restype, 'ignore':ignore}
 
 functions = {'AbortAcquisition' : function([]),
              'CancelWait' : function([]),
@@ -175,7 +193,7 @@ functions = {'AbortAcquisition' : function([]),
              'GetNumberHSSpeeds' : function([c_int32, c_int32, c_int32_p]),
              #GetNumberMissedExternalTriggers : function([c_int32, c_int32, c_int16_p, c_int32]),
              #GetIRIGData : function([c_byte_p, c_int32]),
-             'GetNumberNewImages' : function([c_int32_p, c_int32_p]),
+             'GetNumberNewImages' : function([c_int32_p, c_int32_p], ignore=(DRV_NO_NEW_DATA,)),
              'GetNumberPhotonCountingDivisions' : function([c_int32_p]),
              'GetNumberPreAmpGains' : function([c_int32_p]),
              'GetNumberRingExposureTimes' : function([c_int32_p]),
@@ -194,7 +212,7 @@ functions = {'AbortAcquisition' : function([]),
              'GetQE' : function([c_char_p, c_float, c_int32, c_float_p]),
              'GetReadOutTime' : function([c_float_p]),
              'GetRegisterDump' : function([c_int32_p]),
-             #GetRelativeImageTimes : function([ c_int32, c_int32, c_int32_p, c_int32_p, c_int32]),
+             'GetRelativeImageTimes' : function([c_int32, c_int32, c_uint64_p, c_int32]),
              'GetRingExposureRange' : function([c_float_p, c_float_p]),
              'GetSDK3Handle' : function([c_int32_p]),
              'GetSensitivity' : function([c_int32, c_int32, c_int32, c_int32, c_float_p]),
@@ -405,8 +423,8 @@ functions = {'AbortAcquisition' : function([]),
              'UpdateDDGTimings' : function([]),
              'WaitForAcquisition' : function([]),
              'WaitForAcquisitionByHandle' : function([c_int32]),
-             'WaitForAcquisitionByHandleTimeOut' : function([c_int32, c_int32]),
-             'WaitForAcquisitionTimeOut' : function([c_int32]),
+             'WaitForAcquisitionByHandleTimeOut' : function([c_int32, c_int32], ignore=(DRV_NO_NEW_DATA,)),
+             'WaitForAcquisitionTimeOut' : function([c_int32], ignore=(DRV_NO_NEW_DATA,)),
              'WhiteBalance' : function([c_int16_p, c_int16_p, c_int16_p, c_float_p, c_float_p, ctypes.POINTER(WhiteBalanceInfo)]), #NEEDS WORK
 
              'OA_Initialize' : function([c_char_p, c_int32]),
@@ -754,23 +772,193 @@ class AndorError(Exception):
         super(AndorError, self).__init__(message)
         self.error = error
 
-def _andorFuncGen(func):
-    """ This function handles the necessary Andor camera error handling
-    while also evaluating the function"""
-    def output(*args, **kwargs):
-        val = ctypes.c_int32
-        val = func(*args, **kwargs)
-        if not val in ignoreMessages:
-            raise AndorError('Andor Camera Code %d : %s' % (val, error[val]), val)
-        else:
+    def __reduce__(self):
+        # picklable, e.g. to be raised again in the parent of an andorMulti worker
+        return (AndorError, (self.args[0], self.error))
+
+for _spec in functions.values():
+    _spec['ignore'] = frozenset(ignoreMessages).union(_spec['ignore'])
+
+def _errcheck(result, func, args):
+    """ ctypes errcheck: raise an AndorError unless the return code is in func.ignore"""
+    if result in func.ignore:
+        return result
+    raise AndorError('Andor Camera Code %d : %s' % (result, error.get(result, 'unknown error')), result)
+
+def _bind(func, spec):
+    """ Configure the foreign function func from its functions table entry, so that
+    argument conversion and error checking are done by ctypes"""
+    func.argtypes = spec['argtypes']
+    func.restype = spec['restype']
+    func.ignore = spec['ignore']
+    func.errcheck = _errcheck
+    return func
+
+# Image retrieval functions: (index of the size argument, bytes per pixel)
+imageFunctions = {'GetAcquiredData' : (1, 4),
+                  'GetAcquiredData16' : (1, 2),
+                  'GetImages' : (3, 4),
+                  'GetImages16' : (3, 2),
+                  'GetMostRecentImage' : (1, 4),
+                  'GetMostRecentImage16' : (1, 2),
+                  'GetOldestImage' : (1, 4),
+                  'GetOldestImage16' : (1, 2)}
+
+class Profiler(object):
+    """ Call count, cumulative time, latency histogram and, for the image retrieval
+    functions, bytes transferred, for each SDK function. See profile()"""
+    #: Upper bounds (s) of the latency histogram bins, the last bin is unbounded
+    buckets = (1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def record(self, name, elapsed, nbytes=0, failed=False):
+        index = bisect.bisect_left(self.buckets, elapsed)
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = {'count': 0, 'errors': 0, 'time': 0.0, 'bytes': 0,
+                                            'histogram': [0] * (len(self.buckets) + 1)}
+            stats['count'] += 1
+            stats['errors'] += failed
+            stats['time'] += elapsed
+            stats['bytes'] += nbytes
+            stats['histogram'][index] += 1
+
+    def wrap(self, name, func):
+        """ Return func, recording its calls under name"""
+        record = self.record
+        clock = time.perf_counter
+        size = imageFunctions.get(name)
+        def profiled(*args):
+            start = clock()
+            try:
+                result = func(*args)
+            except Exception:
+                record(name, clock() - start, failed=True)
+                raise
+            elapsed = clock() - start
+            if size is None:
+                record(name, elapsed)
+            else:
+                pixels = args[size[0]]
+                record(name, elapsed, getattr(pixels, 'value', pixels) * size[1])
+            return result
+        profiled.__name__ = name
+        profiled.__wrapped__ = func
+        return profiled
+
+    def snapshot(self):
+        """ Return a copy of the statistics: {function: {count, errors, time, bytes, histogram}}"""
+        with self.lock:
+            return dict((name, dict(stats, histogram=list(stats['histogram']))) for name, stats in self.stats.items())
+
+    def to_json(self, filename=None):
+        """ Return the statistics as a JSON string, and write them to filename if given"""
+        text = json.dumps({'buckets': list(self.buckets), 'functions': self.snapshot()}, indent=1, sort_keys=True)
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self, filename=None):
+        """ Return the statistics in the Prometheus text exposition format, and write
+        them to filename if given (e.g. for the node exporter textfile collector)"""
+        stats = sorted(self.snapshot().items())
+        lines = ['# HELP andor_sdk_call_seconds Time spent in Andor SDK calls.',
+                 '# TYPE andor_sdk_call_seconds histogram']
+        for name, s in stats:
+            total = 0
+            for bound, n in zip(self.buckets + (float('inf'),), s['histogram']):
+                total += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('andor_sdk_call_seconds_bucket{function="%s",le="%s"} %d' % (name, le, total))
+            lines.append('andor_sdk_call_seconds_sum{function="%s"} %r' % (name, s['time']))
+            lines.append('andor_sdk_call_seconds_count{function="%s"} %d' % (name, s['count']))
+        lines += ['# HELP andor_sdk_errors_total Andor SDK calls that raised an error.',
+                  '# TYPE andor_sdk_errors_total counter']
+        lines += ['andor_sdk_errors_total{function="%s"} %d' % (name, s['errors']) for name, s in stats]
+        lines += ['# HELP andor_sdk_bytes_total Image data transferred by the Andor SDK.',
+                  '# TYPE andor_sdk_bytes_total counter']
+        lines += ['andor_sdk_bytes_total{function="%s"} %d' % (name, s['bytes']) for name, s in stats if name in imageFunctions]
+        text = '\n'.join(lines) + '\n'
+        if filename is not None:
+            # write then rename, so that a collector never reads a partial file
+            with open(filename + '.tmp', 'w') as f:
+                f.write(text)
+            _replace(filename + '.tmp', filename)
+        return text
+
+    def __repr__(self):
+        lines = ['%-32s %8s %7s %12s %12s %12s' % ('function', 'calls', 'errors', 'total [s]', 'mean [us]', 'bytes')]
+        for name, s in sorted(self.snapshot().items(), key=lambda item: -item[1]['time']):
+            lines.append('%-32s %8d %7d %12.6f %12.1f %12d' % (name, s['count'], s['errors'], s['time'],
+                                                              1e6 * s['time'] / s['count'], s['bytes']))
+        return '\n'.join(lines)
+
+profiler = None # the active Profiler, see profile()
+
+def profile(enable=True):
+    """ Start (enable=True) or stop recording the SDK calls, return the Profiler.
+    While disabled, the module functions are the bare foreign functions and cost nothing extra.
+    Also enabled at import by setting the ANDOR_PROFILE environment variable"""
+    global profiler
+    if enable:
+        if profiler is None:
+            profiler = Profiler()
+            _instrument()
+        return profiler
+    result, profiler = profiler, None
+    for func in functions:
+        if hasattr(globals().get(func), '__wrapped__'):
+            globals()[func] = globals()[func].__wrapped__
+    return result
+
+def _instrument():
+    for func in functions:
+        if func in globals() and not hasattr(globals()[func], '__wrapped__'):
+            globals()[func] = profiler.wrap(func, globals()[func])
+
+def _load_library(backend=None):
+    """ Return the SDK library for backend: 'sim' for the simulated camera of
+    andorSim, a path to a library file, or None for Andor's library of this platform"""
+    if backend == 'sim':
+        import andorSim
+        return andorSim.Library()
+    if backend:
+        return ctypes.windll.LoadLibrary(backend) if sys.platform == 'win32' else ctypes.cdll.LoadLibrary(backend)
+    if sys.platform == 'win32':
+        return ctypes.windll.LoadLibrary('atmcd64d.dll' if sys.maxsize > 2**32 else 'atmcd32d.dll')
+    for path in ('libandor.so', '/usr/local/lib/libandor.so'):
+        try:
+            return ctypes.cdll.LoadLibrary(path)
+        except OSError:
             pass
-        return val
-    return output
-
-for func in functions:
-    try:
-        vars()[func] = _andorFuncGen(__atmcd32d__[func])
-        vars()[func].argtypes = functions[func]['argtypes']
-        vars()[func].restype = functions[func]['restype']
-    except Exception:
-        pass
+    raise OSError('The Andor SDK (libandor.so) could not be found, install it or set ANDOR_BACKEND=sim to use a simulated camera')
+
+def load(backend=None):
+    """ Load the SDK and bind its functions to this module.
+    backend defaults to the ANDOR_BACKEND environment variable, see _load_library.
+    Functions the library does not provide are not defined"""
+    global library
+    if backend is None:
+        backend = os.environ.get('ANDOR_BACKEND')
+    library = _load_library(backend)
+    for func in functions:
+        try:
+            globals()[func] = _bind(library[func], functions[func])
+        except Exception:
+            globals().pop(func, None)
+    if profiler is not None:
+        _instrument()
+    return library
+
+load()
+if os.environ.get('ANDOR_PROFILE'):
+    profile()
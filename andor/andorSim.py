@@ -0,0 +1,1162 @@
+"""Simulated Andor SDK2 camera.
+
+Implements (part of) the function table of :mod:`andorSDK` in Python, so that
+:mod:`andor2` can run without a camera, e.g. to benchmark or regression-test the
+readout paths on CI machines. Select it with::
+
+  $ ANDOR_BACKEND=sim python ...
+
+or at run time with ``andorSDK.load('sim')``. The simulated camera is then
+``andorSDK.library`` and can be configured through its attributes
+(``width``, ``height``, ``noise``, ``frame_rate``, ...).
+
+Functions take the same arguments as the real ones (``ctypes.byref()`` objects,
+pointers for arrays, string buffers...) and return the SDK error
+codes. Functions that are not simulated are missing from the library, as they
+would be from an old SDK version.
+
+Timing is computed from the wall clock: the image *i* of an acquisition is
+available at ``start + exposure + readout + (i-1) * cycle``, where the readout
+time depends on the number of rows shifted, the vertical shift speed, the number
+of pixels digitised and the horizontal shift speed.
+"""
+import ctypes
+import os
+import threading
+import time
+
+import numpy
+
+DRV_SUCCESS = 20002
+DRV_NO_NEW_DATA = 20024
+DRV_TEMPERATURE_OFF = 20034
+DRV_TEMPERATURE_NOT_STABILIZED = 20035
+DRV_TEMPERATURE_STABILIZED = 20036
+DRV_TEMPERATURE_NOT_REACHED = 20037
+DRV_P1INVALID = 20066
+DRV_P2INVALID = 20067
+DRV_P3INVALID = 20068
+DRV_P4INVALID = 20069
+DRV_P5INVALID = 20076
+DRV_P6INVALID = 20077
+DRV_P7INVALID = 20083
+DRV_ACQUIRING = 20072
+DRV_IDLE = 20073
+DRV_NOT_INITIALIZED = 20075
+DRV_NOT_SUPPORTED = 20991
+DRV_NOT_AVAILABLE = 20992
+
+def _target(ref):
+    """Return the ctypes object an output argument refers to."""
+    if hasattr(ref, '_obj'): # ctypes.byref()
+        return ref._obj
+    if isinstance(ref, ctypes._Pointer):
+        return ref.contents
+    return ref
+
+def _set(ref, value):
+    """Write value to an output argument."""
+    _target(ref).value = value
+
+def _value(arg):
+    """Return the Python value of an input argument."""
+    return arg.value if hasattr(arg, 'value') else arg
+
+def _array(ref, count, dtype):
+    """Return a numpy array of count elements sharing the memory an argument points to."""
+    address = ctypes.cast(ref, ctypes.c_void_p).value
+    nbytes = count * numpy.dtype(dtype).itemsize
+    return numpy.frombuffer((ctypes.c_char * nbytes).from_address(address), dtype=dtype)
+
+
+class Function(object):
+    """A simulated SDK function, configured like a ctypes foreign function.
+
+    The arguments are checked against ``argtypes`` (but passed unconverted) and the
+    return code goes through ``errcheck``, so that the binding code paths of
+    :mod:`andorSDK` are the same as with the real library.
+    """
+    def __init__(self, method):
+        self._method = method
+        self.__name__ = method.__name__
+        self.argtypes = None
+        self.restype = ctypes.c_int
+        self.errcheck = None
+
+    def __call__(self, *args):
+        if self.argtypes is not None:
+            if len(args) != len(self.argtypes):
+                raise TypeError('this function takes %d arguments (%d given)' % (len(self.argtypes), len(args)))
+            for i, (argtype, arg) in enumerate(zip(self.argtypes, args)):
+                try:
+                    argtype.from_param(arg)
+                except TypeError as error:
+                    raise ctypes.ArgumentError('argument %d: %s' % (i + 1, error))
+        result = self._method(*args)
+        if self.errcheck is not None:
+            result = self.errcheck(result, self, args)
+        return result
+
+    def __repr__(self):
+        return '<Simulated SDK function %s>' % self.__name__
+
+
+class Library(object):
+    """The simulated camera, exposing the SDK functions by name (``library['GetStatus']``)."""
+    # Simulated hardware, can be changed per instance before Initialize() is called.
+    serial_number = 12345
+    #: Number of cameras reported by GetAvailableCameras (handles 100, 101...); they all behave
+    #: the same but have consecutive serial numbers
+    cameras = int(os.environ.get('ANDOR_SIM_CAMERAS', 1))
+    head_model = b'DU940P-BV'
+    controller_card = b'USB'
+    camera_type = 7 # AC_CAMERATYPE_IDUS
+    width = 2048
+    height = 512
+    pixel_size = (13.5, 13.5)
+    bit_depths = (16,)
+    #: Horizontal shift speeds (MHz) for each [amplifier][ADC channel]
+    hs_speeds = (((3.0, 1.0, 0.05),), ((3.0, 1.0, 0.05),))
+    #: Vertical shift speeds (us)
+    vs_speeds = (4.25, 8.25, 16.25, 32.25, 64.25)
+    preamp_gains = (1.0, 2.0, 4.0)
+    em_gain_range = (0, 255)
+    temperature_range = (-100, 20)
+    ambient_temperature = 20.0
+    #: Time constant (s) of the simulated cooling
+    cooling_time = 30.0
+    shutter_times = (10, 10)
+    max_exposure = 1000.0
+    #: Number of exposure times the camera can cycle through (SetRingExposureTimes)
+    max_ring_exposures = 16
+    #: Memory (bytes) available to the circular buffer
+    buffer_memory = 64 * 2**20
+    #: Mean dark level (counts) and read noise (counts rms)
+    baseline = 300.0
+    noise = 5.0
+    #: Peak signal of the simulated spectrum (counts per pixel per second of exposure)
+    signal = 20000.0
+    #: If not None, maximum frame rate (Hz), e.g. the rate of an external trigger
+    frame_rate = None
+    #: Number of the images requested from GetImages that are reported as overwritten
+    #: during the call (the valid range then starts later)
+    overwritten_images = 0
+    seed = 0
+    capabilities = {'ulAcqModes': 1 | 2 | 4 | 8 | 16 | 32,
+                    'ulReadModes': 1 | 2 | 4 | 8 | 16 | 32 | 64,
+                    'ulFTReadModes': 0,
+                    'ulTriggerModes': 1 | 2 | 16 | 32,
+                    'ulPixelMode': 4,
+                    'ulSetFunctions': 0x1 | 0x2 | 0x4 | 0x200 | 0x400 | 0x1000 | 0x10000000,
+                    'ulGetFunctions': 0x1 | 0x4 | 0x8,
+                    'ulFeatures': 1 | 2 | 4 | 8 | 512 | 0x8000,
+                    'ulPCICard': 0,
+                    'ulEMGainCapability': 0}
+
+    def __init__(self, **settings):
+        """Any class attribute (``width``, ``noise``, ``frame_rate``...) can be overridden by keyword."""
+        for key, value in settings.items():
+            if not hasattr(self, key):
+                raise AttributeError('Unknown simulator setting: ' + key)
+            setattr(self, key, value)
+        self._functions = {}
+        self._lock = threading.RLock()
+        self._cancel = threading.Event()
+        self._initialized = False
+        self._handle = 100
+        self._reset()
+
+    def _reset(self):
+        self.acquisition_mode = 1
+        self.read_mode = 4
+        self.read_settings = {}
+        #: horizontal binning of the track read modes (0, 1, 2, 3), see SetFVBHBin etc.
+        self.track_hbin = {}
+        self.trigger_mode = 0
+        self.exposure = 0.01
+        #: exposure times cycled through in a kinetic series (None: always exposure)
+        self.ring_exposures = None
+        self.accumulations = 1
+        self.accumulation_cycle = 0.0
+        self.kinetics = 1
+        self.kinetic_cycle = 0.0
+        self.frame_transfer = False
+        #: (exposed rows, series length, read mode, hbin, vbin, offset)
+        self.fast_kinetics = None
+        #: (crop height, crop width, vbin, hbin, crop left, crop bottom) of the isolated crop mode
+        self.isolated_crop = None
+        self.amplifier = 0
+        self.ad_channel = 0
+        self.hs_speed = 0
+        self.vs_speed = 0
+        self.vs_amplitude = 0
+        self.preamp_gain = 0
+        self.em_gain = 0
+        self.cooler = False
+        self.setpoint = 20
+        self._temperature = (self.ambient_temperature, time.time())
+        self._image(1, 1, 1, self.width, 1, self.height)
+        self._started = None
+        self._started_at = None
+        self._frames = 0
+        self._retrieved = 0
+        self._events = 0
+        self.metadata = False
+        self.spool = None
+        self.spool_threads = 1
+        self._spooled = 0
+
+    def __getitem__(self, name):
+        if name not in self._functions:
+            method = getattr(self, name, None)
+            if name.startswith('_') or not name[:1].isupper() or not callable(method):
+                raise KeyError(name)
+            self._functions[name] = Function(method)
+        return self._functions[name]
+
+    def __repr__(self):
+        return "<Simulated Andor camera %s, %dx%d pixels>" % (self.head_model.decode('ascii'), self.width, self.height)
+
+    # Read-out geometry
+
+    def _image(self, hbin, vbin, hstart, hend, vstart, vend):
+        """Set the read-out geometry from an image sub-area (1-based, inclusive).
+
+        In isolated crop mode the coordinates are relative to the crop, and only
+        the rows up to the top of the crop are shifted.
+        """
+        self._shape = [(vend - vstart + 1) // vbin, (hend - hstart + 1) // hbin]
+        self._area = hbin * vbin
+        self._shifted_rows = self.height
+        if self.isolated_crop is not None:
+            height, width, _, _, left, bottom = self.isolated_crop
+            hstart, hend = hstart + left - 1, hend + left - 1
+            vstart, vend = vstart + bottom - 1, vend + bottom - 1
+            self._shifted_rows = bottom - 1 + height
+        self._geometry = (hbin, vbin, hstart, hend, vstart, vend)
+
+    def _tracks(self, number, height, hbin=1):
+        """Set the read-out geometry for *number* vertically binned tracks."""
+        self._shape = [number, self.width // hbin]
+        self._geometry = (hbin, height, 1, self.width, 1, number * height)
+        self._area = height * hbin
+        self._shifted_rows = self.height
+
+    def _scan(self, height, number, hstart, hend, hbin, vbin, gap, offset, skip, subframes):
+        """Set the read-out geometry of a multi-track scan."""
+        self._shape = [subframes * number * (height // vbin), (hend - hstart + 1) // hbin]
+        self._geometry = (hbin, vbin, hstart, hend, offset + 1, offset + number * (height + gap) - gap)
+        self._area = hbin * vbin
+        self._shifted_rows = self.height
+
+    def _fast_kinetics_geometry(self, rows, series, mode, hbin, vbin, offset):
+        """Set the read-out geometry of one sub-image of a fast kinetics series."""
+        if mode == 0:
+            self._shape = [1, self.width // hbin]
+            self._area = rows * hbin
+        else:
+            self._shape = [rows // vbin, self.width // hbin]
+            self._area = vbin * hbin
+        self._geometry = (hbin, vbin, 1, self.width, offset + 1, offset + rows)
+        self._shifted_rows = self.height
+
+    def _apply_geometry(self):
+        """Set the read-out geometry from the acquisition and read modes."""
+        settings = self.read_settings.get(self.read_mode)
+        if self.acquisition_mode == 4 and self.fast_kinetics is not None:
+            self._fast_kinetics_geometry(*self.fast_kinetics)
+        elif self.read_mode == 0:
+            self._tracks(1, self.height, self.track_hbin.get(0, 1))
+        elif settings is not None and settings[0] == 'tracks':
+            self._tracks(*settings[1:], hbin=self.track_hbin.get(self.read_mode, 1))
+        elif settings is not None:
+            getattr(self, '_' + settings[0])(*settings[1:])
+        elif self.read_mode == 4:
+            self._image(1, 1, 1, self.width, 1, self.height)
+        else:
+            self._tracks(1, self.height)
+
+    @property
+    def pixels(self):
+        """Number of pixels in a read-out image."""
+        return self._shape[0] * self._shape[1]
+
+    @property
+    def readout_time(self):
+        """Time (s) to shift and digitise one image."""
+        hss = self.hs_speeds[self.amplifier][self.ad_channel][self.hs_speed]
+        return (self._shifted_rows * self.vs_speeds[self.vs_speed] + self.pixels / hss) * 1e-6
+
+    # Acquisition timing
+
+    @property
+    def _cycle(self):
+        """Time (s) between two images of the series."""
+        if self.acquisition_mode == 4: # the exposed rows are shifted under the mask, not read out
+            return self.exposure + self.fast_kinetics[0] * self.vs_speeds[self.vs_speed] * 1e-6
+        if self.frame_transfer and self.acquisition_mode in (3, 5):
+            exposure = max(self.exposure, self.readout_time) # the next exposure overlaps the readout
+        else:
+            exposure = self.exposure + self.readout_time
+        if self.acquisition_mode == 2:
+            exposure = max(exposure, self.accumulation_cycle) * self.accumulations
+        if self.acquisition_mode in (3, 5):
+            exposure = max(exposure * self.accumulations, self.kinetic_cycle)
+        if self.frame_rate:
+            exposure = max(exposure, 1.0 / self.frame_rate)
+        return exposure
+
+    @property
+    def _series_length(self):
+        if self.acquisition_mode == 5:
+            return None
+        if self.acquisition_mode == 4:
+            return self.fast_kinetics[1]
+        return self.kinetics if self.acquisition_mode == 3 else 1
+
+    @property
+    def _fast_kinetics_duration(self):
+        """Time (s) to expose the whole fast kinetics series and read it out."""
+        return self._series_length * (self._cycle + self.readout_time)
+
+    def _update(self):
+        """Update the number of acquired images from the clock, return it."""
+        with self._lock:
+            if self._started is not None:
+                elapsed = time.time() - self._started
+                if self.acquisition_mode == 4: # the series is read out at once, at the end
+                    n = self._series_length if elapsed >= self._fast_kinetics_duration else 0
+                else:
+                    n = int((elapsed - self.exposure - self.readout_time) // self._cycle) + 1 if elapsed > 0 else 0
+                n = max(n, 0)
+                length = self._series_length
+                if length is not None and n >= length:
+                    n = length
+                    self._started = None
+                self._frames = max(self._frames, n)
+            return self._frames
+
+    @property
+    def _acquiring(self):
+        self._update()
+        return self._started is not None
+
+    def _next_frame_time(self):
+        """Time at which the next image will be available."""
+        if self.acquisition_mode == 4:
+            return self._started + self._fast_kinetics_duration
+        return self._started + self.exposure + self.readout_time + self._frames * self._cycle
+
+    @property
+    def buffer_size(self):
+        """Number of images the circular buffer can hold."""
+        return max(1, self.buffer_memory // (4 * self.pixels))
+
+    def _available(self):
+        """(first, last) indices of the images still in the circular buffer."""
+        last = self._update()
+        return max(1, last - self.buffer_size + 1), last
+
+    def frame(self, index):
+        """Return image *index* (1-based) of the current acquisition as a float array."""
+        rng = numpy.random.RandomState((self.seed + index) % 2**32)
+        rows, columns = self._shape
+        x = numpy.linspace(-1.0, 1.0, columns)
+        spectrum = numpy.exp(-(x / 0.02)**2) + 0.3 * numpy.exp(-((x - 0.4) / 0.05)**2)
+        exposure = self.exposure
+        if self.ring_exposures is not None and self.acquisition_mode == 3:
+            exposure = self.ring_exposures[(index - 1) % len(self.ring_exposures)]
+        mean = self._area * (self.baseline / self.accumulations + self.signal * exposure * spectrum)
+        data = mean * self.accumulations + rng.normal(0, self.noise * self.accumulations**0.5, (rows, columns))
+        return numpy.clip(data, 0, 2**self.bit_depths[self.ad_channel] - 1)
+
+    def _read(self, ref, size, dtype, first, last):
+        """Copy images first..last into the array ref of size pixels."""
+        n = last - first + 1
+        if size != n * self.pixels:
+            return DRV_P3INVALID
+        data = _array(ref, size, dtype).reshape([n] + self._shape)
+        for i in range(n):
+            data[i] = self.frame(first + i)
+        return DRV_SUCCESS
+
+    # SDK functions
+
+    def Initialize(self, directory):
+        self._reset()
+        self._initialized = True
+        return DRV_SUCCESS
+
+    def ShutDown(self):
+        self._initialized = False
+        self._started = None
+        return DRV_SUCCESS
+
+    def GetAvailableCameras(self, number):
+        _set(number, self.cameras)
+        return DRV_SUCCESS
+
+    def GetCameraHandle(self, index, handle):
+        if not 0 <= _value(index) < self.cameras:
+            return DRV_P1INVALID
+        _set(handle, 100 + _value(index))
+        return DRV_SUCCESS
+
+    def GetCurrentCamera(self, handle):
+        _set(handle, self._handle)
+        return DRV_SUCCESS
+
+    def SetCurrentCamera(self, handle):
+        if not 100 <= _value(handle) < 100 + self.cameras:
+            return DRV_P1INVALID
+        self._handle = _value(handle)
+        return DRV_SUCCESS
+
+    def GetCameraSerialNumber(self, number):
+        _set(number, self.serial_number + self._handle - 100)
+        return DRV_SUCCESS
+
+    def GetControllerCardModel(self, name):
+        _set(name, self.controller_card)
+        return DRV_SUCCESS
+
+    def GetHeadModel(self, name):
+        _set(name, self.head_model)
+        return DRV_SUCCESS
+
+    def GetCapabilities(self, caps):
+        caps = _target(caps)
+        caps.ulCameraType = self.camera_type
+        for field, value in self.capabilities.items():
+            setattr(caps, field, value)
+        return DRV_SUCCESS
+
+    def GetDetector(self, xpixels, ypixels):
+        _set(xpixels, self.width)
+        _set(ypixels, self.height)
+        return DRV_SUCCESS
+
+    def GetPixelSize(self, xsize, ysize):
+        _set(xsize, self.pixel_size[0])
+        _set(ysize, self.pixel_size[1])
+        return DRV_SUCCESS
+
+    # Amplifiers, ADC and shift speeds
+
+    def GetNumberAmp(self, number):
+        _set(number, len(self.hs_speeds))
+        return DRV_SUCCESS
+
+    def GetAmpDesc(self, index, name, length):
+        if not 0 <= _value(index) < len(self.hs_speeds):
+            return DRV_P1INVALID
+        _set(name, (b'Electron Multiplying', b'Conventional')[_value(index) % 2][:_value(length) - 1])
+        return DRV_SUCCESS
+
+    def GetAmpMaxSpeed(self, index, speed):
+        if not 0 <= _value(index) < len(self.hs_speeds):
+            return DRV_P1INVALID
+        _set(speed, max(self.hs_speeds[_value(index)][0]))
+        return DRV_SUCCESS
+
+    def SetOutputAmplifier(self, amp):
+        if not 0 <= _value(amp) < len(self.hs_speeds):
+            return DRV_P1INVALID
+        self.amplifier = _value(amp)
+        self.hs_speed = 0
+        return DRV_SUCCESS
+
+    def GetNumberADChannels(self, number):
+        _set(number, len(self.bit_depths))
+        return DRV_SUCCESS
+
+    def SetADChannel(self, channel):
+        if not 0 <= _value(channel) < len(self.bit_depths):
+            return DRV_P1INVALID
+        self.ad_channel = _value(channel)
+        return DRV_SUCCESS
+
+    def GetBitDepth(self, channel, depth):
+        if not 0 <= _value(channel) < len(self.bit_depths):
+            return DRV_P1INVALID
+        _set(depth, self.bit_depths[_value(channel)])
+        return DRV_SUCCESS
+
+    def GetNumberHSSpeeds(self, channel, amp, number):
+        _set(number, len(self.hs_speeds[_value(amp)][_value(channel)]))
+        return DRV_SUCCESS
+
+    def GetHSSpeed(self, channel, amp, index, speed):
+        speeds = self.hs_speeds[_value(amp)][_value(channel)]
+        if not 0 <= _value(index) < len(speeds):
+            return DRV_P3INVALID
+        _set(speed, speeds[_value(index)])
+        return DRV_SUCCESS
+
+    def SetHSSpeed(self, amp, index):
+        if not 0 <= _value(index) < len(self.hs_speeds[_value(amp)][self.ad_channel]):
+            return DRV_P2INVALID
+        self.hs_speed = _value(index)
+        return DRV_SUCCESS
+
+    def GetNumberVSSpeeds(self, number):
+        _set(number, len(self.vs_speeds))
+        return DRV_SUCCESS
+
+    def GetVSSpeed(self, index, speed):
+        if not 0 <= _value(index) < len(self.vs_speeds):
+            return DRV_P1INVALID
+        _set(speed, self.vs_speeds[_value(index)])
+        return DRV_SUCCESS
+
+    def GetFastestRecommendedVSSpeed(self, index, speed):
+        _set(index, 1)
+        _set(speed, self.vs_speeds[1])
+        return DRV_SUCCESS
+
+    def SetVSSpeed(self, index):
+        if not 0 <= _value(index) < len(self.vs_speeds):
+            return DRV_P1INVALID
+        self.vs_speed = _value(index)
+        return DRV_SUCCESS
+
+    def SetVSAmplitude(self, amplitude):
+        self.vs_amplitude = _value(amplitude)
+        return DRV_SUCCESS
+
+    def GetNumberPreAmpGains(self, number):
+        _set(number, len(self.preamp_gains))
+        return DRV_SUCCESS
+
+    def GetPreAmpGain(self, index, gain):
+        if not 0 <= _value(index) < len(self.preamp_gains):
+            return DRV_P1INVALID
+        _set(gain, self.preamp_gains[_value(index)])
+        return DRV_SUCCESS
+
+    def SetPreAmpGain(self, index):
+        if not 0 <= _value(index) < len(self.preamp_gains):
+            return DRV_P1INVALID
+        self.preamp_gain = _value(index)
+        return DRV_SUCCESS
+
+    # EM gain
+
+    def GetEMCCDGain(self, gain):
+        _set(gain, self.em_gain)
+        return DRV_SUCCESS
+
+    def SetEMCCDGain(self, gain):
+        self.em_gain = _value(gain)
+        return DRV_SUCCESS
+
+    def GetEMGainRange(self, low, high):
+        _set(low, self.em_gain_range[0])
+        _set(high, self.em_gain_range[1])
+        return DRV_SUCCESS
+
+    # Temperature
+
+    @property
+    def temperature(self):
+        """Current (simulated) sensor temperature."""
+        value, since = self._temperature
+        target = self.setpoint if self.cooler else self.ambient_temperature
+        now = time.time()
+        value = target + (value - target) * numpy.exp(-(now - since) / self.cooling_time)
+        self._temperature = (value, now)
+        return value
+
+    def GetTemperatureRange(self, tmin, tmax):
+        _set(tmin, self.temperature_range[0])
+        _set(tmax, self.temperature_range[1])
+        return DRV_SUCCESS
+
+    def GetTemperaturePrecision(self, precision):
+        _set(precision, 0)
+        return DRV_SUCCESS
+
+    def GetTemperature(self, value):
+        temperature = self.temperature
+        _set(value, int(round(temperature)))
+        if not self.cooler:
+            return DRV_TEMPERATURE_OFF
+        if abs(temperature - self.setpoint) < 0.5:
+            return DRV_TEMPERATURE_STABILIZED
+        return DRV_TEMPERATURE_NOT_REACHED
+
+    def GetTemperatureF(self, value):
+        code = self.GetTemperature(ctypes.byref(ctypes.c_int32()))
+        _set(value, self.temperature)
+        return code
+
+    def SetTemperature(self, value):
+        if not self.temperature_range[0] <= _value(value) <= self.temperature_range[1]:
+            return DRV_P1INVALID
+        self.temperature # settle the current value before changing the target
+        self.setpoint = _value(value)
+        return DRV_SUCCESS
+
+    def CoolerON(self):
+        self.temperature
+        self.cooler = True
+        return DRV_SUCCESS
+
+    def CoolerOFF(self):
+        self.temperature
+        self.cooler = False
+        return DRV_SUCCESS
+
+    def IsCoolerOn(self, state):
+        _set(state, int(self.cooler))
+        return DRV_SUCCESS
+
+    # Shutter and trigger
+
+    def IsInternalMechanicalShutter(self, installed):
+        _set(installed, 1)
+        return DRV_SUCCESS
+
+    def GetShutterMinTimes(self, closing, opening):
+        _set(closing, self.shutter_times[0])
+        _set(opening, self.shutter_times[1])
+        return DRV_SUCCESS
+
+    def SetShutter(self, ttl, mode, closingtime, openingtime):
+        return DRV_SUCCESS
+
+    def SetTriggerMode(self, mode):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        self.trigger_mode = _value(mode)
+        return DRV_SUCCESS
+
+    def SetFastExtTrigger(self, mode):
+        return DRV_SUCCESS
+
+    def SetTriggerInvert(self, mode):
+        return DRV_SUCCESS
+
+    # Read modes
+
+    def SetReadMode(self, mode):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        if not 0 <= _value(mode) <= 5:
+            return DRV_P1INVALID
+        self.read_mode = _value(mode)
+        self._apply_geometry()
+        return DRV_SUCCESS
+
+    def _store(self, mode, method, *args):
+        """Remember the settings of a read mode, apply them if it is the current one."""
+        self.read_settings[mode] = (method,) + args
+        if self.read_mode == mode:
+            self._apply_geometry()
+
+    def SetImage(self, hbin, vbin, hstart, hend, vstart, vend):
+        args = [_value(a) for a in (hbin, vbin, hstart, hend, vstart, vend)]
+        hbin, vbin, hstart, hend, vstart, vend = args
+        height, width = self.height, self.width
+        if self.isolated_crop is not None:
+            height, width = self.isolated_crop[:2]
+        if not 1 <= hstart <= hend <= width:
+            return DRV_P3INVALID
+        if not 1 <= vstart <= vend <= height:
+            return DRV_P4INVALID
+        if hbin < 1 or (hend - hstart + 1) % hbin:
+            return DRV_P1INVALID
+        if vbin < 1 or (vend - vstart + 1) % vbin:
+            return DRV_P2INVALID
+        self._store(4, 'image', *args)
+        return DRV_SUCCESS
+
+    def SetIsolatedCropMode(self, active, height, width, vbin, hbin):
+        return self.SetIsolatedCropModeEx(active, height, width, vbin, hbin, 1, 1)
+
+    def SetIsolatedCropModeEx(self, active, height, width, vbin, hbin, left, bottom):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        active, height, width, vbin, hbin, left, bottom = [_value(a) for a in (active, height, width, vbin, hbin, left, bottom)]
+        if active not in (0, 1):
+            return DRV_P1INVALID
+        if not active:
+            self.isolated_crop = None
+            self._store(4, 'image', 1, 1, 1, self.width, 1, self.height)
+            return DRV_SUCCESS
+        if self.read_mode != 4:
+            return DRV_NOT_SUPPORTED
+        if height < 1 or bottom < 1 or bottom - 1 + height > self.height:
+            return DRV_P2INVALID
+        if width < 1 or left < 1 or left - 1 + width > self.width:
+            return DRV_P3INVALID
+        if vbin < 1 or height % vbin:
+            return DRV_P4INVALID
+        if hbin < 1 or width % hbin:
+            return DRV_P5INVALID
+        self.isolated_crop = (height, width, vbin, hbin, left, bottom)
+        self._store(4, 'image', hbin, vbin, 1, width, 1, height)
+        return DRV_SUCCESS
+
+    def SetSingleTrack(self, center, height):
+        center, height = _value(center), _value(height)
+        if not 1 <= center <= self.height:
+            return DRV_P1INVALID
+        if not 1 <= height <= self.height:
+            return DRV_P2INVALID
+        self._store(3, 'tracks', 1, height)
+        return DRV_SUCCESS
+
+    def SetMultiTrack(self, number, height, offset, bottom, gap):
+        number, height, offset = _value(number), _value(height), _value(offset)
+        if not 1 <= number <= self.height:
+            return DRV_P1INVALID
+        if height < 1 or number * height > self.height:
+            return DRV_P2INVALID
+        gaps = (self.height - number * height) // (number + 1)
+        _set(gap, gaps)
+        _set(bottom, 1 + gaps + offset)
+        self._store(1, 'tracks', number, height)
+        return DRV_SUCCESS
+
+    def SetRandomTracks(self, number, areas):
+        number = _value(number)
+        if number < 1:
+            return DRV_P1INVALID
+        tracks = _array(areas, 2 * number, numpy.int32)
+        heights = tracks[1::2] - tracks[0::2] + 1
+        if (heights < 1).any() or tracks.min() < 1 or tracks.max() > self.height:
+            return DRV_P2INVALID
+        self._store(2, 'tracks', number, int(heights.max()))
+        return DRV_SUCCESS
+
+    # Acquisition settings
+
+    def SetAcquisitionMode(self, mode):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        if _value(mode) not in (1, 2, 3, 4, 5):
+            return DRV_P1INVALID
+        if _value(mode) == 4 and self.fast_kinetics is None:
+            self.fast_kinetics = (self.height, 1, 4, 1, 1, 0)
+        self.acquisition_mode = _value(mode)
+        self._apply_geometry()
+        return DRV_SUCCESS
+
+    def _hbin(self, mode, hbin):
+        """Set the horizontal binning of a track read mode."""
+        hbin = _value(hbin)
+        if hbin < 1 or self.width % hbin:
+            return DRV_P1INVALID
+        self.track_hbin[mode] = hbin
+        if self.read_mode == mode:
+            self._apply_geometry()
+        return DRV_SUCCESS
+
+    def SetFVBHBin(self, hbin):
+        return self._hbin(0, hbin)
+
+    def SetMultiTrackHBin(self, hbin):
+        return self._hbin(1, hbin)
+
+    def SetCustomTrackHBin(self, hbin):
+        return self._hbin(2, hbin)
+
+    def SetSingleTrackHBin(self, hbin):
+        return self._hbin(3, hbin)
+
+    def SetMultiTrackScan(self, height, number, hstart, hend, hbin, vbin, gap, offset, skip, subframes):
+        args = [_value(a) for a in (height, number, hstart, hend, hbin, vbin, gap, offset, skip, subframes)]
+        height, number, hstart, hend, hbin, vbin, gap, offset, skip, subframes = args
+        if height < 1:
+            return DRV_P1INVALID
+        if number < 1 or subframes < 1 or offset < 0 or offset + number * (height + gap) - gap > self.height:
+            return DRV_P2INVALID
+        if not 1 <= hstart <= self.width:
+            return DRV_P3INVALID
+        if not hstart <= hend <= self.width:
+            return DRV_P4INVALID
+        if hbin < 1 or (hend - hstart + 1) % hbin:
+            return DRV_P5INVALID
+        if vbin < 1 or height % vbin:
+            return DRV_P6INVALID
+        if gap < 0 or skip < 0:
+            return DRV_P7INVALID
+        self._store(5, 'scan', *args)
+        return DRV_SUCCESS
+
+    def SetFastKinetics(self, rows, series, exposure, mode, hbin, vbin):
+        return self.SetFastKineticsEx(rows, series, exposure, mode, hbin, vbin, 0)
+
+    def SetFastKineticsEx(self, rows, series, exposure, mode, hbin, vbin, offset):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        rows, series, mode, hbin, vbin, offset = [_value(a) for a in (rows, series, mode, hbin, vbin, offset)]
+        if not 1 <= rows <= self.height:
+            return DRV_P1INVALID
+        if series < 1:
+            return DRV_P2INVALID
+        if not 0 <= _value(exposure) <= self.max_exposure:
+            return DRV_P3INVALID
+        if mode not in (0, 4):
+            return DRV_P4INVALID
+        if hbin < 1 or self.width % hbin:
+            return DRV_P5INVALID
+        if vbin < 1 or (mode == 4 and rows % vbin):
+            return DRV_P6INVALID
+        if not 0 <= offset <= self.height - rows:
+            return DRV_P7INVALID
+        self.fast_kinetics = (rows, series, mode, hbin, vbin, offset)
+        self.exposure = _value(exposure)
+        self._apply_geometry()
+        return DRV_SUCCESS
+
+    def GetFKExposureTime(self, exposure):
+        _set(exposure, self.exposure) # the exposure only, without the shift of the exposed rows
+        return DRV_SUCCESS
+
+    def SetFrameTransferMode(self, mode):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        if _value(mode) not in (0, 1):
+            return DRV_P1INVALID
+        self.frame_transfer = bool(_value(mode))
+        return DRV_SUCCESS
+
+    def SetExposureTime(self, exposure):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        if not 0 <= _value(exposure) <= self.max_exposure:
+            return DRV_P1INVALID
+        self.exposure = _value(exposure)
+        self.ring_exposures = None
+        return DRV_SUCCESS
+
+    def SetRingExposureTimes(self, number, times):
+        """Cycle through the exposure times in kinetic series (the cycle fits the longest one)."""
+        if self._acquiring:
+            return DRV_ACQUIRING
+        number = _value(number)
+        if not 1 <= number <= self.max_ring_exposures:
+            return DRV_P1INVALID
+        times = _array(times, number, numpy.float32)
+        if times.min() < 0 or times.max() > self.max_exposure:
+            return DRV_P2INVALID
+        self.ring_exposures = tuple(float(t) for t in times) if number > 1 else None
+        self.exposure = float(times.max())
+        return DRV_SUCCESS
+
+    def GetNumberRingExposureTimes(self, number):
+        _set(number, len(self.ring_exposures) if self.ring_exposures else 1)
+        return DRV_SUCCESS
+
+    def GetMaximumNumberRingExposureTimes(self, number):
+        _set(number, self.max_ring_exposures)
+        return DRV_SUCCESS
+
+    def GetAdjustedRingExposureTimes(self, number, times):
+        ring = self.ring_exposures or (self.exposure,)
+        if _value(number) != len(ring):
+            return DRV_P1INVALID
+        _array(times, len(ring), numpy.float32)[:] = ring
+        return DRV_SUCCESS
+
+    def GetRingExposureRange(self, minimum, maximum):
+        _set(minimum, 0.0)
+        _set(maximum, self.max_exposure)
+        return DRV_SUCCESS
+
+    def SetNumberAccumulations(self, number):
+        if _value(number) < 1:
+            return DRV_P1INVALID
+        self.accumulations = _value(number)
+        return DRV_SUCCESS
+
+    def SetAccumulationCycleTime(self, cycle):
+        self.accumulation_cycle = _value(cycle)
+        return DRV_SUCCESS
+
+    def SetNumberKinetics(self, number):
+        if _value(number) < 1:
+            return DRV_P1INVALID
+        self.kinetics = _value(number)
+        return DRV_SUCCESS
+
+    def SetKineticCycleTime(self, cycle):
+        self.kinetic_cycle = _value(cycle)
+        return DRV_SUCCESS
+
+    def GetAcquisitionTimings(self, exposure, accumulate, kinetic):
+        _set(exposure, self.exposure)
+        _set(accumulate, max(self.exposure + self.readout_time, self.accumulation_cycle))
+        _set(kinetic, self._cycle)
+        return DRV_SUCCESS
+
+    def GetReadOutTime(self, time):
+        _set(time, self.readout_time)
+        return DRV_SUCCESS
+
+    def GetMaximumExposure(self, exposure):
+        _set(exposure, self.max_exposure)
+        return DRV_SUCCESS
+
+    def GetSizeOfCircularBuffer(self, size):
+        _set(size, self.buffer_size)
+        return DRV_SUCCESS
+
+    # Acquisition control
+
+    def StartAcquisition(self):
+        with self._lock:
+            if self._acquiring:
+                return DRV_ACQUIRING
+            self._started = self._started_at = time.time()
+            self._frames = 0
+            self._retrieved = 0
+            self._events = 0
+            self._spooled = 0
+            self._cancel.clear()
+        return DRV_SUCCESS
+
+    def AbortAcquisition(self):
+        with self._lock:
+            if not self._acquiring:
+                return DRV_IDLE
+            self._started = None
+        return DRV_SUCCESS
+
+    def GetStatus(self, status):
+        _set(status, DRV_ACQUIRING if self._acquiring else DRV_IDLE)
+        return DRV_SUCCESS
+
+    def _wait(self, timeout=None):
+        """Block until a new image is acquired, the wait is cancelled or timeout (s) expires."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._lock:
+                frames = self._update()
+                if frames > self._events:
+                    self._events = frames
+                    return DRV_SUCCESS
+                if self._started is None:
+                    return DRV_NO_NEW_DATA
+                delay = self._next_frame_time() - time.time()
+            if deadline is not None:
+                delay = min(delay, deadline - time.time())
+                if delay <= 0:
+                    return DRV_NO_NEW_DATA
+            if self._cancel.wait(max(delay, 0) + 1e-4):
+                self._cancel.clear()
+                return DRV_NO_NEW_DATA
+
+    def WaitForAcquisition(self):
+        return self._wait()
+
+    def WaitForAcquisitionTimeOut(self, timeout):
+        return self._wait(_value(timeout) / 1000.0)
+
+    def CancelWait(self):
+        self._cancel.set()
+        return DRV_SUCCESS
+
+    def GetAcquisitionProgress(self, accumulations, series):
+        frames = self._update()
+        _set(accumulations, frames * self.accumulations)
+        _set(series, frames)
+        return DRV_SUCCESS
+
+    def SetMetaData(self, state):
+        self.metadata = bool(_value(state))
+        return DRV_SUCCESS
+
+    def GetMetaDataInfo(self, start, offset, index):
+        if not self.metadata or self._started_at is None:
+            return DRV_NOT_AVAILABLE
+        if not 0 <= _value(index) < self._update():
+            return DRV_P3INVALID
+        started = time.localtime(self._started_at)
+        st = _target(start)
+        (st.wYear, st.wMonth, st.wDay, st.wHour, st.wMinute, st.wSecond) = started[:6]
+        st.wDayOfWeek = (started.tm_wday + 1) % 7
+        st.wMilliseconds = int(self._started_at % 1 * 1000)
+        # the frame is acquired at the end of its exposure
+        _set(offset, 1000.0 * (self.exposure + _value(index) * self._cycle))
+        return DRV_SUCCESS
+
+    def GetRelativeImageTimes(self, first, last, arr, size):
+        first, last, size = _value(first), _value(last), _value(size)
+        if not self.metadata or self._started_at is None:
+            return DRV_NOT_AVAILABLE
+        acquired = self._update()
+        if not 0 <= first < acquired:
+            return DRV_P1INVALID
+        if not first <= last < acquired:
+            return DRV_P2INVALID
+        if size < last - first + 1:
+            return DRV_P4INVALID
+        # nanoseconds from the first frame
+        _array(arr, last - first + 1, numpy.uint64)[:] = numpy.arange(first, last + 1) * self._cycle * 1e9
+        return DRV_SUCCESS
+
+    def GetTotalNumberImagesAcquired(self, number):
+        _set(number, self._update())
+        return DRV_SUCCESS
+
+    # Data retrieval
+
+    def GetNumberAvailableImages(self, first, last):
+        first_image, last_image = self._available()
+        if last_image < first_image:
+            return DRV_NO_NEW_DATA
+        _set(first, first_image)
+        _set(last, last_image)
+        return DRV_SUCCESS
+
+    def GetNumberNewImages(self, first, last):
+        first_image, last_image = self._available()
+        first_image = max(first_image, self._retrieved + 1)
+        if last_image < first_image:
+            return DRV_NO_NEW_DATA
+        _set(first, first_image)
+        _set(last, last_image)
+        return DRV_SUCCESS
+
+    def _images(self, first, last, arr, size, validfirst, validlast, dtype):
+        first, last, size = _value(first), _value(last), _value(size)
+        available = self._available()
+        if not available[0] <= first <= available[1]:
+            return DRV_P1INVALID
+        if not first <= last <= available[1]:
+            return DRV_P2INVALID
+        if size != (last - first + 1) * self.pixels:
+            return DRV_P3INVALID
+        # the valid images are written at the start of the array
+        first = first + min(self.overwritten_images, last - first)
+        code = self._read(arr, (last - first + 1) * self.pixels, dtype, first, last)
+        if code == DRV_SUCCESS:
+            _set(validfirst, first)
+            _set(validlast, last)
+        return code
+
+    def GetImages(self, first, last, arr, size, validfirst, validlast):
+        return self._images(first, last, arr, size, validfirst, validlast, numpy.int32)
+
+    def GetImages16(self, first, last, arr, size, validfirst, validlast):
+        return self._images(first, last, arr, size, validfirst, validlast, numpy.uint16)
+
+    def _most_recent(self, arr, size, dtype):
+        last = self._update()
+        if last == 0:
+            return DRV_NO_NEW_DATA
+        return self._read(arr, _value(size), dtype, last, last)
+
+    def GetMostRecentImage(self, arr, size):
+        return self._most_recent(arr, size, numpy.int32)
+
+    def GetMostRecentImage16(self, arr, size):
+        return self._most_recent(arr, size, numpy.uint16)
+
+    def _oldest(self, arr, size, dtype):
+        first, last = self._available()
+        first = max(first, self._retrieved + 1)
+        if last < first:
+            return DRV_NO_NEW_DATA
+        code = self._read(arr, _value(size), dtype, first, first)
+        if code == DRV_SUCCESS:
+            self._retrieved = first
+        return code
+
+    def GetOldestImage(self, arr, size):
+        return self._oldest(arr, size, numpy.int32)
+
+    def GetOldestImage16(self, arr, size):
+        return self._oldest(arr, size, numpy.uint16)
+
+    def _acquired_data(self, arr, size, dtype):
+        if self._acquiring:
+            return DRV_ACQUIRING
+        if self._frames == 0:
+            return DRV_NO_NEW_DATA
+        first, last = self._available()
+        return self._read(arr, _value(size), dtype, first, last)
+
+    def GetAcquiredData(self, arr, size):
+        return self._acquired_data(arr, size, numpy.int32)
+
+    def GetAcquiredData16(self, arr, size):
+        return self._acquired_data(arr, size, numpy.uint16)
+
+    # Spooling
+
+    def SetSpool(self, active, method, path, framebuffersize):
+        if not _value(active):
+            self.spool = None
+            return DRV_SUCCESS
+        # only the raw formats are simulated
+        if _value(method) not in (0, 1, 2):
+            return DRV_P2INVALID
+        path = _value(path)
+        self.spool = (_value(method), path.decode() if isinstance(path, bytes) else path)
+        return DRV_SUCCESS
+
+    def SetSpoolThreadCount(self, count):
+        if _value(count) < 1:
+            return DRV_P1INVALID
+        self.spool_threads = _value(count)
+        return DRV_SUCCESS
+
+    def GetSpoolProgress(self, index):
+        """The spool files are written when the progress is queried."""
+        with self._lock:
+            if self.spool is not None:
+                method, path = self.spool
+                # method 1 writes 32-bit files when accumulating, 16-bit ones otherwise
+                dtype = numpy.int32 if method == 0 or (method == 1 and self.accumulations > 1) else numpy.uint16
+                for i in range(self._spooled + 1, self._update() + 1):
+                    self.frame(i).astype(dtype).tofile('%s%010dspool.dat' % (path, i - 1))
+                    self._spooled = i
+            _set(index, self._spooled)
+        return DRV_SUCCESS
+
+    # Files
+
+    #: Wavelength calibration written to SIF files (polynomial coefficients, increasing order)
+    calibration = (500.0, 0.05, 0.0, 0.0)
+
+    def SaveAsSif(self, path):
+        """Write the images of the circular buffer in the SIF layout (version 65559)."""
+        if self._acquiring:
+            return DRV_ACQUIRING
+        first, last = self._available()
+        if self._frames == 0:
+            return DRV_NO_NEW_DATA
+        path = _value(path)
+        hbin, vbin, hstart, hend, vstart, vend = self._geometry
+        frames = last - first + 1
+        length = self.pixels
+        name = path if isinstance(path, bytes) else path.encode()
+        text = b'Simulated camera'
+        header = [b'Andor Technology Multi-Channel File\n65538 1\n',
+                  b'65559 0 0 1 %d %f ' % (int(self._started_at), self.temperature),
+                  b' ' * 10,
+                  b'0 %g %g %g %d \x00 %g %g 0 1 %d 0 0 0%s\n' % (self.exposure, self._cycle, self.accumulation_cycle,
+                                                                 self.accumulations, self.kinetic_cycle,
+                                                                 1e-6 / self.hs_speeds[self.amplifier][self.ad_channel][self.hs_speed],
+                                                                 self.em_gain, b' 0' * 18),
+                  self.head_model + b'\n',
+                  b'%d %d %d\n%s \n' % (self.width, self.height, len(name), name),
+                  b'65538 %d\n%s\n' % (len(text), text),
+                  b'65538 0 0 0 0 %g %g\n' % tuple(0.001 * t for t in self.shutter_times),
+                  b'0\n' * 8,
+                  b'65538 simulated-spectrograph\n',
+                  b'65539 %s\n' % b' '.join(b'%g' % c for c in self.calibration),
+                  b'0 1 0 0\n0 1 0 0\n0\n0\n%g\n%g\n' % self.pixel_size,
+                  b'12\nPixel number6\nCounts12\nPixel number',
+                  b'65541 %d %d %d %d %d 1 %d %d\n' % (hstart, vend, hend, vstart, frames, frames * length, length),
+                  b'65538 %d %d %d %d %d %d 0\n' % (hstart, vend, hend, vstart, vbin, hbin),
+                  b''.join(b'%d\n' % int(1e6 * i * self._cycle) for i in range(frames))]
+        with open(path, 'wb') as f:
+            f.write(b''.join(header))
+            for i in range(first, last + 1):
+                f.write(self.frame(i).astype('<f4').tobytes())
+        return DRV_SUCCESS
@@ -0,0 +1,74 @@
+"""Micro-benchmarks of the andor2 readout helpers.
+
+Run with::
+
+  $ python benchmarks.py [rollover] [roi]
+
+Times are per frame, best of several repeats. The ``rollover`` benchmark only needs
+numpy, the ``roi`` benchmark drives the camera, or the simulator with ``ANDOR_BACKEND=sim``.
+"""
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from andorData import correct_rollover, RolloverView
+
+def _best(stmt, number, repeat=5):
+  return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+def rollover(sizes=(1024, 4096, 4096*4096), bit_depth=16):
+  """Per-frame cost of the ADC roll-over correction: the old boolean-mask indexing, the
+  in-place :func:`andorData.correct_rollover` and a :class:`andorData.RolloverView` read in full.
+  
+  Up to its chunk size (262144 pixels) the in-place correction uses the mask indexing,
+  so it costs the same plus the function call. Its gain is the bounded memory of the
+  chunked mask on large frames, where it is only 10 to 30% faster."""
+  print("ADC roll-over correction, %d bits" % bit_depth)
+  print("%12s %14s %14s %14s" % ("pixels", "mask [us]", "in place [us]", "lazy [us]"))
+  value = 2**bit_depth - 1
+  for size in sizes:
+    frame = np.random.randint(0, 64, size=size).astype(np.uint16)
+    number = max(1, 2000000 // size)
+    def mask():
+      data = frame.copy()
+      data[data==0] = value
+    def in_place():
+      data = frame.copy()
+      correct_rollover(data, bit_depth)
+    def lazy():
+      data = frame.copy()
+      np.asarray(RolloverView(data, bit_depth))
+    copy = _best(frame.copy, number)
+    times = [max(_best(f, number) - copy, 0) * 1e6 for f in (mask, in_place, lazy)]
+    print("%12d %14.1f %14.1f %14.1f" % ((size,) + tuple(times)))
+
+def roi(rows=(512, 256, 128, 64, 32, 16, 8), frames=20, exposure=0.1):
+  """Frame rate of a kinetic series versus the height of the image read out (full width,
+  centred on the sensor), reading a sub-area of the full sensor or with the isolated crop mode."""
+  from andor2 import Andor
+  cam = Andor()
+  height = cam.Detector.height
+  crop = cam.Info.capabilities.SetFunctions["Crop mode"]
+  cam.exposure = exposure
+  print("Image readout, %d frames of %g ms exposure" % (frames, exposure))
+  print("%8s %10s %14s %14s %14s %14s" % ("rows", "pixels", "sub-area [ms]", "sub-area [Hz]", "crop [ms]", "crop [Hz]"))
+  for n in rows:
+    n = min(n, height)
+    bottom = (height - n) // 2 + 1
+    line = []
+    for isolated_crop in (False, True) if crop else (False,):
+      cam.ReadMode.Image(v=(bottom, bottom + n - 1), isolated_crop=isolated_crop)
+      cam.Acquire.Kinetic(frames, 0)
+      start = time.time()
+      cam.Acquire.start()
+      cam.Acquire.wait()
+      elapsed = time.time() - start
+      line += [cam.acquisitionTimings['kinetic'] * 1e3, frames / elapsed]
+    print("%8d %10d" % (n, cam.ReadMode.current.pixels) + "".join(" %14.2f" % x for x in line))
+  cam.ReadMode.Image()
+
+if __name__ == '__main__':
+  for name in sys.argv[1:] or ['rollover', 'roi']:
+    globals()[name]()
@@ -0,0 +1,605 @@
+"""Regression tests of the readout paths, the file writers and readers and the
+shot cycle helpers, against the simulated camera.
+
+Run with::
+
+  $ python -m pytest -q andor
+
+The simulator (:mod:`andorSim`) is selected before :mod:`andor2` is imported,
+so no camera or SDK is needed.
+"""
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+os.environ['ANDOR_BACKEND'] = 'sim'
+
+import numpy as np
+import pytest
+
+import andor2
+import andorSDK
+from AFSarchive import ArchiveQueue
+from AUGshot import ShotWatcher
+from andorConfig import Config
+from andorData import correct_rollover, RolloverView
+from andorMulti import CameraManager
+from SIFreader import SIFFile
+import SIFconvert
+
+
+@pytest.fixture(scope='module')
+def cam():
+    cam = andor2.Andor()
+    andorSDK.library.frame_rate = 50
+    cam.ReadMode.FullVerticalBinning()
+    cam.exposure = 1
+    return cam
+
+
+def _acquire(cam, frames):
+    cam.Acquire.Kinetic(frames, 0)
+    acq = cam.Acquire
+    acq.start()
+    acq.wait()
+    return acq
+
+
+def test_drain(cam):
+    acq = _acquire(cam, 10)
+    data = acq.drain(max_images=4)
+    assert data.shape == (4, 2048)
+    assert acq.valid == {'first': 1, 'last': 4}
+    data = acq.drain()
+    assert data.shape == (6, 2048)
+    assert acq.valid == {'first': 5, 'last': 10}
+    assert len(acq.drain()) == 0
+
+
+def test_drain_into(cam):
+    acq = _acquire(cam, 5)
+    out = np.zeros((3, 2048), dtype=np.uint16)
+    data = acq.drain(out=out)
+    assert len(data) == 3 and np.shares_memory(data, out)
+    assert len(acq.drain()) == 2
+
+
+def test_drain_retries_are_bounded(cam, monkeypatch):
+    acq = _acquire(cam, 3)
+    calls = []
+    def overwritten(*args, **kwargs):
+        calls.append(args)
+        raise andorSDK.AndorError('DRV_P1INVALID', 20066)
+    monkeypatch.setattr(acq, 'Images', overwritten)
+    with pytest.raises(andorSDK.AndorError):
+        acq.drain()
+    assert len(calls) == acq._drain_retries + 1
+
+
+def test_ring_wraps_around():
+    ring = andor2.FrameRing(4, [2])
+    reader = ring.reader()
+    ring.push(np.arange(6).reshape(3, 2))
+    assert reader.read(timeout=0).tolist() == [[0, 1], [2, 3], [4, 5]]
+    ring.push(np.arange(6, 12).reshape(3, 2))
+    data = reader.read(timeout=0)
+    assert data.tolist() == [[6, 7], [8, 9], [10, 11]]
+    assert reader.index.tolist() == [4, 5, 6]
+    assert reader.overruns == 0
+
+
+def test_ring_read_waits():
+    ring = andor2.FrameRing(4, [1])
+    reader = ring.reader()
+    start = time.time()
+    assert len(reader.read(timeout=0.05)) == 0
+    assert time.time() - start >= 0.05
+    timer = threading.Timer(0.05, ring.push, (np.ones((2, 1)),))
+    timer.start()
+    assert reader.read(timeout=5).ravel().tolist() == [1, 1]
+    timer.join()
+
+
+def test_ring_overrun():
+    ring = andor2.FrameRing(4, [1])
+    reader = ring.reader()
+    ring.push(np.arange(6).reshape(6, 1))
+    assert reader.read(timeout=0).ravel().tolist() == [2, 3, 4, 5]
+    assert reader.overruns == 2
+
+
+def test_reserve_only_claims_the_frames_written():
+    ring = andor2.FrameRing(8, [1])
+    reader = ring.reader()
+    ring.push(np.arange(6).reshape(6, 1))
+    assert len(reader.read(timeout=0)) == 6
+    ring.push(np.arange(6, 8).reshape(2, 1))
+    # after the wrap, reserving one slot must not overwrite the two unread frames
+    slots = ring.reserve(max_frames=1)
+    assert len(slots) == 1
+    slots[0] = 8
+    ring.commit(1)
+    assert reader.read(timeout=0).ravel().tolist() == [6, 7, 8]
+    assert reader.overruns == 0
+
+
+def test_reader_thread_wraps_around(cam, monkeypatch):
+    acq = _acquire(cam, 14)
+    thread = andor2.AcquisitionThread(cam, depth=8)
+    reader = thread.ring.reader()
+    # a reader reading while the thread drains the images into the ring
+    concurrent = []
+    drain = acq.drain
+    def drain_while_reading(*args, **kwargs):
+        concurrent.append(reader.read(timeout=0))
+        return drain(*args, **kwargs)
+    monkeypatch.setattr(acq, 'drain', drain_while_reading)
+    assert thread._read(acq) # the first 8 images, up to the end of the ring
+    assert len(reader.read(max_frames=6)) == 6
+    assert thread._read(acq) # the 6 others, after the wrap
+    assert not thread._read(acq)
+    assert reader.read(timeout=0).shape == (6, 2048)
+    assert reader.index.tolist() == list(range(9, 15))
+    assert [len(frames) for frames in concurrent] == [0, 2]
+    assert reader.overruns == 0
+
+
+@pytest.mark.parametrize('hardware', [True, False])
+def test_frame_times(cam, monkeypatch, hardware):
+    monkeypatch.setitem(cam.Info.capabilities.Features, 'Metadata', hardware)
+    cam.Acquire.Kinetic(5, 0.01)
+    acq = cam.Acquire
+    acq.start()
+    acq.wait()
+    times = acq.frame_times(2, 5)
+    # timed at the end of the exposure, one kinetic cycle apart
+    assert times[0] == pytest.approx(acq.start_time + cam.exposure / 1000 + acq.cycle_time, abs=0.005)
+    assert np.diff(times) == pytest.approx([acq.cycle_time] * 3, abs=1e-6)
+    metadata = acq.frame_metadata(2, 5, shot=7)
+    assert list(metadata['index']) == [2, 3, 4, 5] and np.all(metadata['shot'] == 7)
+    assert metadata['timestamp'] == pytest.approx(times)
+
+
+def test_data_to_image(cam):
+    track = cam.ReadMode.RandomTrack
+    track(3, (1, 10, 20, 40, 300, 300), hbin=4)
+    data = np.random.rand(5, 3, 512)
+    images = track.data_to_image(data, fill=-1)
+    expected = np.full((5, cam.Detector.height, 512), -1.0)
+    for i, (bottom, top) in enumerate([(1, 10), (20, 40), (300, 300)]):
+        expected[:, bottom - 1:top] = data[:, i, np.newaxis]
+    assert np.array_equal(images, expected)
+    assert track.data_to_image(data[0]).shape == (cam.Detector.height, 512)
+    with pytest.raises(ValueError):
+        track.data_to_image(np.zeros((2, 512)))
+    cam.ReadMode.FullVerticalBinning()
+
+
+def test_cached(cam, monkeypatch):
+    calls = []
+    query = andorSDK.GetNumberHSSpeeds
+    monkeypatch.setattr(andorSDK, 'GetNumberHSSpeeds', lambda *args: calls.append(args) or query(*args))
+    hss = cam.Detector.HSS
+    andor2.invalidate(hss)
+    assert hss.speeds == hss.speeds and len(calls) == 1
+    changed = []
+    cam.Detector.OutputAmp.on_change.append(lambda: changed.append('output_amp'))
+    try:
+        cam.Detector.OutputAmp(cam.Detector.OutputAmp.active)
+    finally:
+        cam.Detector.OutputAmp.on_change.pop()
+    assert changed == ['output_amp'] and 'max_speed' not in cam.Detector.OutputAmp._cache
+    assert hss.speeds and len(calls) == 2
+    cam.Detector.ADC.channel = cam.Detector.ADC.channel
+    assert hss.speeds and len(calls) == 3
+    acq = cam.Acquire
+    acq.size_of_circular_buffer
+    cam.ReadMode.FullVerticalBinning()
+    assert 'size_of_circular_buffer' not in acq._cache
+
+
+@pytest.mark.parametrize('options, frame_shape', [({}, [512, 2048]),
+                                                   ({'binning': (2, 4)}, [128, 1024]),
+                                                   ({'binning': (1, 4), 'v': (201, 240), 'isolated_crop': True}, [10, 2048]),
+                                                   ({'binning': (4, 2), 'h': (101, 612), 'v': (11, 20),
+                                                     'isolated_crop': True}, [5, 128])])
+def test_image_read_mode(cam, options, frame_shape):
+    cam.ReadMode.Image(**options)
+    assert cam.ReadMode.current.shape == frame_shape
+    acq = _acquire(cam, 2)
+    assert acq.GetAcquiredData().shape == tuple([2] + frame_shape)
+    cam.ReadMode.FullVerticalBinning()
+
+
+def test_image_read_mode_checks(cam, monkeypatch):
+    with pytest.raises(ValueError):
+        cam.ReadMode.Image(binning=(3, 1))
+    monkeypatch.setitem(cam.Info.capabilities.SetFunctions, 'Extended crop mode', False)
+    with pytest.raises(RuntimeError):
+        cam.ReadMode.Image(v=(11, 20), isolated_crop=True)
+    monkeypatch.setitem(cam.Info.capabilities.SetFunctions, 'Crop mode', False)
+    with pytest.raises(RuntimeError):
+        cam.ReadMode.Image(v=(1, 10), isolated_crop=True)
+    cam.ReadMode.FullVerticalBinning()
+
+
+@pytest.mark.parametrize('mode, args, kwargs, frame_shape', [
+    ('FullVerticalBinning', (), {'hbin': 4}, [512]),
+    ('SingleTrack', (100, 10), {'hbin': 2}, [1024]),
+    ('MultiTrack', (3, 10, 0), {'hbin': 4}, [3, 512]),
+    ('RandomTrack', (2, (1, 10, 20, 30)), {'hbin': 8}, [2, 256]),
+    ('MultiTrackScan', (4, 8), {}, [32, 2048]),
+    ('MultiTrackScan', (4, 8), {'binning': (2, 4), 'h': (1, 1024)}, [8, 512]),
+    ('MultiTrackScan', (1, 8), {'binning': (2, 8)}, [1024])])
+def test_track_binning(cam, mode, args, kwargs, frame_shape):
+    getattr(cam.ReadMode, mode)(*args, **kwargs)
+    assert cam.ReadMode.current.shape == frame_shape
+    acq = _acquire(cam, 2)
+    assert acq.GetAcquiredData().shape == tuple([2] + frame_shape)
+    with pytest.raises(ValueError):
+        cam.ReadMode.MultiTrackScan(2, 6, binning=(1, 4))
+    cam.ReadMode.FullVerticalBinning()
+
+
+def test_config_apply(cam, tmp_path):
+    cam.config = None
+    kinetic = Config(hss=1, vss=0, preamp=0, exposure=10, read_mode='FullVerticalBinning',
+                     acq_mode=('Kinetic', {'numberKinetics': 10, 'kineticCycleTime': 0}),
+                     trigger='Internal', fast_trigger=False)
+    image = kinetic.replace(exposure=50, read_mode=('Image', {'binning': [1, 4]}))
+    assert kinetic.apply(cam) == ['hss', 'vss', 'preamp', 'read_mode', 'exposure', 'acq_mode', 'trigger',
+                                   'fast_trigger']
+    assert image.apply(cam) == ['read_mode', 'exposure']
+    assert cam.ReadMode.current._name == 'Image'
+    assert cam.exposure == pytest.approx(50)
+    assert image.apply(cam) == []
+    assert kinetic.apply(cam) == ['read_mode', 'exposure']
+    assert cam.Acquire._name == 'Kinetic'
+    # settings changed directly are set again by the next apply
+    cam.exposure = 20
+    assert kinetic.apply(cam) == ['exposure']
+    assert cam.exposure == pytest.approx(10)
+    cam.Acquire.Single()
+    assert kinetic.apply(cam) == ['exposure', 'acq_mode']
+    assert cam.Acquire._name == 'Kinetic'
+    cam.Detector.HSS(0)
+    assert kinetic.apply(cam) == ['hss', 'preamp']
+    assert kinetic.apply(cam) == []
+    for name in ('config.toml', 'config.json'):
+        image.save(str(tmp_path / name))
+        assert Config.load(str(tmp_path / name)) == image
+    cam.ReadMode.FullVerticalBinning()
+    cam.config = None
+
+
+def test_sif_reader(cam, tmp_path):
+    acq = _acquire(cam, 2)
+    data = acq.GetAcquiredData()
+    filename = str(tmp_path / 'shot.sif')
+    acq.saveSIF(filename)
+    with SIFFile(filename) as sif:
+        assert len(sif) == 2 and sif.shape == (2, 1, 2048)
+        assert sif.exposure == pytest.approx(cam.exposure / 1000)
+        assert sif.wavelengths[0] == pytest.approx(500.05)
+        row = sif[1]
+    # the frames taken from the file stay valid after it is closed
+    assert np.array_equal(row.ravel(), data[1])
+
+
+@pytest.mark.parametrize('format, accumulations, dtype', [('raw', 1, np.uint16), ('raw', 2, np.int32),
+                                                          ('raw16', 2, np.uint16), ('raw32', 1, np.int32)])
+def test_spool(cam, tmp_path, format, accumulations, dtype):
+    cam.Acquire.Kinetic(3, 0, accumulations)
+    acq = cam.Acquire
+    spooled = acq.spool(str(tmp_path / 'spool'), format)
+    assert acq.finish_spool(timeout=5) is spooled
+    assert andorSDK.library.spool is None
+    assert len(spooled) == 3 and spooled.dtype == dtype
+    assert np.array_equal(spooled[:], acq.GetAcquiredData(type=32))
+
+
+@pytest.mark.parametrize('ring', [True, False])
+def test_bracket(cam, monkeypatch, ring):
+    monkeypatch.setattr(andorSDK.library, 'baseline', 0.0) # dark pixels read 0: the ADC roll-over
+    for mode in (cam._AcqMode.Kinetic, cam._AcqMode.Single):
+        monkeypatch.setattr(mode, 'rollover', 'lazy')
+    cam.exposure = 5
+    images, metadata = cam.Acquire.bracket([1, 2], repeats=2, ring=ring)
+    assert isinstance(images, np.ndarray) and images.shape == (4, 2048)
+    assert images.min() > 0
+    assert metadata['exposure'] == pytest.approx([0.001, 0.002] * 2)
+    assert cam.exposure == pytest.approx(5)
+
+
+def test_sif_convert(cam, tmp_path):
+    # the converter runs on analysis hosts, without the camera SDK
+    env = dict(os.environ)
+    env.pop('ANDOR_BACKEND')
+    subprocess.check_call([sys.executable, '-c', 'import SIFconvert, sys; assert "andor2" not in sys.modules'],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    h5py = pytest.importorskip('h5py')
+    acq = _acquire(cam, 3)
+    acq.saveSIF(str(tmp_path / 'Johann01234.SIF'))
+    config = tmp_path / 'Johann_autorun.cfg'
+    config.write_text('# name\nJohann\nsetup1.cfg\nsetup2.cfg\n/tmp/\n%s/\n/shots/\n/log/\n-70\nhttp://vacuum\n' % tmp_path)
+    assert SIFconvert.main(['--config', str(config), '1234', '1234', '--workers', '1']) == 0
+    with h5py.File(str(tmp_path / 'Johann01234.h5'), 'r') as f:
+        assert np.array_equal(f['data'][:, 0], acq.GetAcquiredData())
+        assert f['data'].compression == 'gzip'
+
+
+def test_archive_queue(tmp_path):
+    source = tmp_path / 'Johann12.SIF'
+    target = tmp_path / 'afs' / 'Johann34567.SIF'
+    target.parent.mkdir()
+    warnings = []
+    archive = ArchiveQueue(str(tmp_path / 'queue'), backoff=0.01, warn=warnings.append)
+    try:
+        for content in (b'first', b'second'): # the shot archived again replaces the copy
+            source.write_bytes(content)
+            archive.put(str(source), str(target))
+            assert archive.join(timeout=5)
+            assert target.read_bytes() == content
+        archive.put(str(tmp_path / 'missing.SIF'), str(target))
+        assert archive.join(timeout=5)
+        assert (archive.archived, archive.failed) == (2, 1)
+        assert len(list((tmp_path / 'queue').glob('*.failed'))) == 1
+        assert len(warnings) == 1 and 'missing' in warnings[0]
+    finally:
+        archive.close()
+
+
+def test_camera_manager(monkeypatch):
+    monkeypatch.setenv('ANDOR_SIM_CAMERAS', '2') # read by the workers when they load the simulator
+    with CameraManager(cameras=[0, 1]) as cams:
+        assert [cam.serial_number for cam in cams] == [12345, 12346]
+        cams.call('ReadMode.FullVerticalBinning')
+        cams.set('exposure', 2)
+        assert cams.get('exposure') == [pytest.approx(2)] * 2
+        cams.call('Acquire.Kinetic', 3, 0)
+        readers = cams.stream(depth=4, start=True)
+        assert all(cam.ring is not None for cam in cams)
+        for reader in readers:
+            frames = 0
+            while frames < 3:
+                frames += len(reader.read(timeout=5))
+            assert reader.index[-1] == 3 and reader.read(timeout=0).shape == (0, 2048)
+        with pytest.raises(AttributeError):
+            cams[0].get('missing')
+        processes = [cam.process for cam in cams]
+        # a worker whose parent is gone shuts down without a reply
+        cams[1]._conn.close()
+        processes[1].join(5)
+        assert processes[1].exitcode == 0
+        cams.cameras.pop()
+    processes[0].join(5)
+    assert processes[0].exitcode == 0
+
+
+@pytest.mark.parametrize('mode, frame_shape', [('fvb', [1024]), ('image', [5, 1024])])
+def test_fast_kinetics(cam, mode, frame_shape):
+    cam.Acquire.FastKinetics(10, 4, 0.001, mode, binning=(2, 2))
+    acq = cam.Acquire
+    assert acq.frame_shape == frame_shape
+    assert acq.cycle_time > 0.001
+    acq.start()
+    acq.wait()
+    assert acq.GetAcquiredData().shape == tuple([4] + frame_shape)
+    assert acq.GetAcquiredData(type=32).shape == tuple([4] + frame_shape)
+
+
+class _Response(object):
+    closed = 0
+    def close(self):
+        _Response.closed += 1
+
+
+def _settings(tmp_path):
+    SIF = pytest.importorskip('SIF')
+    config = tmp_path / 'Johann_autorun.cfg'
+    config.write_text('Johann\nsetup1.cfg\nsetup2.cfg\n%s/\n%s/afs/\n%s/shotfile\n/log/\n-70\nhttp://vacuum\n'
+                      % (tmp_path, tmp_path, tmp_path))
+    return SIF, SIF.Settings(str(config))
+
+
+def test_vacuum_poller(tmp_path, monkeypatch):
+    SIF, settings = _settings(tmp_path)
+    monkeypatch.setattr(SIF, 'urlopen', lambda url, timeout: _Response())
+    poller = SIF.VacuumPoller(settings.vacCheckURL, interval=0.01, max_age=1.0)
+    assert poller.poll() and poller.error is None
+    assert _Response.closed == 1 # every query closes its connection
+    # a spectrometer whose setup did not load polls nothing
+    spectrometer = SIF.Spectrometer(settings=settings)
+    spectrometer.start()
+    assert spectrometer.Vacuum is None and spectrometer.Shots is None
+    spectrometer.Archive.close()
+
+
+def test_vacuum_poller_hung_server(monkeypatch):
+    SIF = pytest.importorskip('SIF')
+    answer = threading.Event()
+    monkeypatch.setattr(SIF, 'urlopen', lambda url, timeout: answer.wait() and _Response())
+    bad = []
+    poller = SIF.VacuumPoller('http://vacuum', interval=0.01, timeout=0.02, on_bad=lambda: bad.append(1))
+    poller.start() # the first status is bad: reported
+    time.sleep(0.2)
+    poller.stop()
+    queries = [thread for thread in threading.enumerate() if thread.name == 'vacuum query']
+    assert bad == [1] and len(queries) == 1 # no new query while the first one hangs
+    answer.set()
+    assert poller.poll()
+
+
+def test_stream_hdf(cam, tmp_path):
+    h5py = pytest.importorskip('h5py')
+    filename = str(tmp_path / 'shot.h5')
+    cam.Acquire.Kinetic(6, 0)
+    acq = cam.Acquire
+    sink = acq.stream_hdf(filename, 'spectra', compression='gzip', chunk_frames=4)
+    acq.reader.join()
+    sink.close()
+    assert sink.written == 6
+    with h5py.File(filename, 'r') as f:
+        dataset = f['spectra']
+        assert dataset.chunks == (4, 2048) and dataset.compression == 'gzip'
+        assert dataset.attrs['mode'] == 'Kinetic'
+        assert np.array_equal(dataset[:], acq.GetAcquiredData())
+
+
+@pytest.mark.parametrize('inotify', [True, False])
+def test_shot_watcher(tmp_path, inotify):
+    shotfile = tmp_path / 'shotfile'
+    shotfile.write_text('34000\n') # left over from an earlier shot
+    published = []
+    watcher = ShotWatcher(str(shotfile), callback=published.append, interval=0.01, inotify=inotify)
+    armed = time.time()
+    watcher.start()
+    assert watcher.inotify == inotify
+    try:
+        assert watcher.find(armed, time.time(), timeout=0.2) is None
+        assert (tmp_path / 'shotfile_34000').exists()
+        shotfile.write_text('34001\n')
+        read, shot = watcher.find(armed, time.time(), timeout=5)
+        assert shot == 34001 and published == [34001]
+        assert (tmp_path / 'shotfile_34001').exists() and not shotfile.exists()
+    finally:
+        watcher.stop()
+
+
+def test_shot_cycle(cam, tmp_path, monkeypatch):
+    SIF, settings = _settings(tmp_path)
+    (tmp_path / 'afs').mkdir()
+    monkeypatch.setattr(SIF, 'urlopen', lambda url, timeout: _Response())
+    cam.Acquire.Kinetic(2, 0)
+    spectrometer = SIF.Spectrometer(cam, settings)
+    spectrometer._setup = True
+    spectrometer.shot_timeout = 5
+    # the shot file is written while the camera acquires, the archive stage pairs it with the shot
+    timer = threading.Timer(0.1, (tmp_path / 'shotfile').write_text, ('34001\n',))
+    timer.start()
+    with pytest.warns(UserWarning, match='Temperature'): # the simulated sensor is not cooled yet
+        spectrometer.start(single=True)
+    timer.join()
+    try:
+        assert spectrometer.sequence == 1 and spectrometer.shotnum == 34001
+        assert spectrometer.Archive.join(timeout=5)
+        with SIFFile(str(tmp_path / 'afs' / 'Johann34001.SIF')) as sif:
+            assert len(sif) == 2
+    finally:
+        spectrometer.Archive.close()
+
+
+def test_shot_cycle_bad_vacuum(cam, tmp_path, monkeypatch):
+    SIF, settings = _settings(tmp_path)
+    def unreachable(url, timeout):
+        raise IOError('vacuum server down')
+    monkeypatch.setattr(SIF, 'urlopen', unreachable)
+    spectrometer = SIF.Spectrometer(cam, settings)
+    spectrometer._setup = True
+    monkeypatch.setattr(spectrometer, 'check_temperature', lambda: pytest.fail('cooler set with a bad vacuum'))
+    cam.Temperature.cooler = True
+    with pytest.warns(UserWarning, match='Vacuum Warning'):
+        spectrometer.start()
+    spectrometer.Archive.close()
+    assert not cam.Temperature.cooler and spectrometer.sequence == 0
+
+
+def test_shot_cycle_vacuum_lost(cam, tmp_path, monkeypatch):
+    SIF, settings = _settings(tmp_path)
+    answers = [_Response()]
+    def vacuum(url, timeout):
+        if not answers:
+            raise IOError('vacuum server down')
+        return answers.pop()
+    monkeypatch.setattr(SIF, 'urlopen', vacuum)
+    # the status is bad once no query succeeded for max_age seconds
+    monkeypatch.setattr(SIF, 'VacuumPoller', functools.partial(SIF.VacuumPoller, interval=0.05, max_age=0.2))
+    cam.Acquire.Kinetic(500, 0) # 10 s at 50 frames per second
+    spectrometer = SIF.Spectrometer(cam, settings)
+    spectrometer._setup = True
+    monkeypatch.setattr(spectrometer, 'check_temperature', lambda: None)
+    cam.Temperature.cooler = True
+    start = time.time()
+    with pytest.warns(UserWarning, match='Vacuum Warning'):
+        spectrometer.start()
+    spectrometer.Archive.close()
+    assert time.time() - start < 5 # aborted during the shot
+    assert not cam.Temperature.cooler and not cam.Acquire.running and spectrometer.sequence == 0
+
+
+def test_drain_overwritten_during_read(cam, monkeypatch):
+    monkeypatch.setattr(andorSDK.library, 'overwritten_images', 2)
+    acq = _acquire(cam, 6)
+    expected = acq.GetAcquiredData()
+    data = acq.drain()
+    assert acq.valid == {'first': 3, 'last': 6}
+    assert np.array_equal(data, expected[2:])
+    # read straight into the ring: the slots published are those the SDK wrote
+    acq = _acquire(cam, 6)
+    thread = andor2.AcquisitionThread(cam, depth=8)
+    reader = thread.ring.reader()
+    assert thread._read(acq)
+    assert np.array_equal(reader.read(timeout=0), expected[2:])
+    assert reader.index.tolist() == [3, 4, 5, 6]
+
+
+def test_buffer_pool(cam, tmp_path):
+    acq = _acquire(cam, 3)
+    data = acq.Newest()
+    assert data.shape == (2048,)
+    cam.Buffers.release(data)
+    assert acq.Newest() is data # recycled
+    assert acq.Oldest().shape == (2048,) # same shape (and pool key) as Newest
+    cam.Buffers.release(acq.Images(1, 2)[1:]) # a view gives its whole buffer back
+    assert acq.Images(1, 2).shape == (2, 2048) and len(cam.Buffers._free[((2, 2048), np.dtype(np.uint16))]) == 0
+    h5py = pytest.importorskip('h5py')
+    filename = str(tmp_path / 'shots.h5')
+    h5py.File(filename, 'w').close()
+    acq.save(filename, 'shot1')
+    first = acq.last_acquired_data
+    acq.save(filename, 'shot2') # reads into the buffer the first save gave back
+    assert acq.last_acquired_data is first
+
+
+@pytest.mark.parametrize('shape', [(3, 100), (5, 1000)])
+def test_correct_rollover(shape):
+    raw = np.random.RandomState(0).randint(0, 4, shape).astype(np.uint16)
+    expected = np.where(raw == 0, 4095, raw)
+    data = raw.copy()
+    assert correct_rollover(data, 12, chunk=1024) is data # in chunks for the larger frames
+    assert np.array_equal(data, expected)
+    data = raw.copy()
+    correct_rollover(data[:, ::2], 12) # a non-contiguous view
+    assert np.array_equal(data[:, ::2], expected[:, ::2]) and np.array_equal(data[:, 1::2], raw[:, 1::2])
+    view = RolloverView(raw.copy(), 12)
+    assert np.array_equal(view[1:], expected[1:]) and (view.raw == 0).any() # indexing corrects a copy
+    assert np.array_equal(np.asarray(view), expected) and not (view.raw == 0).any() # then in place
+    raw.flags.writeable = False
+    assert np.array_equal(np.asarray(RolloverView(raw, 12)), expected)
+
+
+def test_profiler(cam, tmp_path):
+    acq = _acquire(cam, 2)
+    profiler = andorSDK.profile()
+    try:
+        acq.Newest()
+        with pytest.raises(andorSDK.AndorError):
+            acq.Images(5, 6) # not acquired
+    finally:
+        assert andorSDK.profile(False) is profiler
+    assert not hasattr(andorSDK.GetStatus, '__wrapped__') # the bare functions again
+    stats = json.loads(profiler.to_json(str(tmp_path / 'sdk.json')))
+    assert stats == json.load(open(str(tmp_path / 'sdk.json')))
+    newest = stats['functions']['GetMostRecentImage16']
+    assert newest['count'] == 1 and newest['bytes'] == 2 * 2048 and sum(newest['histogram']) == 1
+    assert stats['functions']['GetImages16']['errors'] == 1
+    text = profiler.to_prometheus(str(tmp_path / 'sdk.prom'))
+    assert open(str(tmp_path / 'sdk.prom')).read() == text
+    assert 'andor_sdk_call_seconds_count{function="GetMostRecentImage16"} 1' in text
+    assert 'andor_sdk_call_seconds_bucket{function="GetMostRecentImage16",le="+Inf"} 1' in text
+    assert 'andor_sdk_bytes_total{function="GetMostRecentImage16"} 4096' in text
+    assert 'andor_sdk_errors_total{function="GetImages16"} 1' in text